@@ -0,0 +1,59 @@
+import sys
+
+sys.path.append("..")
+import timeit
+from lexer import CharStream, EOF
+
+
+class PropertyCharStream:
+    # CharStream as it was before its index became a slot and lines were looked up in a LineIndex.
+    def __init__(self, string: str):
+        self.string = string
+        self._current_index = -1
+        self._line_number = 1
+
+    def advance_next(self):
+        if self._current_index + 1 < len(self.string):
+            self._current_index += 1
+            if self.string[self._current_index] == "\n":
+                self._line_number += 1
+            return self.string[self._current_index]
+
+    @property
+    def current_index(self):
+        return self._current_index
+
+    @property
+    def line_number(self):
+        return self._line_number
+
+    def peak(self, offset):
+        index = self.current_index + offset
+        return self.string[index : index + 1] if index >= 0 else EOF
+
+    def start_token(self):
+        return self.current_index, self.line_number, self.peak(0)
+
+
+def walk(stream) -> list:
+    """Reads the counters the way the lexer does at the start of every token, returning what start_token gave."""
+    starts = []
+    previous = " "
+    while stream.current_index < len(stream.string) - 1:
+        char = stream.advance_next()
+        if previous in " \n" and char not in " \n":
+            starts.append(stream.start_token())
+        previous = char
+    return starts
+
+
+def main(lines: int = 2000, repeat: int = 5):
+    code = "value = word + 1;\n" * lines
+    print(f"Walking {lines} lines, {len(code)} characters")
+    for stream_class in [PropertyCharStream, CharStream]:
+        seconds = min(timeit.repeat(lambda: walk(stream_class(code)), number=1, repeat=repeat))
+        print(f"  {stream_class.__name__:<18} {seconds * 1000:8.2f} ms  {len(code) / seconds:12,.0f} chars/s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
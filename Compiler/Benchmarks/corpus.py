@@ -0,0 +1,157 @@
+import sys
+
+sys.path.append("..")
+import random
+import string
+from typing import Callable, Dict
+
+
+# Synthetic ViewScript generators, one per kind of code that stresses a different part of the
+# lexer. Each builds statements following Info/manual.txt until the source reaches size characters.
+
+NAMES = [
+    "value", "count", "index", "result", "items", "element", "total", "buffer",
+    "getElementById", "innerHTML", "document", "largestNumber", "isPrime", "stack",
+]
+
+
+def _name(rng: random.Random) -> str:
+    if rng.random() < 0.6:
+        return rng.choice(NAMES)
+    return rng.choice(string.ascii_letters + "_") + "".join(
+        rng.choices(string.ascii_letters + string.digits + "_", k=rng.randint(2, 14))
+    )
+
+
+def _number(rng: random.Random) -> str:
+    return rng.choice(
+        [
+            lambda: str(rng.randint(0, 10**6)),
+            lambda: f"{rng.randint(0, 999)}.{rng.randint(0, 999)}",
+            lambda: f".{rng.randint(1, 999)}e-{rng.randint(1, 30)}",
+            lambda: f"{rng.randint(1, 99)}.{rng.randint(0, 99)}E+{rng.randint(1, 300)}",
+            lambda: f"{rng.randint(1, 10**9)}n",
+            lambda: f"0x{rng.randint(0, 2**32):X}",
+            lambda: f"0o{rng.randint(0, 2**16):o}",
+            lambda: f"0b{rng.randint(0, 2**12):b}",
+        ]
+    )()
+
+
+def identifier_statement(rng: random.Random) -> str:
+    target = ".".join(_name(rng) for _ in range(rng.randint(1, 3)))
+    arguments = ", ".join(_name(rng) for _ in range(rng.randint(0, 4)))
+    return rng.choice(
+        [
+            f"{target} = {_name(rng)}.{_name(rng)}({arguments});",
+            f"const {_name(rng)} = {target};",
+            f"fn {_name(rng)}({arguments}) {{\n    {target}\n}}",
+            f"for {_name(rng)} in {_name(rng)} {{\n    {target}({arguments});\n}}",
+        ]
+    )
+
+
+def operator_statement(rng: random.Random) -> str:
+    binary = ["+", "-", "*", "/", "%", "**", "==", "!=", ">", "<", ">=", "<=", "and", "or",
+              "<<", ">>", ">>>", "||", "^", "&&", "??", "in"]
+    assignment = ["=", "+=", "-=", "*=", "/=", "**=", "%=", "??=", "<<=", ">>=", ">>>=", "||=", "^=", "&&="]
+    expression = _name(rng)
+    for _ in range(rng.randint(2, 8)):
+        operand = rng.choice([_name(rng), str(rng.randint(0, 99)), f"~{_name(rng)}", f"-{_name(rng)}"])
+        expression += f" {rng.choice(binary)} {operand}"
+    return rng.choice(
+        [
+            f"{_name(rng)} {rng.choice(assignment)} {expression};",
+            f"{_name(rng)}?.{_name(rng)} = ({expression})..={rng.randint(1, 9)};",
+            f"const {_name(rng)} = #{_name(rng)}, {_name(rng)}: {expression};",
+        ]
+    )
+
+
+def string_statement(rng: random.Random) -> str:
+    words = " ".join(rng.choices(["Hello", "World", "the", "time", "is", "item", "of", "$5"], k=rng.randint(2, 10)))
+    return rng.choice(
+        [
+            f"log(\"{words} {{{_name(rng)}}} and {{{_name(rng)} + 1}}\");",
+            f"{_name(rng)} = \"{words} {{\"{words} {{{_name(rng)}}}\"}}.\";",
+            f"{_name(rng)}.innerHTML = '{words} \\'quoted\\' {words}';",
+            f"{_name(rng)} = `^{_name(rng)}(a|e)/[0-9]+$`gi;",
+        ]
+    )
+
+
+def comment_statement(rng: random.Random) -> str:
+    words = " ".join(rng.choices(NAMES + ["the", "a", "to", "TODO", "license", "copyright"], k=rng.randint(5, 25)))
+    return rng.choice(
+        [
+            f"// {words}",
+            "/*\n * " + "\n * ".join(words[i : i + 60] for i in range(0, len(words), 60)) + "\n */",
+            f"{_name(rng)} = 1; // {words}",
+        ]
+    )
+
+
+def number_statement(rng: random.Random) -> str:
+    return rng.choice(
+        [
+            f"{_name(rng)} = [{', '.join(_number(rng) for _ in range(rng.randint(4, 16)))}];",
+            f"{_name(rng)} = {_number(rng)} * {_number(rng)} + {_number(rng)};",
+        ]
+    )
+
+
+def _expression(rng: random.Random, depth: int) -> str:
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice([_name, _name, lambda rng: str(rng.randint(0, 999)), lambda rng: rng.choice(["true", "null", "this"])])(rng)
+    operand = lambda: _expression(rng, depth - 1)
+    return rng.choice(
+        [
+            lambda: f"{operand()} {rng.choice(['+', '-', '*', '/', '**', '==', '<', 'and', 'or', '??', '&&', '<<'])} {operand()}",
+            lambda: f"{rng.choice(['-', 'not ', '~'])}{operand()}",
+            lambda: f"({operand()})",
+            lambda: f"{_name(rng)}({', '.join(operand() for _ in range(rng.randint(0, 3)))})",
+            lambda: f"{_name(rng)}.{_name(rng)}[{operand()}]",
+            lambda: f"[{', '.join(operand() for _ in range(rng.randint(0, 4)))}]",
+            lambda: rng.choice([f"({_name(rng)}..)", f"{_name(rng)}..={_name(rng)}", f"{_name(rng)}..{_name(rng)}"]),
+            lambda: f'"{_name(rng)} {{{operand()}}} of {{{_name(rng)}}}"',
+        ]
+    )()
+
+
+def expression_statement(rng: random.Random) -> str:
+    # Only expressions and blocks, which is all parser.Parser reads so far.
+    return rng.choice(
+        [
+            lambda: f"{_name(rng)} = {_expression(rng, 4)};",
+            lambda: f"{_name(rng)}.{_name(rng)} {rng.choice(['+=', '-=', '??=', '='])} {_expression(rng, 4)};",
+            lambda: f"{_name(rng)}({_expression(rng, 3)}, {_expression(rng, 3)});",
+            lambda: f"{_name(rng)} = {{\n    {_name(rng)} = {_expression(rng, 3)};\n    {_expression(rng, 3)}\n}};",
+        ]
+    )()
+
+
+KINDS: Dict[str, Callable[[random.Random], str]] = {
+    "identifiers": identifier_statement,
+    "operators": operator_statement,
+    "strings": string_statement,
+    "comments": comment_statement,
+    "numbers": number_statement,
+    "expressions": expression_statement,
+}
+
+
+def generate(kind: str, size: int, seed: int = 0) -> str:
+    """Returns about size characters of kind code, the same every time for the same seed."""
+    rng = random.Random(f"{kind}:{seed}")
+    statement = KINDS[kind]
+    lines = []
+    length = 0
+    while length < size:
+        line = statement(rng)
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    print(generate(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 1000))
@@ -0,0 +1,136 @@
+import sys
+
+sys.path.append("..")
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from collections import deque
+from corpus import KINDS, generate
+from lexer import Lexer, Engine
+
+
+# Each target lexes a source and returns how many tokens it made. lex keeps every token in a
+# list, lex_stream drops each one as soon as it is made, so the two show the cost of holding them.
+def lex(source: str, engine: Engine) -> int:
+    return len(Lexer(code_string=source, engine=engine).lex())
+
+
+def lex_stream(source: str, engine: Engine) -> int:
+    counter = deque(enumerate(Lexer(code_string=source, engine=engine).lex_stream(), 1), maxlen=1)
+    return counter[0][0] if counter else 0
+
+
+TARGETS = {"lex": lex, "lex_stream": lex_stream}
+
+# Peak memory within this many bytes of the baseline is never flagged, since lex_stream's is
+# small enough for allocator noise to be a large fraction of it.
+MEMORY_SLACK = 64 * 1024
+
+
+def measure(target, source: str, engine: Engine, repeat: int) -> dict:
+    token_count = target(source, engine)
+    seconds = float("inf")
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        target(source, engine)
+        seconds = min(seconds, time.perf_counter() - begin)
+    # tracemalloc slows everything down, so memory is measured on a separate, untimed run.
+    tracemalloc.start()
+    try:
+        target(source, engine)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "tokens": token_count,
+        "seconds": seconds,
+        "tokens_per_second": token_count / seconds,
+        "mb_per_second": len(source.encode()) / seconds / 1e6,
+        "peak_bytes": peak,
+    }
+
+
+def run(kinds, targets, engines, size: int, repeat: int, seed: int = 0) -> dict:
+    """Benchmarks every combination, returning results keyed by "kind/target/engine"."""
+    results = {}
+    for kind in kinds:
+        source = generate(kind, size, seed)
+        for target in targets:
+            for engine in engines:
+                results[f"{kind}/{target}/{engine}"] = measure(TARGETS[target], source, Engine(engine), repeat)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Returns a message for every result that is more than tolerance (a fraction) slower, or uses
+    more than tolerance more memory, than the same benchmark in baseline.
+    """
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if result["tokens_per_second"] < old["tokens_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: {result['tokens_per_second']:,.0f} tokens/s, "
+                f"down from {old['tokens_per_second']:,.0f}"
+            )
+        if result["peak_bytes"] > old["peak_bytes"] * (1 + tolerance) + MEMORY_SLACK:
+            regressions.append(
+                f"{key}: peak memory {result['peak_bytes']:,} bytes, up from {old['peak_bytes']:,}"
+            )
+    return regressions
+
+
+def command_line(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure lexer throughput and memory on synthetic ViewScript.")
+    parser.add_argument("--kinds", nargs="+", choices=list(KINDS), default=list(KINDS))
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--engines", nargs="+", choices=[engine.value for engine in Engine], default=[Engine.CHAR.value])
+    parser.add_argument("--size", type=int, default=1_000_000, help="characters of source per corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="FILE", help="write the results to FILE as a baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="flag results that regressed from the baseline in FILE")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="fraction of change allowed before flagging")
+    args = parser.parse_args(argv)
+
+    results = run(args.kinds, args.targets, args.engines, args.size, args.repeat, args.seed)
+    print(f"{'benchmark':<34} {'tokens':>9} {'tokens/s':>12} {'MB/s':>7} {'peak MB':>8}")
+    for key, result in results.items():
+        print(
+            f"{key:<34} {result['tokens']:>9,} {result['tokens_per_second']:>12,.0f} "
+            f"{result['mb_per_second']:>7.2f} {result['peak_bytes'] / 1e6:>8.2f}"
+        )
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("size") != args.size or baseline.get("seed") != args.seed:
+            print("Warning: the baseline was made from a different corpus size or seed.")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        status = 1 if regressions else 0
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "size": args.size,
+                    "seed": args.seed,
+                    "results": results,
+                },
+                file,
+                indent=4,
+            )
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(command_line())
@@ -0,0 +1,53 @@
+import sys
+
+sys.path.append("..")
+import random
+import string
+import timeit
+from lex_data import *
+from lexer import Lexer
+
+
+def identifier_heavy_source(count: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    keywords = [item.value for item in Keyword if item.value.isalpha()]
+    words = []
+    for _ in range(count):
+        if rng.random() < 0.2:
+            words.append(rng.choice(keywords))
+        else:
+            words.append(
+                rng.choice(string.ascii_letters)
+                + "".join(rng.choices(string.ascii_letters + string.digits, k=rng.randint(0, 12)))
+            )
+    return " ".join(words)
+
+
+def enum_lookup(token: str):
+    # The lookup the lexers did before LEXEMES existed.
+    if token in set(item.value for item in Operator):
+        return TokenType.OPERATOR, Operator(token)
+    elif token in set(item.value for item in Keyword):
+        return TokenType.KEYWORD, Keyword(token)
+    return None
+
+
+def table_lookup(token: str):
+    return LEXEMES.get(token)
+
+
+def main(count: int = 20000, repeat: int = 5):
+    source = identifier_heavy_source(count)
+    words = source.split()
+    assert all(enum_lookup(word) == table_lookup(word) for word in words)
+
+    print(f"Identifier-heavy input: {count} words, {len(source)} characters")
+    for lookup in [enum_lookup, table_lookup]:
+        seconds = min(timeit.repeat(lambda: [lookup(word) for word in words], number=1, repeat=repeat))
+        print(f"  {lookup.__name__:<14} {seconds * 1000:8.2f} ms  {count / seconds:12,.0f} lookups/s")
+    seconds = min(timeit.repeat(lambda: Lexer(code_string=source).lex(), number=1, repeat=repeat))
+    print(f"  {'Lexer.lex':<14} {seconds * 1000:8.2f} ms  {count / seconds:12,.0f} tokens/s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
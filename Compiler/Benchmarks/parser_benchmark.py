@@ -0,0 +1,92 @@
+import sys
+
+sys.path.append("..")
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from corpus import generate
+from lexer import Lexer, Engine
+from parser import Parser
+from lexer_benchmark import compare
+
+
+# Parses the expressions corpus at several sizes. The source is lexed up front so only parsing
+# is timed, and the peak memory is that of the parser and the tree it builds, which should both
+# grow in proportion to the size: tokens/s and bytes/token stay flat as the size doubles.
+def measure(tokens: list, repeat: int) -> dict:
+    seconds = float("inf")
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        Parser(tokens).parse_module()
+        seconds = min(seconds, time.perf_counter() - begin)
+    tracemalloc.start()
+    try:
+        module = Parser(tokens).parse_module()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del module
+    return {
+        "tokens": len(tokens),
+        "seconds": seconds,
+        "tokens_per_second": len(tokens) / seconds,
+        "peak_bytes": peak,
+    }
+
+
+def run(sizes, repeat: int, seed: int = 0, engine: Engine = Engine.CHAR) -> dict:
+    """Benchmarks parsing each size of corpus, returning results keyed by "expressions/parse/size"."""
+    results = {}
+    for size in sizes:
+        tokens = Lexer(code_string=generate("expressions", size, seed), engine=engine).lex()
+        results[f"expressions/parse/{size}"] = measure(tokens, repeat)
+    return results
+
+
+def command_line(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure parser throughput and tree memory on synthetic ViewScript.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[250_000, 500_000, 1_000_000], help="characters of source per corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="FILE", help="write the results to FILE as a baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="flag results that regressed from the baseline in FILE")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="fraction of change allowed before flagging")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.seed)
+    print(f"{'benchmark':<34} {'tokens':>9} {'tokens/s':>12} {'peak MB':>8} {'bytes/token':>12}")
+    for key, result in results.items():
+        print(
+            f"{key:<34} {result['tokens']:>9,} {result['tokens_per_second']:>12,.0f} "
+            f"{result['peak_bytes'] / 1e6:>8.2f} {result['peak_bytes'] / result['tokens']:>12.1f}"
+        )
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("seed") != args.seed:
+            print("Warning: the baseline was made from a different seed.")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        status = 1 if regressions else 0
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "seed": args.seed,
+                    "results": results,
+                },
+                file,
+                indent=4,
+            )
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(command_line())
@@ -0,0 +1,60 @@
+import sys
+
+sys.path.append("..")
+import os
+import pickle
+from batch import *
+from lexer import Lexer
+
+COMPILER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+EXAMPLES_DIR = os.path.join(COMPILER_DIR, "..", "Example Programs")
+
+
+def test_find_sources(tmp_path):
+    (tmp_path / "a.vws").write_text("a")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.vws").write_text("b")
+    (tmp_path / "sub" / "c.js").write_text("c")
+    assert find_sources([str(tmp_path)]) == [str(tmp_path / "a.vws"), str(tmp_path / "sub" / "b.vws")]
+    assert find_sources([str(tmp_path / "*.vws"), str(tmp_path / "a.vws")]) == [str(tmp_path / "a.vws")]
+    assert find_sources([str(tmp_path / "sub" / "c.js")]) == [str(tmp_path / "sub" / "c.js")]
+    assert find_sources([str(tmp_path / "missing.vws")]) == []
+
+
+def test_lex_files_in_parallel():
+    paths = find_sources([EXAMPLES_DIR])
+    results = list(lex_files(paths, workers=2))
+    assert [result.path for result in results] == paths
+    for result in results:
+        assert result.ok
+        with open(result.path) as file:
+            assert list(result.tokens) == Lexer(code_string=file.read()).lex()
+
+
+def test_lex_file_errors(tmp_path):
+    (tmp_path / "bad.vws").write_text("a = 1;\nb = 2 @ 3;\nc = 4;")
+    result = lex_file(str(tmp_path / "bad.vws"))
+    assert not result.ok
+    assert result.line == 2 and result.column == 6 and result.error == "Invalid Operator/Symbol @"
+    assert len(result.tokens) == 7
+    assert lex_file(str(tmp_path / "missing.vws")).error is not None
+
+
+def test_results_pickle(tmp_path):
+    (tmp_path / "bad.vws").write_text('x = "{y}" + x; ~@')
+    result = lex_file(str(tmp_path / "bad.vws"))
+    copy = pickle.loads(pickle.dumps(result))
+    assert list(copy.tokens) == list(result.tokens)
+    assert copy.tokens.error.message == result.tokens.error.message
+    assert copy.tokens.error.line == 1 and copy.tokens.error.column == result.tokens.error.column == 16
+    assert copy.tokens.intern_name("x") == result.tokens.name_ids[0]
+
+
+def test_command_line(tmp_path, capsys):
+    (tmp_path / "good.vws").write_text("a = 1;")
+    (tmp_path / "bad.vws").write_text("\n\n$")
+    assert command_line([str(tmp_path), "-j", "2"]) == 1
+    output = capsys.readouterr().out
+    assert f"{tmp_path / 'bad.vws'}:3:1: Invalid Operator/Symbol $" in output
+    assert "2 files, 4 tokens, 1 with errors" in output
+    assert command_line([str(tmp_path / "good.vws"), "--engine", "regex"]) == 0
@@ -0,0 +1,46 @@
+import sys
+
+sys.path.append("..")
+sys.path.append("../Benchmarks")
+from corpus import KINDS, generate
+from lexer import Lexer, Engine
+from syntax_error import SyntaxError
+import lexer_benchmark
+
+
+def test_corpora_lex_cleanly():
+    for kind in KINDS:
+        source = generate(kind, 20000)
+        assert len(source) >= 20000
+        tokens = Lexer(code_string=source).lex()
+        assert tokens and not isinstance(tokens[-1], SyntaxError), kind
+        assert Lexer(code_string=source, engine=Engine.REGEX).lex() == tokens, kind
+
+
+def test_corpora_are_reproducible():
+    assert generate("strings", 5000, seed=3) == generate("strings", 5000, seed=3)
+    assert generate("strings", 5000, seed=3) != generate("strings", 5000, seed=4)
+
+
+def test_run_and_compare():
+    results = lexer_benchmark.run(["numbers"], ["lex", "lex_stream"], ["char"], 2000, repeat=1)
+    assert set(results) == {"numbers/lex/char", "numbers/lex_stream/char"}
+    assert results["numbers/lex/char"]["tokens"] == results["numbers/lex_stream/char"]["tokens"] > 0
+    assert lexer_benchmark.compare(results, results, 0.1) == []
+
+    slower = {key: dict(result, tokens_per_second=result["tokens_per_second"] * 2) for key, result in results.items()}
+    assert len(lexer_benchmark.compare(results, slower, 0.1)) == 2
+    grown = dict(results)
+    grown["numbers/lex/char"] = dict(results["numbers/lex/char"], peak_bytes=10**7)
+    assert lexer_benchmark.compare(grown, results, 0.1) == [
+        f"numbers/lex/char: peak memory 10,000,000 bytes, up from {results['numbers/lex/char']['peak_bytes']:,}"
+    ]
+
+
+def test_parser_benchmark_run():
+    import parser_benchmark
+
+    results = parser_benchmark.run([2000, 4000], repeat=1)
+    assert set(results) == {"expressions/parse/2000", "expressions/parse/4000"}
+    assert 0 < results["expressions/parse/2000"]["tokens"] < results["expressions/parse/4000"]["tokens"]
+    assert lexer_benchmark.compare(results, results, 0.1) == []
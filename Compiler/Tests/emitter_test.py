@@ -0,0 +1,196 @@
+import sys
+
+sys.path.append("..")
+sys.path.append("../Benchmarks")
+import io
+import json
+import re
+import shutil
+import subprocess
+import pytest
+from corpus import generate
+from emitter import *
+
+
+def js(code: str) -> str:
+    output = io.StringIO()
+    emit(code, output)
+    return output.getvalue()
+
+
+def decode_mappings(mappings: str) -> list:
+    """Decodes mappings into absolute (line, column, source line, source column, name index) segments."""
+    values = {digit: index for index, digit in enumerate(BASE64_DIGITS)}
+    segments = []
+    fields = [0, 0, 0, 0, 0]
+    for line, line_mappings in enumerate(mappings.split(";")):
+        fields[0] = 0
+        for segment in filter(None, line_mappings.split(",")):
+            numbers = []
+            value = shift = 0
+            for digit in segment:
+                digit = values[digit]
+                value += (digit & 31) << shift
+                shift += 5
+                if not digit & 32:
+                    numbers.append(-(value >> 1) if value & 1 else value >> 1)
+                    value = shift = 0
+            for index, number in enumerate(numbers):
+                fields[index] += number
+            segments.append((line, fields[0], fields[2], fields[3], fields[4] if len(numbers) == 5 else None))
+    return segments
+
+
+def test_vlq():
+    assert [vlq(value) for value in [0, 1, -1, 15, 16, 123, -17]] == ["A", "C", "D", "e", "gB", "2H", "jB"]
+    assert decode_mappings("AAAA,CACC;;IAAG") == [(0, 0, 0, 0, None), (0, 1, 1, 1, None), (2, 4, 1, 4, None)]
+
+
+@pytest.mark.parametrize(
+    "code, expected",
+    [
+        ("n = 12395n;\nn = .2;", "let n = 12395n;\nn = .2;\n"),
+        ("x = a > b and not c == 2;", "let x = a > b && !(c === 2);\n"),
+        ("x = (a + b) * c ** -d;", "let x = (a + b) * c ** -d;\n"),
+        ("-a ** 2 + - -b", "-(a ** 2) + - -b;\n"),
+        ("a ?? b or c", "a ?? (b || c);\n"),
+        ("x ||= a || b && ~c", "x |= a | b & ~c;\n"),
+        ("y = f(g, ...h)[0].k?.m ?? [1, infinity, this];", "let y = f(g, ...h)[0].k?.m ?? [1, Infinity, this];\n"),
+        ("x = `^a/b\\`$`gi;", "let x = /^a\\/b`$/gi;\n"),
+        ('log("{a} costs $5 `{"{b /* } */ }"}`");', "console.log(`${a} costs \\$5 \\`${`${b}`}\\``);\n"),
+        ("x = 1 .a + 1.5 .b + 0x1F .c;", "let x = (1).a + 1.5.b + 0x1F.c;\n"),
+        ("log = 1; log(2);", "let log = 1;\nlog(2);\n"),
+        ("o = {a: 1, b: {c: 2}};", "let o = {a: 1, b: {c: 2}};\n"),
+        ("{a: 1}.a", "({a: 1}.a);\n"),
+        ("log(a.log, b?.err);", "console.log(a.log, b?.err);\n"),
+        (
+            "x = {\n    y = 1;\n    y + x\n}\n{ y = 2; }",
+            "let x = function () {\n    let y = 1;\n    return y + x;\n}();\n{\n    let y = 2;\n}\n",
+        ),
+    ],
+)
+def test_emits_javascript(code, expected):
+    assert js(code) == expected
+
+
+@pytest.mark.parametrize("code", ["a = b..c;", "x = (a..);", "a: b", "x = _;", "a | b"])
+def test_unsupported(code):
+    with pytest.raises(SyntaxError, match="Unsupported In JavaScript Output"):
+        js(code)
+
+
+@pytest.mark.parametrize("code", ["a.(b);", "a.-b;", "a.[1];", "a.'x';", "a?.{c};"])
+def test_property_must_be_a_name(code):
+    with pytest.raises(SyntaxError, match="Expected A Property Name After"):
+        js(code)
+
+
+@pytest.mark.parametrize(
+    "code, message",
+    [
+        ("1 = b;", "Expected An Assignment Target Before ="),
+        ("true = 0x1F;", "Expected An Assignment Target Before ="),
+        ('"x{a}" = a;', "Expected An Assignment Target Before ="),
+        ("a?.b[0] += 1;", "Expected An Assignment Target Before +="),
+        ("...b;", "Spread Only Allowed In Arrays And Call Arguments"),
+        ("-...log;", "Spread Only Allowed In Arrays And Call Arguments"),
+        ("a ** ...b;", "Spread Only Allowed In Arrays And Call Arguments"),
+        ("{a: ...b};", "Spread Only Allowed In Arrays And Call Arguments"),
+    ],
+)
+def test_invalid_targets_and_spreads(code, message):
+    with pytest.raises(SyntaxError, match=re.escape(message)):
+        js(code)
+
+
+def test_valid_targets_and_spreads():
+    assert js("a.b[0] = 1; (a?.b).c = 2; f().x += 3;") == "a.b[0] = 1;\n(a?.b).c = 2;\nf().x += 3;\n"
+    assert js("log(...a, [1, ...b]);") == "console.log(...a, [1, ...b]);\n"
+
+
+def test_command_line_prints_syntax_errors(tmp_path, capsys):
+    path = tmp_path / "bad.vws"
+    path.write_text("x = 1;\ny = a.(b);")
+    command_line([str(path)])
+    assert capsys.readouterr().out.endswith("Expected A Property Name After .\nLine: 2, Column: 6\n")
+
+
+def test_source_map():
+    code = 'total = 0;\nfor_each(items, {\n    total += "é {item}".length\n});'
+    output, source_map = io.StringIO(), io.StringIO()
+    emit(code, output, source_map, file="out.js", source_name="in.vws")
+    generated = output.getvalue()
+    source_map = json.loads(source_map.getvalue())
+    assert source_map["version"] == 3 and source_map["file"] == "out.js" and source_map["sources"] == ["in.vws"]
+    assert source_map["names"] == ["total", "for_each", "items", "item", "length"]
+    segments = decode_mappings(source_map["mappings"])
+    generated_lines = generated.split("\n")
+    source_lines = code.split("\n")
+    named = []
+    for line, column, source_line, source_column, name_index in segments:
+        if name_index is not None:
+            name = source_map["names"][name_index]
+            # Both are plain ASCII up to the names, apart from the é, which is one UTF-16 unit.
+            assert generated_lines[line][column:].startswith(name)
+            assert source_lines[source_line][source_column:].startswith(name)
+            named.append((line, name))
+    assert named == [(0, "total"), (1, "for_each"), (1, "items"), (2, "total"), (2, "item"), (2, "length")]
+
+
+def test_source_map_columns_count_utf16():
+    code = 'x = "𝒳 {y}";'
+    output, source_map = io.StringIO(), io.StringIO()
+    emit(code, output, source_map)
+    segments = decode_mappings(json.loads(source_map.getvalue())["mappings"])
+    # The surrogate pair before y counts as two columns in both.
+    assert (0, 14, 0, 9, 1) in segments
+
+
+def test_output_is_written_in_chunks():
+    class Recorder(io.StringIO):
+        def __init__(self):
+            super().__init__()
+            self.writes = 0
+
+        def write(self, text):
+            self.writes += 1
+            return super().write(text)
+
+    code = "value = value + 1;\n" * 2000
+    output = Recorder()
+    source = Parser(Lexer(code_string=code).lex_stream()).iter_module()
+    emitter = Emitter(output, code, chunk_size=1000)
+    emitter.emit_statements(source)
+    assert output.getvalue() == "let value = value + 1;\n" + "value = value + 1;\n" * 1999
+    assert output.writes >= len(output.getvalue()) // 1000
+    assert len(emitter._chunks) == 0
+
+
+def test_source_maps_off_use_the_plain_writes():
+    emitter = Emitter(io.StringIO(), "")
+    assert emitter.write.__func__ is Emitter.write
+    assert emitter.write_token.__func__ is Emitter.write_token
+    assert "write" not in vars(emitter)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node to check the JavaScript")
+def test_corpus_emits_valid_javascript(tmp_path):
+    source = generate("expressions", 30000)
+    output = io.StringIO()
+    emitter = Emitter(output, source)
+    for statement in Parser(Lexer(code_string=source).lex_stream()).iter_module():
+        try:
+            emitter.statement(statement)
+        except SyntaxError as error:
+            # Ranges have no JavaScript output yet.
+            assert error.message.startswith("Unsupported In JavaScript Output")
+            # Drop the half written statement.
+            emitter._chunks.clear()
+            emitter._size = 0
+            emitter.indent = ""
+            del emitter.scopes[1:]
+        emitter.flush()
+    path = tmp_path / "corpus.js"
+    path.write_text(output.getvalue())
+    result = subprocess.run(["node", "--check", str(path)], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
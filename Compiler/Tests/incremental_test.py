@@ -0,0 +1,149 @@
+import sys
+
+sys.path.append("..")
+import glob
+import os
+import random
+import pytest
+from incremental import *
+from lexer import Lexer, Engine
+
+COMPILER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CORPUS = [os.path.join(COMPILER_DIR, "sample_1.vws")] + sorted(
+    glob.glob(os.path.join(COMPILER_DIR, "..", "Example Programs", "*", "*.vws"))
+)
+SNIPPETS = ["x", " ", "\n", "{", "}", '"', "'", "/*", "*/", "//", "12", ".", "=", '"a {b} c"', "fn ", "&"]
+
+
+def comparable(tokens):
+    return [(type(t), str(t)) if isinstance(t, Exception) else t for t in tokens]
+
+
+def random_edit(rng: random.Random, source: str) -> TextEdit:
+    offset = rng.randint(0, len(source))
+    deleted_length = rng.randint(0, min(8, len(source) - offset))
+    inserted_text = "".join(rng.choices(SNIPPETS, k=rng.randint(0, 3)))
+    return TextEdit(offset, deleted_length, inserted_text)
+
+
+def argument_tokens(tokens):
+    """Yields the tokens in the template string arguments of tokens, at any depth."""
+    for token in tokens:
+        if isinstance(token, Token) and token.type == TokenType.TEMPLATE_STRING:
+            for arguments in token.name[1].values():
+                yield from arguments
+                yield from argument_tokens(arguments)
+
+
+def assert_symbols_consistent(tokens):
+    names = {}
+    for token in tokens:
+        if isinstance(token, Token) and token.type == TokenType.IDENTIFIER:
+            assert names.setdefault(token.symbol, token.name) == token.name
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_relex_matches_full_lex(engine, path):
+    with open(path) as file:
+        source = file.read()
+    rng = random.Random(path)
+    tokens = Lexer(code_string=source, engine=engine).lex()
+    buffer = Lexer(code_string=source, engine=engine).lex_buffer()
+    for _ in range(60):
+        edit = random_edit(rng, source)
+        new_source, tokens = relex(source, tokens, edit, engine=engine)
+        buffer_source, buffer = relex(source, buffer, edit, engine=engine)
+        assert new_source == buffer_source == edit.apply(source)
+        expected = Lexer(code_string=new_source, engine=engine).lex()
+        assert comparable(tokens) == comparable(expected)
+        assert [t.column for t in tokens if isinstance(t, Token)] == [t.column for t in expected if isinstance(t, Token)]
+        assert_symbols_consistent(tokens)
+        assert list(buffer) == [t for t in expected if not isinstance(t, SyntaxError)]
+        assert [t.column for t in argument_tokens(buffer)] == [t.column for t in argument_tokens(expected)]
+        assert (buffer.error is None) == (not expected or not isinstance(expected[-1], SyntaxError))
+        if buffer.error is not None:
+            assert buffer.error.line == expected[-1].line
+        source = new_source
+
+
+def test_relex_span_tokens():
+    source = 'a = "x {b} y";\n/* c */\nd = 1;'
+    tokens = Lexer(code_string=source, spans=True).lex()
+    new_source, tokens = relex(source, tokens, TextEdit(0, 1, "alpha\n"), spans=True)
+    assert all(isinstance(token, SpanToken) and token.source is new_source for token in tokens)
+    assert tokens == Lexer(code_string=new_source).lex()
+    assert tokens[-2].line == 4
+
+
+def test_relex_only_lexes_near_the_edit():
+    source = "a = 1;\n" * 1000
+    tokens = Lexer(code_string=source).lex()
+    relexed = []
+    original_make_token = Lexer.make_token
+
+    def counting_make_token(self, *args, **kwargs):
+        token = original_make_token(self, *args, **kwargs)
+        relexed.append(token)
+        return token
+
+    Lexer.make_token = counting_make_token
+    try:
+        new_source, new_tokens = relex(source, tokens, TextEdit(3500, 1, "bb"))
+    finally:
+        Lexer.make_token = original_make_token
+    assert new_tokens == Lexer(code_string=new_source).lex()
+    assert len(relexed) <= 3
+
+
+def test_relex_interns_into_the_symbol_table():
+    source = "a = b;\nc = a;"
+    lexer = Lexer(code_string=source)
+    tokens = lexer.lex()
+    new_source, tokens = relex(source, tokens, TextEdit(7, 1, "d"), symbols=lexer.symbols)
+    assert new_source == "a = b;\nd = a;"
+    assert lexer.symbols.names == ["a", "b", "c", "d"]
+    assert [t.symbol for t in tokens if t.type == TokenType.IDENTIFIER] == [0, 1, 3, 0]
+
+
+def errors_of(errors):
+    return [(e.message, e.line, e.column) for e in errors]
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_relex_recovers_from_errors(engine):
+    source = 'a = 1;\nb = 3;\nc = "{d &}" @ 4;'
+    lexer = Lexer(code_string=source, engine=engine, recover=True)
+    tokens, errors = lexer.lex(), lexer.errors
+    buffer = Lexer(code_string=source, engine=engine, recover=True).lex_buffer()
+    edits = [TextEdit(6, 0, " @"), TextEdit(2, 0, "\n\n"), TextEdit(24, 1, ""), TextEdit(7, 0, "`x`q")]
+    for edit in edits:
+        new_source, tokens = relex(source, tokens, edit, engine=engine, recover=True, errors=errors)
+        _, buffer = relex(source, buffer, edit, engine=engine, recover=True)
+        source = new_source
+        expected = Lexer(code_string=source, engine=engine, recover=True)
+        assert tokens == expected.lex() and list(buffer) == tokens and buffer.error is None
+        assert errors_of(errors) == errors_of(expected.errors)
+
+
+def test_relex_recover_inserting_an_error():
+    source = "a = 1;\nb = 3;\nc = 4;"
+    lexer = Lexer(code_string=source, recover=True)
+    tokens = lexer.lex()
+    new_source, tokens = relex(source, tokens, TextEdit(9, 0, "@"), recover=True, errors=lexer.errors)
+    expected = Lexer(code_string=new_source, recover=True)
+    assert len(tokens) == 12 and tokens == expected.lex()
+    assert errors_of(lexer.errors) == errors_of(expected.errors) == [("Invalid Operator/Symbol @", 2, 2)]
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_relex_recover_closing_a_template_string(engine):
+    # The unterminated template string is an ERROR token that the edit, far after it, turns into a string.
+    source = 'x = "{a} + b;\ny = c;\nz = d;'
+    lexer = Lexer(code_string=source, engine=engine, recover=True)
+    tokens = lexer.lex()
+    edit = TextEdit(len(source), 0, '"')
+    new_source, tokens = relex(source, tokens, edit, engine=engine, recover=True, errors=lexer.errors)
+    expected = Lexer(code_string=new_source, engine=engine, recover=True)
+    assert tokens == expected.lex() and [t.type for t in tokens][-1] == TokenType.TEMPLATE_STRING
+    assert lexer.errors == expected.errors == []
@@ -2,6 +2,7 @@ import sys
 
 sys.path.append("..")
 import pytest
+import string
 from lex_data import *
 
 
@@ -182,3 +183,71 @@ def test_binary_regex():
     ]
     for test, result in binary_tests:
         assert Formats.is_binary(test) == result
+
+
+def test_lexeme_table():
+    assert LEXEMES["**="] == (TokenType.OPERATOR, Operator.EXPONENT_ASSIGN)
+    assert LEXEMES["and"] == (TokenType.OPERATOR, Operator.AND)
+    assert LEXEMES["fn"] == (TokenType.KEYWORD, Keyword.FUNCTION)
+    assert LEXEMES["!"] == (TokenType.KEYWORD, Keyword.EXCLAMATION)
+    assert LEXEMES[";"] == (TokenType.CODE_DELIMITER, CodeDelimiter.END_STATEMENT)
+    assert "not_a_lexeme" not in LEXEMES
+    assert len(LEXEMES) == len(Operator) + len(Keyword) + len(CodeDelimiter)
+
+
+def test_number_kind():
+    kinds = {
+        "0": NumberKind.INTEGER,
+        "120": NumberKind.INTEGER,
+        "1.5": NumberKind.FLOAT,
+        "5.": NumberKind.FLOAT,
+        ".5e-3": NumberKind.FLOAT,
+        "1E+10": NumberKind.FLOAT,
+        "0.0": NumberKind.FLOAT,
+        "12n": NumberKind.BIGINT,
+        "0n": NumberKind.BIGINT,
+        "0x1F": NumberKind.HEX,
+        "0XaBn": NumberKind.HEX,
+        "0o17": NumberKind.OCTAL,
+        "0b101n": NumberKind.BINARY,
+        "01": None,
+        "1.5n": None,
+        "0x": None,
+        "0b2": None,
+        "1e": None,
+    }
+    for test, kind in kinds.items():
+        assert Formats.number_kind(test) == kind, test
+        assert Formats.is_number(test) == (kind is not None)
+    # The combined regex accepts exactly what the separate ones do.
+    for test in kinds:
+        assert Formats.is_number(test) == (
+            Formats.is_float_int(test)
+            or Formats.is_bigint(test)
+            or Formats.is_hex(test)
+            or Formats.is_octal(test)
+            or Formats.is_binary(test)
+        )
+    # Unlike \d in FLOAT_INT_REGEX, NUMBER_REGEX only accepts ASCII digits, as the lexers do.
+    assert Formats.is_float_int("٣")
+    assert Formats.is_number("٣") is False and Formats.number_kind("٣") is None
+
+
+def test_enum_members_are_their_lexemes():
+    # Members used to be built on empty strings, so all operators compared equal to each other.
+    assert Operator.GT != Operator.ASSIGN
+    assert Operator.GT == ">" and str(Operator.GT) == ">"
+    assert Comment.MULTI_LINE_COMMENT == "/*"
+
+
+def test_char_classes():
+    assert CHAR_CLASSES["a"] == CHAR_CLASSES["#"] == CharClass.WORD
+    assert CHAR_CLASSES["7"] == CharClass.DIGIT
+    assert CHAR_CLASSES["\t"] == CharClass.WHITESPACE
+    assert CHAR_CLASSES["/"] == CharClass.COMMENT_START
+    assert CHAR_CLASSES["+"] == CharClass.SYMBOL
+    assert CHAR_CLASSES["'"] == CHAR_CLASSES["`"] == CharClass.STRING
+    assert CHAR_CLASSES['"'] == CharClass.TEMPLATE_STRING
+    # Every printable ASCII character starts something, and nothing else does.
+    assert set(CHAR_CLASSES) == set(string.printable)
+    assert "é" not in CHAR_CLASSES and "\u00a0" not in CHAR_CLASSES
@@ -0,0 +1,50 @@
+import sys
+
+sys.path.append("..")
+import pytest
+from collections import Counter
+from lex_stats import LexStats
+from lexer import Lexer, Engine, command_line
+from lex_data import TokenType
+
+CODE = '/* doc */ x = "a{b + 1}c" + `r`g; fn f() { return .5 * 0x1F; } // end\n'
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_stats_match_tokens(engine):
+    stats = LexStats()
+    tokens = Lexer(code_string=CODE, engine=engine, stats=stats).lex()
+    assert tokens == Lexer(code_string=CODE, engine=engine).lex()
+    assert {token_type: tally.count for token_type, tally in stats.token_types.items()} == Counter(
+        token.type for token in tokens
+    )
+    assert stats.token_types[TokenType.TEMPLATE_STRING].characters == len('"a{b + 1}c"')
+    assert stats.total.count == len(tokens)
+    assert stats.total.characters == sum(token.end - token.start + 1 for token in tokens)
+    assert stats.total.seconds > 0
+    # The template's argument is lexed through the word, symbol and number branches.
+    assert stats.branches["word"].count == 5
+    assert stats.branches["number"].count == 3
+    assert stats.branches["template"].count == 2
+    assert "IDENTIFIER" in stats.report()
+
+
+def test_stats_accumulate_and_cost_nothing_when_off():
+    lexer = Lexer(code_string=CODE)
+    # Without stats nothing is wrapped, so lexing runs the class's own methods.
+    assert not {"lex_stream", "word", "symbol", "number"} & set(vars(lexer))
+    stats = LexStats()
+    Lexer(code_string=CODE, stats=stats).lex()
+    Lexer(code_string=CODE, stats=stats).lex()
+    assert stats.total.count == 2 * len(lexer.lex())
+
+
+def test_command_line_stats(tmp_path, capsys):
+    path = tmp_path / "code.vws"
+    path.write_text(CODE)
+    command_line([str(path), "--stats"])
+    output = capsys.readouterr().out
+    assert "token type" in output and "branch" in output
+    assert output.strip().endswith("seconds")
+    command_line([str(path)])
+    assert "token type" not in capsys.readouterr().out
@@ -0,0 +1,637 @@
+import sys
+
+sys.path.append("..")
+sys.path.append("../Benchmarks")
+import glob
+import os
+import pytest
+from lexer import *
+from lex_data import NumberKind, Operator
+from tokens import TokenStream, LineIndex
+from char_stream_benchmark import PropertyCharStream, walk
+
+COMPILER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CORPUS = [os.path.join(COMPILER_DIR, "sample_1.vws")] + sorted(
+    glob.glob(os.path.join(COMPILER_DIR, "..", "Example Programs", "*", "*.vws"))
+)
+
+
+def lex_both(code: str):
+    char_tokens = Lexer(code_string=code, engine=Engine.CHAR).lex()
+    regex_tokens = Lexer(code_string=code, engine=Engine.REGEX).lex()
+    return char_tokens, regex_tokens
+
+
+def without_errors(tokens):
+    return [(type(t), str(t)) if isinstance(t, Exception) else t for t in tokens]
+
+
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_engines_agree_on_corpus(path):
+    with open(path) as file:
+        char_tokens, regex_tokens = lex_both(file.read())
+    assert not any(isinstance(t, Exception) for t in char_tokens)
+    assert char_tokens == regex_tokens
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        'x = `a/b\\`c`gi;',
+        'x = "a$b {y} {"in{z}"} c";',
+        "x = 1e+5 + 2.5E-3;",
+        "/*/ x */ y",
+        "// a\nb",
+        'a "b {',
+        "'abc",
+        "`a`gg",
+        ".5e-3 1.2.3 1..10",
+        "x += -1",
+        '"a\\"{b}"',
+        "é",
+        "/* open",
+        "a //",
+        "aé = 1",
+        "x\u00a0= 1",
+        " \t\n\r\f\v x" + " " * 300 + "y" * 300 + "\n\n",
+        "'é' + `é`u /* é */ \"é {x}\" // é",
+    ],
+)
+def test_engines_agree_on_edge_cases(code):
+    char_tokens, regex_tokens = lex_both(code)
+    assert without_errors(char_tokens) == without_errors(regex_tokens)
+
+
+def test_token_spans():
+    code = "fn f(a) { 'str' + 12.5e+2 } // done\n/* multi\nline */ `re/x`g"
+    tokens = Lexer(code_string=code).lex()
+    assert [code[t.start : t.end + 1] for t in tokens] == [
+        "fn", "f", "(", "a", ")", "{", "'str'", "+", "12.5e+2", "}",
+        "// done\n", "/* multi\nline */", "`re/x`g",
+    ]
+    assert tokens[-1].name == "`re\\/xg"
+    assert tokens[-1].line == 3
+
+
+def test_regex_engine_errors():
+    with pytest.raises(SyntaxError):
+        RegexLexer("x = 01;").lex()
+    with pytest.raises(SyntaxError):
+        RegexLexer("x = '").lex()
+    with pytest.raises(SyntaxError):
+        RegexLexer("x = `a`gx").lex()
+    with pytest.raises(ValueError):
+        Lexer(code_string="", engine="not_an_engine")
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_symbol_maximal_munch(engine):
+    cases = {
+        "a=-b": ["a", "=", "-", "b"],
+        "x+=-1": ["x", "+=", "-", "1"],
+        "f(a)+(b)": ["f", "(", "a", ")", "+", "(", "b", ")"],
+        "a>>>=b>>>c>>d": ["a", ">>>=", "b", ">>>", "c", ">>", "d"],
+        "x?.y??=z": ["x", "?.", "y", "??=", "z"],
+        "[...a,..=]": ["[", "...", "a", ",", "..=", "]"],
+        "!a!=b": ["!", "a", "!=", "b"],
+        "a=//c": ["a", "=", "//c"],
+    }
+    for code, expected in cases.items():
+        tokens = Lexer(code_string=code, engine=engine).lex()
+        assert [code[t.start : t.end + 1] for t in tokens] == expected
+    assert Lexer(code_string="x+=-1", engine=engine).lex()[1].name == Operator.PLUS_ASSIGN
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_invalid_symbols(engine):
+    for code, message in [("a & b", "Invalid Operator/Symbol &"), ("a @ b", "Invalid Operator/Symbol @")]:
+        error = Lexer(code_string=code, engine=engine).lex()[-1]
+        assert isinstance(error, SyntaxError)
+        assert error.message == message
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_error_columns(engine):
+    cases = {
+        "a = 1;\n  b = 2 @ 3;": (2, 8),
+        "\n\n$": (3, 0),
+        'x = 1;\ny = "a {b + 1': (2, 4),
+        "x = 0x;": (1, 4),
+    }
+    for code, location in cases.items():
+        error = Lexer(code_string=code, engine=engine).lex()[-1]
+        assert (error.line, error.column) == location, code
+        assert str(error).endswith(f"Line: {location[0]}, Column: {location[1] + 1}")
+        lexer = Lexer(code_string=code, engine=engine, recover=True)
+        lexer.lex()
+        assert [(e.line, e.column) for e in lexer.errors] == [location]
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_span_tokens_match_tokens(engine, path):
+    with open(path) as file:
+        code = file.read()
+    tokens = Lexer(code_string=code, engine=engine).lex()
+    span_tokens = Lexer(code_string=code, engine=engine, spans=True).lex()
+    assert all(isinstance(token, SpanToken) for token in span_tokens)
+    assert span_tokens == tokens
+    assert tokens == span_tokens
+
+
+def test_span_token_names():
+    code = 'x = "a$b {y} \\{c}" + `a/b`g; // note'
+    tokens = Lexer(code_string=code, spans=True).lex()
+    assert tokens[0].name == "x" and tokens[0].text == "x"
+    assert tokens[1].name is Operator.ASSIGN
+    assert tokens[2].name[0] == '"a\\$b  \\{c}"'
+    assert tokens[2].text == '"a$b {y} \\{c}"'
+    assert tokens[4].name == "`a\\/bg"
+    assert tokens[-1].name == "// note"
+    assert repr(tokens[0]) == "SpanToken(type=<TokenType.IDENTIFIER: 3>, name='x', line=1, start=0, end=0)"
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_template_argument_offsets(engine):
+    code = 'x = "a{b}cd{e + "{f}"}$";'
+    tokens = Lexer(code_string=code, engine=engine).lex()
+    string = tokens[2]
+    text, template_arguments = string.name
+    assert text == '"acd\\$"'
+    # Each key is the offset of the argument's opening brace within the string.
+    assert list(template_arguments) == [2, 7]
+    for offset in template_arguments:
+        assert code[string.start + offset] == "{"
+    assert [t.name for t in template_arguments[2]] == ["b"]
+    assert [t.start for t in template_arguments[7]] == [12, 14, 16]
+    inner = template_arguments[7][2]
+    assert inner.name == ('""', {1: [Token(TokenType.IDENTIFIER, "f", 1, 18, 18)]})
+    assert [code[t.start : t.end + 1] for t in tokens[3:]] == [";"]
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_deeply_nested_templates(engine):
+    # Far deeper than the recursion limit, which a recursive lexer would hit.
+    depth = sys.getrecursionlimit() * 2
+    code = '"{' * depth + "x" + '}"' * depth + " + {}"
+    tokens = Lexer(code_string=code, engine=engine).lex()
+    assert [t.type for t in tokens] == [
+        TokenType.TEMPLATE_STRING, TokenType.OPERATOR, TokenType.CODE_DELIMITER, TokenType.CODE_DELIMITER
+    ]
+    string, levels = tokens[0], 0
+    while string.type == TokenType.TEMPLATE_STRING:
+        (argument,) = string.name[1].values()
+        string, levels = argument[0], levels + 1
+    assert string == Token(TokenType.IDENTIFIER, "x", 1, depth * 2, depth * 2)
+    assert levels == depth
+    error = Lexer(code_string='"{' * depth, engine=engine).lex()[-1]
+    assert isinstance(error, SyntaxError)
+
+
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_token_buffer(path):
+    with open(path) as file:
+        code = file.read()
+    tokens = Lexer(code_string=code).lex()
+    buffer = Lexer(code_string=code).lex_buffer()
+    assert buffer.error is None
+    assert len(buffer) == len(tokens)
+    assert list(buffer) == tokens
+    # Operators and keywords compare equal to their lexemes, so the reprs check that each kept its member.
+    assert [repr(t.name) for t in buffer] == [repr(t.name) for t in tokens]
+    assert buffer[-1] == tokens[-1] and buffer[3:7] == tokens[3:7]
+    assert len(buffer.names) < len(tokens)
+
+
+def test_token_buffer_interning_and_errors():
+    buffer = Lexer(code_string='a b a "{a}" "{a}" a &').lex_buffer()
+    assert isinstance(buffer.error, SyntaxError)
+    assert [token.name for token in buffer][:3] == ["a", "b", "a"]
+    assert buffer.name_ids[0] == buffer.name_ids[2] == buffer.name_ids[5]
+    assert buffer.name_ids[3] != buffer.name_ids[4]
+    assert buffer[0].name is buffer[2].name
+
+
+def test_token_buffer_keeps_operators_apart():
+    tokens = Lexer(code_string="a = b > c + d . e").lex()
+    buffer = TokenBuffer(tokens)
+    assert [t.name for t in buffer] == [t.name for t in tokens]
+    assert [repr(t.name) for t in buffer] == [repr(t.name) for t in tokens]
+
+
+def test_token_buffer_memory():
+    import tracemalloc
+
+    code = "fn f(alpha, beta) { alpha.gamma += beta * 2; }\n" * 2000
+    tokens = Lexer(code_string=code).lex()
+    tracemalloc.start()
+    listed = list(Token(t.type, t.name, t.line, t.start, t.end) for t in tokens)
+    list_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    buffer = TokenBuffer(tokens)
+    buffer_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert buffer_size * 2 < list_size
+
+
+def test_token_fields_and_repr():
+    token = Token(TokenType.IDENTIFIER, "x", 1, 0, 0)
+    assert not hasattr(token, "__dict__")
+    assert token == Token(TokenType.IDENTIFIER, "x", 1, 0, 0)
+    assert token != Token(TokenType.IDENTIFIER, "y", 1, 0, 0)
+    assert repr(token) == "Token(type=<TokenType.IDENTIFIER: 3>, name='x', line=1, start=0, end=0)"
+
+
+def test_slotted_token_memory():
+    import dataclasses
+    import tracemalloc
+
+    DictToken = dataclasses.make_dataclass(
+        "DictToken",
+        [(field.name, field.type, dataclasses.field(default=field.default)) for field in dataclasses.fields(Token)],
+    )
+
+    def allocated(token_class):
+        tracemalloc.start()
+        tokens = [token_class(TokenType.IDENTIFIER, "x", 1, 0, 0) for _ in range(10000)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return size
+
+    assert allocated(Token) * 1.3 < allocated(DictToken)
+
+
+def test_char_stream_is_slotted():
+    # The timing against the old property based CharStream is in Benchmarks/char_stream_benchmark.py.
+    assert not hasattr(CharStream("x"), "__dict__")
+    code = "value = word + 1;\n" * 200
+    assert walk(CharStream(code)) == walk(PropertyCharStream(code))
+
+
+def test_char_stream_eof_sentinel():
+    stream = CharStream("ab")
+    assert stream.peak(0) == EOF and stream.peak(1) == "a" and stream.peak(5) == EOF
+    assert stream.advance_next() == "a" and stream.advance_next() == "b"
+    assert stream.advance_next() == EOF and stream.advance_next() == EOF
+    assert stream.current_index == 1
+    assert stream.peak(1) == EOF and stream.peak(-1) == "a"
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+@pytest.mark.parametrize("code", ["'abc", "'abc\\", "`abc", "`abc\\`", '"abc', '"abc\\', '"{a', '"{a}', '"{"{'])
+def test_unterminated_constructs(engine, code):
+    error = Lexer(code_string=code, engine=engine).lex()[-1]
+    assert isinstance(error, SyntaxError)
+    assert error.message.startswith("Unterminated")
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_constructs_at_eof(engine):
+    tokens = Lexer(code_string="x.", engine=engine).lex()
+    assert [token.name for token in tokens] == ["x", Operator.DOT]
+    for code, names in [("12", ["12"]), ("`a`g", ["`ag"]), ("// c", ["// c"]), ("a /* c", ["a", "/* c"])]:
+        assert [token.name for token in Lexer(code_string=code, engine=engine).lex()] == names
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_stream_char_stream_matches_string(path, chunk_size):
+    import io
+
+    with open(path) as file:
+        code = file.read()
+    code += '\n/* é\n*/ x = "{a} {"{b}"} é" + `ë`g; // end'
+    expected = Lexer(code_string=code).lex()
+    assert Lexer(char_stream=StreamCharStream(io.StringIO(code), chunk_size)).lex() == expected
+    binary = io.BytesIO(code.encode("utf-8"))
+    assert Lexer(char_stream=StreamCharStream(binary, chunk_size)).lex() == expected
+
+
+def test_stream_char_stream_from_mmap(tmp_path):
+    import mmap
+
+    code = "x = 'ü' + \"{y}\";\n" * 500
+    path = tmp_path / "code.vws"
+    path.write_bytes(code.encode("utf-8"))
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        tokens = Lexer(char_stream=StreamCharStream(mapped, chunk_size=100)).lex()
+    assert tokens == Lexer(code_string=code).lex()
+
+
+def test_stream_char_stream_memory_is_bounded():
+    class GeneratedFile:
+        # Produces a large source on demand without ever holding it.
+        def __init__(self, repeats: int):
+            self.line = 'value = "item {index}" + 0x1F; /* note */\n'
+            self.remaining = repeats
+
+        def read(self, size: int) -> str:
+            count = min(self.remaining, max(1, size // len(self.line)))
+            self.remaining -= count
+            return self.line * count
+
+    stream = StreamCharStream(GeneratedFile(3000), chunk_size=1024)
+    line_length = len(stream.file.line)
+    count = longest_window = most_line_starts = 0
+    for _ in Lexer(char_stream=stream).lex_stream():
+        count += 1
+        longest_window = max(longest_window, len(stream.string))
+        most_line_starts = max(most_line_starts, len(stream.lines.starts))
+    assert count == 3000 * 7 and len(stream.lines) == 3001
+    # Only the text from the current token on is held, and the starts of the lines in it.
+    assert longest_window <= 2 * 1024
+    assert most_line_starts <= 2 * 1024 // line_length + 2
+
+
+def test_stream_char_stream_limits():
+    import io
+
+    with pytest.raises(ValueError):
+        Lexer(char_stream=StreamCharStream(io.StringIO("x")), engine=Engine.REGEX)
+    with pytest.raises(ValueError):
+        Lexer(char_stream=StreamCharStream(io.StringIO("x")), spans=True)
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_emit_filters_token_types(engine, path):
+    with open(path) as file:
+        code = file.read()
+    tokens = Lexer(code_string=code, engine=engine).lex()
+    code_types = set(TokenType) - COMMENT_TYPES
+    assert Lexer(code_string=code, engine=engine, emit=code_types).lex() == [
+        t for t in tokens if t.type not in COMMENT_TYPES
+    ]
+    assert Lexer(code_string=code, engine=engine, emit=COMMENT_TYPES).lex() == [
+        t for t in tokens if t.type in COMMENT_TYPES
+    ]
+    assert Lexer(code_string=code, engine=engine, emit=[TokenType.IDENTIFIER]).lex() == [
+        t for t in tokens if t.type == TokenType.IDENTIFIER
+    ]
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_emit_skipped_comments(engine):
+    code = '/* licence\n\n*/ x = "{a /* b */}" // c\n/*/ d */ y'
+    lines = [t.line for t in Lexer(code_string=code, engine=engine).lex()]
+    tokens = Lexer(code_string=code, engine=engine, emit=set(TokenType) - COMMENT_TYPES).lex()
+    assert [code[t.start : t.end + 1] for t in tokens] == ["x", "=", '"{a /* b */}"', "y"]
+    assert [t.line for t in tokens] == [3, 3, 3, 4] == [lines[1], lines[2], lines[3], lines[-1]]
+    # Comments in template arguments are left out along with the rest.
+    assert [t.name for t in tokens[2].name[1][1]] == ["a"]
+    comments = Lexer(code_string=code, engine=engine, emit=COMMENT_TYPES).lex()
+    assert [code[t.start : t.end + 1] for t in comments] == ["/* licence\n\n*/", "// c\n", "/*/ d */"]
+    unterminated = Lexer(code_string="x /* a\nb", engine=engine, emit=COMMENT_TYPES).lex()
+    assert [(t.line, t.end) for t in unterminated] == [(1, 7)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+def test_stream_char_stream_skips_comments(chunk_size):
+    import io
+
+    code = "a /* one\ntwo */ b // three\n c /*/ four **/ d /* five"
+    stream = StreamCharStream(io.StringIO(code), chunk_size)
+    tokens = Lexer(char_stream=stream, emit=[TokenType.IDENTIFIER]).lex()
+    assert [(t.name, t.line) for t in tokens] == [("a", 1), ("b", 2), ("c", 3), ("d", 3)]
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_recover_from_errors(engine):
+    code = "a = 1 @ b;\nc = 01;\nd = `x`q + e(f &);\n\"{g @}\" h"
+    lexer = Lexer(code_string=code, engine=engine, recover=True)
+    tokens = lexer.lex()
+    errors = [t for t in tokens if t.type == TokenType.ERROR]
+    assert [(code[t.start : t.end + 1], t.line) for t in errors] == [("@", 1), ("01", 2), ("`x`q", 3), ("&", 3)]
+    assert errors[0].name == "Invalid Operator/Symbol @"
+    # Lexing goes on from the boundary, so the tokens around each error are all there.
+    assert [code[t.start : t.end + 1] for t in tokens if t.type != TokenType.ERROR][:6] == ["a", "=", "1", "b", ";", "c"]
+    template = tokens[-2]
+    assert template.type == TokenType.TEMPLATE_STRING
+    assert [t.type for t in template.name[1][1]] == [TokenType.IDENTIFIER, TokenType.ERROR]
+    assert tokens[-1].name == "h"
+    assert [e.line for e in lexer.errors] == [1, 2, 3, 3, 4]
+    assert Lexer(code_string=code, engine=engine).lex()[-1].message == lexer.errors[0].message
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_recover_from_unterminated_template(engine):
+    code = 'x = "{a + "{b}\ny'
+    lexer = Lexer(code_string=code, engine=engine, recover=True)
+    tokens = lexer.lex()
+    # Both template strings are unterminated, and what follows each opening delimiter is lexed again as code.
+    assert [(t.type, code[t.start : t.end + 1], t.line) for t in tokens] == [
+        (TokenType.IDENTIFIER, "x", 1),
+        (TokenType.OPERATOR, "=", 1),
+        (TokenType.ERROR, '"{a', 1),
+        (TokenType.OPERATOR, "+", 1),
+        (TokenType.ERROR, '"{b', 1),
+        (TokenType.CODE_DELIMITER, "}", 1),
+        (TokenType.IDENTIFIER, "y", 2),
+    ]
+    assert len(lexer.errors) == 2
+    assert not Lexer(code_string=code, engine=engine, recover=True).lex_buffer().error
+
+
+def test_recover_with_stream_char_stream():
+    import io
+
+    code = "a @ b\n'open\nc"
+    expected = Lexer(code_string=code, recover=True).lex()
+    assert Lexer(char_stream=StreamCharStream(io.StringIO(code), 1), recover=True).lex() == expected
+    assert [t.type for t in expected] == [
+        TokenType.IDENTIFIER, TokenType.ERROR, TokenType.IDENTIFIER, TokenType.ERROR, TokenType.IDENTIFIER
+    ]
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_number_kinds_on_tokens(engine):
+    code = "a = [0, 12, 1.5, .5e-3, 3e+2, 9n, 0x1F, 0o17n, 0b101];"
+    expected = [
+        NumberKind.INTEGER, NumberKind.INTEGER, NumberKind.FLOAT, NumberKind.FLOAT, NumberKind.FLOAT,
+        NumberKind.BIGINT, NumberKind.HEX, NumberKind.OCTAL, NumberKind.BINARY,
+    ]
+    for spans in [False, True]:
+        tokens = Lexer(code_string=code, engine=engine, spans=spans).lex()
+        assert [t.kind for t in tokens if t.type == TokenType.NUMBER] == expected
+        assert all(t.kind is None for t in tokens if t.type != TokenType.NUMBER)
+    buffer = Lexer(code_string=code, engine=engine).lex_buffer()
+    assert [t.kind for t in buffer if t.type == TokenType.NUMBER] == expected
+    assert buffer[0].kind is None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3])
+def test_stream_char_stream_numbers_across_chunks(chunk_size):
+    import io
+
+    code = "x = 0x1Fn + 12.5e+10 - .25 + 1.2.3; y = 0x1G"
+    tokens = Lexer(char_stream=StreamCharStream(io.StringIO(code), chunk_size)).lex()
+    assert without_errors(tokens) == without_errors(Lexer(code_string=code).lex())
+    assert [t.kind for t in tokens if isinstance(t, Token) and t.type == TokenType.NUMBER] == [
+        NumberKind.HEX, NumberKind.FLOAT, NumberKind.FLOAT, NumberKind.FLOAT, NumberKind.FLOAT
+    ]
+    assert tokens[-1].message == "Invalid Number Literal 0x1G"
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_identifier_symbols(engine):
+    code = 'count = count + "{total} of {count}"; fn total() {}'
+    lexer = Lexer(code_string=code, engine=engine)
+    tokens = lexer.lex()
+    identifiers = [t for t in tokens if t.type == TokenType.IDENTIFIER]
+    assert [t.symbol for t in identifiers] == [0, 0, 1]
+    assert lexer.symbols.names == ["count", "total"]
+    assert lexer.symbols.ids == {"count": 0, "total": 1}
+    # Every token with a name shares the table's copy of it.
+    assert all(t.name is lexer.symbols[t.symbol] for t in identifiers)
+    template_arguments = tokens[4].name[1]
+    assert [t.symbol for argument in template_arguments.values() for t in argument] == [1, 0]
+    assert all(t.symbol is None for t in tokens if t.type != TokenType.IDENTIFIER)
+    assert [t.symbol for t in Lexer(code_string=code, engine=engine, spans=True).lex()] == [t.symbol for t in tokens]
+    assert [t.symbol for t in Lexer(code_string=code, engine=engine).lex_buffer()] == [t.symbol for t in tokens]
+    # A table passed in carries on numbering where the last Lexer left off.
+    more = Lexer(code_string="total + items", engine=engine, symbols=lexer.symbols).lex()
+    assert [t.symbol for t in more] == [1, None, 2]
+    assert SymbolTable.from_tokens(tokens + more).names == lexer.symbols.names
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_alex_matches_lex(engine):
+    import asyncio
+
+    code = "x = 1;\n" * 300 + "y = @"
+    tokens = asyncio.run(Lexer(code_string=code, engine=engine).alex(batch_size=7))
+    assert without_errors(tokens) == without_errors(Lexer(code_string=code, engine=engine).lex())
+
+
+def test_alex_stream_interleaves_and_cancels():
+    import asyncio
+
+    code = "value = value + 1;\n" * 2000
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(len(ticks))
+            await asyncio.sleep(0)
+
+    async def main():
+        ticking = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(Lexer(code_string=code).alex(batch_size=100) for _ in range(3)))
+        ticking.cancel()
+        # 12,000 tokens a file in batches of 100 let the ticker run between every batch.
+        assert len(ticks) >= 120
+        assert all(len(tokens) == 12000 for tokens in results)
+
+        lexed = []
+
+        async def consume():
+            async for token in Lexer(code_string=code).alex_stream(batch_size=100):
+                lexed.append(token)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert len(lexed) == 100
+
+    asyncio.run(main())
+
+
+def test_token_stream_lookahead_and_backtracking():
+    tokens = Lexer(code_string="a = b + c * d;").lex()
+    stream = TokenStream(iter(tokens), capacity=2)
+    assert stream.peek(3) == tokens[3] and stream.peek(20) is None
+    assert stream.advance() == tokens[0]
+    outer = stream.mark()
+    assert [stream.advance(), stream.advance()] == tokens[1:3]
+    inner = stream.mark()
+    stream.advance()
+    with pytest.raises(ValueError):
+        stream.release(outer)
+    stream.reset(inner)
+    assert stream.peek() == tokens[3]
+    stream.reset(outer)
+    assert list(stream) == tokens[1:]
+    assert stream.advance() is None and stream.peek() is None
+
+
+def test_token_stream_memory_is_bounded_by_the_window():
+    def generated():
+        for index in range(100000):
+            yield Token(TokenType.IDENTIFIER, "x", 1, index, index)
+
+    stream = TokenStream(generated(), capacity=4)
+    for _ in range(50000):
+        stream.peek(6)
+        stream.advance()
+    assert len(stream._ring) == 8
+    # A mark keeps everything after it buffered, until it is released.
+    mark = stream.mark()
+    for _ in range(100):
+        stream.advance()
+    assert len(stream._ring) >= 100
+    stream.release(mark)
+    assert stream._end - stream._first <= 7
+    assert sum(token is not None for token in stream._ring) <= 7
+
+
+def test_token_stream_capacity_rounds_up_to_a_power_of_two():
+    tokens = Lexer(code_string="a = b + c * d - e / f % g;").lex()
+    stream = TokenStream(iter(tokens), capacity=10)
+    assert len(stream._ring) == 16
+    mark = stream.mark()
+    assert [stream.advance() for _ in range(12)] == tokens[:12]
+    stream.reset(mark)
+    assert list(stream) == tokens
+    assert len(TokenStream(iter(tokens), capacity=1)._ring) == 1
+    with pytest.raises(ValueError):
+        TokenStream(iter(tokens), capacity=0)
+
+
+def all_tokens(tokens):
+    """Yields tokens along with the tokens of their template arguments."""
+    for token in tokens:
+        yield token
+        if token.type == TokenType.TEMPLATE_STRING:
+            for argument_tokens in token.name[1].values():
+                yield from all_tokens(argument_tokens)
+
+
+def test_line_index():
+    index = LineIndex("ab\n\ncd\n")
+    assert list(index.starts) == [0, 3, 4, 7] and len(index) == 4
+    assert [index.line(position) for position in [-1, 0, 2, 3, 4, 6, 7]] == [1, 1, 1, 2, 3, 3, 4]
+    assert (index.column(5), index.line_start(3), index.line_end(3), index.line_end(4)) == (1, 4, 7, 7)
+    streamed = LineIndex()
+    for chunk in ["ab", "\n\nc", "d\n"]:
+        streamed.add(chunk)
+    assert streamed.starts == index.starts and streamed.end == 7
+    streamed.discard(5)
+    assert (streamed.first_line, len(streamed), streamed.line(6), streamed.column(6)) == (3, 4, 3, 2)
+    assert streamed.column(1, 1) is None
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_token_columns(engine):
+    code = 'a = 1;\n  b = "{c}\n {d}";\n\tf = `é`; /* \n */ e'
+    for spans in [False, True]:
+        tokens = list(all_tokens(Lexer(code_string=code, engine=engine, spans=spans).lex()))
+        assert len(tokens) == 16
+        for token in tokens:
+            assert token.column == token.start - code.rfind("\n", 0, token.start) - 1
+            assert token.line == code.count("\n", 0, token.start) + 1
+    # Columns are looked up, not stored, so tokens from a buffer don't have them.
+    assert Lexer(code_string=code).lex_buffer()[0].column is None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64])
+def test_stream_char_stream_columns(chunk_size):
+    import io
+
+    code = 'x = "é\n{y}";\n  z = 1; // c\n\n w'
+    expected = [(token.line, token.column) for token in all_tokens(Lexer(code_string=code).lex())]
+    stream = Lexer(char_stream=StreamCharStream(io.StringIO(code), chunk_size)).lex_stream()
+    # The stream drops lines it has read past, so columns are taken as each token arrives.
+    assert [(token.line, token.column) for token in all_tokens(stream)] == expected
@@ -0,0 +1,178 @@
+import sys
+
+sys.path.append("..")
+sys.path.append("../Benchmarks")
+import pytest
+import tracemalloc
+from corpus import generate
+from lex_data import Operator, OperatorType
+from lexer import Lexer, Engine
+from parse_data import PRECEDENCE, Associativity, build_binding_powers
+from parser import *
+
+
+def shape(node):
+    """Writes a node out as nested tuples, with operators as their lexemes, to compare trees by."""
+    if isinstance(node, (Name, Literal)):
+        return str(node.token.name)
+    if isinstance(node, TemplateString):
+        return "template", {offset: shape(argument) for offset, argument in node.arguments.items()}
+    if isinstance(node, Prefix):
+        return str(node.operator.name), shape(node.operand)
+    if isinstance(node, Postfix):
+        return shape(node.operand), str(node.operator.name)
+    if isinstance(node, Binary):
+        return shape(node.left), str(node.operator.name), shape(node.right)
+    if isinstance(node, Assignment):
+        return shape(node.target), str(node.operator.name), shape(node.value)
+    if isinstance(node, Call):
+        return "call", shape(node.callee), [shape(argument) for argument in node.arguments]
+    if isinstance(node, Index):
+        return "index", shape(node.target), shape(node.index)
+    if isinstance(node, Group):
+        return "group", shape(node.expression)
+    if isinstance(node, Array):
+        return "array", [shape(element) for element in node.elements]
+    if isinstance(node, Block):
+        return "block", [shape(statement) for statement in node.statements], node.value and shape(node.value)
+    raise TypeError(node)
+
+
+def parse_shape(code: str):
+    return shape(Parser(Lexer(code_string=code).lex()).parse_expression())
+
+
+@pytest.mark.parametrize(
+    "code, expected",
+    [
+        ("a + b * c", ("a", "+", ("b", "*", "c"))),
+        ("a - b - c", (("a", "-", "b"), "-", "c")),
+        ("a ** b ** c", ("a", "**", ("b", "**", "c"))),
+        ("a = b += c", ("a", "=", ("b", "+=", "c"))),
+        ("-a * b", (("-", "a"), "*", "b")),
+        ("-a ** b", ("-", ("a", "**", "b"))),
+        ("not a == b and c", (("not", ("a", "==", "b")), "and", "c")),
+        ("a ?? b or c", ("a", "??", ("b", "or", "c"))),
+        ("x = a..b + 1", ("x", "=", ("a", "..", ("b", "+", "1")))),
+        ("a + b..", (("a", "+", "b"), "..")),
+        ("a.. - b", ("a", "..", ("-", "b"))),
+        ("a.b(c, d)[e].f", (("index", ("call", ("a", ".", "b"), ["c", "d"]), "e"), ".", "f")),
+        ("f()(1,)", ("call", ("call", "f", []), ["1"])),
+        ("[a, ...b, c..,]", ("array", ["a", ("...", "b"), ("c", "..")])),
+        ("(a, b)", ("group", ("a", ",", "b"))),
+        ("a: b = c, d", (("a", ":", ("b", "=", "c")), ",", "d")),
+        ("{x = 1; x + this}", ("block", [("x", "=", "1")], ("x", "+", "this"))),
+        ("{x;}", ("block", ["x"], None)),
+        ('"a {b + 1} c {"{d}"}"', ("template", {3: ("b", "+", "1"), 13: ("template", {1: "d"})})),
+    ],
+)
+def test_precedence_and_forms(code, expected):
+    assert parse_shape(code) == expected
+
+
+def test_binding_powers_follow_operator_roles():
+    infix, prefix, postfix = build_binding_powers(PRECEDENCE)
+    for operator in Operator:
+        assert (operator in infix) == (operator.is_binary or operator.is_assignment)
+        assert (operator in prefix) == operator.is_prefix
+        assert (operator in postfix) == operator.is_postfix
+    with pytest.raises(ValueError, match="NOT isn't a binary operator"):
+        build_binding_powers(PRECEDENCE + [(OperatorType.BINARY, Associativity.LEFT, [Operator.NOT])])
+    with pytest.raises(ValueError, match="EXPONENT has no binary precedence level"):
+        build_binding_powers([level for level in PRECEDENCE if Operator.EXPONENT not in level[2]])
+
+
+@pytest.mark.parametrize("engine", list(Engine))
+def test_module_and_positions(engine):
+    code = "// start\na = 1;;\nb = a +\n  f(2);\na"
+    module = parse(code, engine)
+    assert [shape(statement) for statement in module.statements] == [("a", "=", "1"), ("b", "=", ("a", "+", ("call", "f", ["2"])))]
+    assert shape(module.value) == "a"
+    statement = module.statements[1]
+    assert (statement.start, statement.end, statement.line) == (code.index("b ="), code.index("2)") + 1, 3)
+    assert statement.value.right.line == 4
+    assert statement.value.left.symbol == module.value.symbol == module.statements[0].target.symbol == 0
+    # Span tokens parse the same.
+    assert Parser(Lexer(code_string=code, engine=engine, spans=True).lex()).parse_module() == module
+
+
+@pytest.mark.parametrize(
+    "code, message",
+    [
+        ("a b", "Unexpected Token b"),
+        ("a +", "Unexpected End Of Input"),
+        ("f(a; b", "Expected ), Found ;"),
+        ("[a, b)", "Expected ], Found )"),
+        ("not", "Unexpected End Of Input"),
+        ("a = )", "Unexpected Token )"),
+        ("if a {}", "Unexpected Token if"),
+        ('x = "{}"', "Empty Template Argument"),
+        ("x = 0x1G", "Invalid Number Literal 0x1G"),
+    ],
+)
+def test_errors(code, message):
+    with pytest.raises(SyntaxError) as error:
+        parse(code)
+    assert error.value.message == message
+
+
+def test_error_columns():
+    with pytest.raises(SyntaxError) as error:
+        parse("a = 1;\n  b c")
+    assert (error.value.line, error.value.column) == (2, 4)
+    with pytest.raises(SyntaxError) as error:
+        Parser(Lexer(code_string="a = 1 @ b;", recover=True).lex()).parse_module()
+    assert (error.value.line, error.value.column) == (1, 6)
+
+
+def test_error_tokens_and_deep_nesting():
+    with pytest.raises(SyntaxError, match="Invalid Operator/Symbol @"):
+        Parser(Lexer(code_string="a = 1 @ b;", recover=True).lex()).parse_module()
+    with pytest.raises(SyntaxError) as error:
+        parse("x =\n" + "(" * 5000 + "a" + ")" * 5000)
+    assert (error.value.message, error.value.line) == ("Expression Nested Too Deeply", 2)
+
+
+def test_nodes_are_slotted():
+    module = parse("a = [b, (c)] + -d(e)[f]..; {g}")
+    pending = list(module.statements)
+    while pending:
+        node = pending.pop()
+        assert not hasattr(node, "__dict__")
+        pending.extend(value for value in (getattr(node, name) for name in node.__slots__) if isinstance(value, Node))
+
+
+def test_tree_memory_grows_linearly():
+    def peak(size):
+        tokens = Lexer(code_string=generate("expressions", size)).lex()
+        tracemalloc.start()
+        try:
+            module = Parser(tokens).parse_module()
+            return tracemalloc.get_traced_memory()[1] / len(tokens)
+        finally:
+            tracemalloc.stop()
+
+    small, large = peak(20000), peak(80000)
+    assert large < small * 1.2
+    # Nodes hold the lexer's tokens rather than copies, so the tree is a few words per token.
+    assert large < 100
+
+
+def test_parses_a_stream():
+    code = generate("expressions", 100000)
+    parser = Parser(Lexer(code_string=code).lex_stream())
+    module = parser.parse_module()
+    assert module == Parser(Lexer(code_string=code).lex()).parse_module()
+    # Only a few tokens of look ahead were ever buffered.
+    assert len(parser.tokens._ring) == 16
+
+
+def test_blocks_end_statements():
+    module = parse("{a}\n{b; c}\nx = {d}\ne")
+    assert [shape(statement) for statement in module.statements] == [
+        ("block", [], "a"),
+        ("block", ["b"], "c"),
+        ("x", "=", ("block", [], "d")),
+    ]
+    assert shape(module.value) == "e"
+    assert shape(Parser(Lexer(code_string="{a} + b").lex()).parse_expression()) == (("block", [], "a"), "+", "b")
@@ -0,0 +1,123 @@
+import sys
+
+sys.path.append("..")
+import os
+import zlib
+from token_cache import *
+from token_format import MAGIC
+from lexer import Lexer, Engine
+from batch import command_line, lex_file, token_cache
+
+CODE = 'fn f(a) { log("{a} and {a + 1}"); } // done'
+
+
+def test_cache_hits_and_misses(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    assert cache.get(CODE) is None
+    tokens = cache.lex(CODE)
+    assert list(tokens) == Lexer(code_string=CODE).lex()
+    cached = cache.get(CODE)
+    assert cached is not None and cached is not tokens
+    assert list(cached) == list(tokens)
+    assert cache.get(CODE, Engine.REGEX) is None
+    assert cache.get(CODE + " ") is None
+    assert len(cache.entries()) == 1
+
+
+def test_cache_keeps_errors(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    cache.lex("a = 1 @ 2;")
+    tokens = cache.get("a = 1 @ 2;")
+    assert len(tokens) == 3 and tokens.error.message == "Invalid Operator/Symbol @"
+
+
+def test_cache_key_includes_tables(tmp_path, monkeypatch):
+    cache = TokenCache(str(tmp_path))
+    key = cache.key(CODE)
+    assert CACHE_FINGERPRINT.endswith(tables_fingerprint())
+    monkeypatch.setattr("token_cache.CACHE_FINGERPRINT", "changed")
+    assert TokenCache(str(tmp_path)).key(CODE) != key
+
+
+def test_damaged_entries_are_misses(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    cache.lex(CODE)
+    with open(cache.path(cache.key(CODE)), "wb") as file:
+        file.write(b"not a token buffer")
+    assert cache.get(CODE) is None
+    assert list(cache.lex(CODE)) == Lexer(code_string=CODE).lex()
+    assert cache.get(CODE) is not None
+
+
+def test_entries_are_compressed_token_format(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    code = "\n".join(f'let value{i} = compute(value{i - 1}, "{{i}} of {{count}}") * 2.5; // step' for i in range(500))
+    tokens = cache.lex(code)
+    with open(cache.path(cache.key(code)), "rb") as file:
+        data = file.read()
+    assert zlib.decompress(data).startswith(MAGIC)
+    # Pickled TokenBuffers took around six times the source.
+    assert len(data) < 3 * len(code)
+    cached = cache.get(code)
+    assert list(cached) == list(tokens) and cached.nbytes == tokens.nbytes
+
+
+def test_stale_temporaries_are_removed(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    cache.lex(CODE)
+    stale, fresh = tmp_path / "stale.tmp", tmp_path / "fresh.tmp"
+    stale.write_bytes(b"half written")
+    fresh.write_bytes(b"being written")
+    os.utime(stale, (0, 0))
+    cache.evict()
+    assert not stale.exists() and fresh.exists()
+    assert len(cache.entries()) == 1
+    cache.clear()
+    assert not any(tmp_path.iterdir())
+
+
+def test_lru_eviction(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    sources = [f"x{i} = {i};" for i in range(6)]
+    for i, source in enumerate(sources):
+        cache.lex(source)
+        os.utime(cache.path(cache.key(source)), (i, i))
+    entry_size = max(size for _, size, _ in cache.entries())
+    # Using the oldest entry makes it the most recently used.
+    assert cache.get(sources[0]) is not None
+    cache.max_bytes = entry_size * 3
+    cache.evict()
+    remaining = {path for _, _, path in cache.entries()}
+    assert len(remaining) <= 3
+    assert cache.path(cache.key(sources[0])) in remaining
+    assert cache.path(cache.key(sources[1])) not in remaining
+    assert cache.path(cache.key(sources[5])) in remaining
+
+
+def test_batch_uses_cache(tmp_path, capsys):
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    (source_dir / "a.vws").write_text(CODE)
+    cache_dir = tmp_path / "cache"
+    assert command_line([str(source_dir), "--cache", str(cache_dir), "-j", "1"]) == 0
+    assert len(TokenCache(str(cache_dir)).entries()) == 1
+    assert command_line([str(source_dir), "--cache", str(cache_dir), "-j", "2"]) == 0
+    assert "1 files, 13 tokens, 0 with errors" in capsys.readouterr().out.splitlines()[-1]
+
+
+def test_batch_shares_one_cache_per_directory(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    paths = []
+    for index in range(5):
+        path = tmp_path / f"{index}.vws"
+        path.write_text(f"x{index} = {index};")
+        paths.append(str(path))
+    scans = []
+    entries = TokenCache.entries
+    monkeypatch.setattr(TokenCache, "entries", lambda cache: scans.append(cache) or entries(cache))
+    for path in paths:
+        assert lex_file(path, cache_directory=cache_dir).ok
+    assert token_cache(cache_dir) is token_cache(cache_dir)
+    # The directory is only scanned for its size on the first put.
+    assert scans == [token_cache(cache_dir)]
+    assert token_cache(cache_dir)._estimated_bytes == token_cache(cache_dir).size()
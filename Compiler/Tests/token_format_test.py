@@ -0,0 +1,96 @@
+import sys
+
+sys.path.append("..")
+import glob
+import os
+import pytest
+from lex_data import TokenType, NumberKind, Operator
+from lexer import Lexer, command_line
+from syntax_error import SyntaxError
+from token_format import *
+
+COMPILER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CORPUS = [os.path.join(COMPILER_DIR, "sample_1.vws")] + sorted(
+    glob.glob(os.path.join(COMPILER_DIR, "..", "Example Programs", "*", "*.vws"))
+)
+
+
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_round_trip(path):
+    with open(path) as file:
+        code = file.read()
+    tokens = Lexer(code_string=code).lex()
+    reader = TokenReader(dumps(tokens))
+    assert len(reader) == len(tokens)
+    assert list(reader) == tokens
+    assert [view.to_token() for view in reader] == tokens
+    assert [view.kind for view in reader] == [token.kind for token in tokens]
+    assert [view.symbol for view in reader] == [token.symbol for token in tokens]
+    assert [type(view.name) for view in reader] == [type(token.name) for token in tokens]
+    assert reader.error is None
+    # Lists, buffers and span tokens all write the same bytes.
+    assert dumps(Lexer(code_string=code).lex_buffer()) == dumps(tokens)
+    assert dumps(Lexer(code_string=code, spans=True).lex()) == dumps(tokens)
+
+
+def test_templates_and_errors():
+    code = 'x = "a{b}c{"{-d}" + 1.5}é" @'
+    tokens = Lexer(code_string=code).lex()
+    reader = TokenReader(dumps(tokens))
+    assert list(reader) == tokens[:-1]
+    template = reader[2]
+    assert template.type == TokenType.TEMPLATE_STRING
+    text, template_arguments = template.name
+    assert text == '"acé"' and list(template_arguments) == [2, 6]
+    inner = template_arguments[6][0]
+    assert isinstance(inner, TokenView) and inner.name[1][1][1].name == "d"
+    assert template_arguments[6][2].kind == NumberKind.FLOAT
+    assert template_arguments[6][1].name is Operator.PLUS
+    error = reader.error
+    assert isinstance(error, SyntaxError)
+    assert (error.message, error.line, error.column) == (tokens[-1].message, tokens[-1].line, tokens[-1].column)
+    assert error.column == len(code) - 1
+    assert reader.to_buffer().error.message == error.message
+    assert list(reader.to_buffer()) == tokens[:-1]
+
+
+def test_deeply_nested_templates():
+    depth = sys.getrecursionlimit() * 2
+    code = '"{' * depth + "x" + '}"' * depth
+    reader = TokenReader(dumps(Lexer(code_string=code).lex()))
+    assert reader.record_count == depth + 1
+    view = reader[0]
+    for _ in range(depth):
+        (argument,) = view.name[1].values()
+        view = argument[0]
+    assert view.name == "x" and view.start == depth * 2
+
+
+def test_rejects_other_data():
+    with pytest.raises(ValueError):
+        TokenReader(b"short")
+    with pytest.raises(ValueError):
+        TokenReader(b"x" * 100)
+    data = bytearray(dumps(Lexer(code_string="a").lex()))
+    data[8] += 1
+    with pytest.raises(ValueError, match="version"):
+        TokenReader(bytes(data))
+    with pytest.raises(ValueError, match="truncated"):
+        TokenReader(dumps(Lexer(code_string="a b c").lex())[: HEADER.size + 1])
+
+
+def test_memory_mapped_file(tmp_path):
+    code = "const n = 12n; log('é', n ** 2);\n" * 200
+    path = str(tmp_path / "code.tokens")
+    command_line([_write_source(tmp_path, code), "--output", path])
+    with TokenReader.open(path) as reader:
+        assert list(reader) == Lexer(code_string=code).lex()
+        assert reader[-2].line == 200
+    with open(path, "rb") as file:
+        assert file.read(len(MAGIC)) == MAGIC
+
+
+def _write_source(tmp_path, code: str) -> str:
+    path = tmp_path / "code.vws"
+    path.write_text(code, encoding="utf-8")
+    return str(path)
@@ -0,0 +1,118 @@
+from lexer import Lexer, Engine
+from token_cache import TokenCache
+from tokens import TokenBuffer
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List
+import glob
+import os
+
+
+SOURCE_EXTENSION = ".vws"
+
+
+@dataclass
+class FileResult:
+    """The outcome of lexing one file. tokens holds everything lexed before any error."""
+
+    path: str
+    tokens: TokenBuffer
+    error: str = None
+    line: int = None
+    column: int = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def find_sources(patterns: Iterable[str]) -> List[str]:
+    """Expands files, directories (searched recursively for .vws files) and glob patterns into paths."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(glob.escape(pattern), "**", "*" + SOURCE_EXTENSION), recursive=True)
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        paths.extend(sorted(path for path in matches if os.path.isfile(path)))
+    # The same file can be matched by more than one pattern.
+    return list(dict.fromkeys(paths))
+
+
+# The TokenCache for each cache directory, so that every process only builds one, and only scans
+# the directory for its size once.
+_caches = {}
+
+
+def token_cache(directory: str) -> TokenCache:
+    cache = _caches.get(directory)
+    if cache is None:
+        cache = _caches[directory] = TokenCache(directory)
+    return cache
+
+
+def lex_file(path: str, engine: Engine = Engine.CHAR, cache_directory: str = None) -> FileResult:
+    try:
+        with open(path) as file:
+            code = file.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return FileResult(path, TokenBuffer(), str(e))
+    if cache_directory is not None:
+        tokens = token_cache(cache_directory).lex(code, engine)
+    else:
+        tokens = Lexer(code_string=code, engine=engine).lex_buffer()
+    if tokens.error is not None:
+        return FileResult(path, tokens, tokens.error.message, tokens.error.line, tokens.error.column)
+    return FileResult(path, tokens)
+
+
+def lex_files(
+    paths: List[str], engine: Engine = Engine.CHAR, workers: int = None, cache_directory: str = None
+) -> Iterator[FileResult]:
+    """Lexes paths across a pool of worker processes, yielding results in the order of paths."""
+    if not paths:
+        return
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        yield from (lex_file(path, engine, cache_directory) for path in paths)
+        return
+    # Hand out files in chunks so that small files don't cost a round trip each.
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(
+            lex_file, paths, [engine] * len(paths), [cache_directory] * len(paths), chunksize=chunksize
+        )
+
+
+def command_line(argv: List[str] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lex ViewScript files in parallel and report any errors.")
+    parser.add_argument("paths", nargs="+", help=f"{SOURCE_EXTENSION} files, directories or glob patterns")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--engine", choices=[engine.value for engine in Engine], default=Engine.CHAR.value)
+    parser.add_argument("--cache", metavar="DIRECTORY", help="reuse tokens for unchanged files from this directory")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also list the files that lexed cleanly")
+    args = parser.parse_args(argv)
+
+    paths = find_sources(args.paths)
+    failures = token_count = 0
+    for result in lex_files(paths, Engine(args.engine), args.workers, args.cache):
+        token_count += len(result.tokens)
+        if not result.ok:
+            failures += 1
+            location = result.path if result.line is None else f"{result.path}:{result.line}"
+            if result.column is not None:
+                # Counting from 1, as editors do.
+                location += f":{result.column + 1}"
+            print(f"{location}: {result.error}")
+        elif args.verbose:
+            print(f"{result.path}: {len(result.tokens)} tokens")
+    print(f"{len(paths)} files, {token_count} tokens, {failures} with errors")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(command_line())
@@ -0,0 +1,64 @@
+from lex_data import Operator, Keyword
+
+
+# The JavaScript operator each ViewScript operator is written as, where they differ.
+JS_OPERATORS = {
+    Operator.AND: "&&",
+    Operator.OR: "||",
+    Operator.NOT: "!",
+    Operator.BIN_OR: "|",
+    Operator.BIN_AND: "&",
+    Operator.BIN_OR_ASSIGN: "|=",
+    Operator.BIN_AND_ASSIGN: "&=",
+    Operator.EQ: "===",
+    Operator.NOT_EQ: "!==",
+}
+
+# ViewScript operators that have no JavaScript output yet.
+UNSUPPORTED_OPERATORS = frozenset([Operator.RANGE, Operator.INC_RANGE, Operator.PATTERN_OR, Operator.FROM])
+
+
+def js_operator(operator: Operator) -> str:
+    return JS_OPERATORS.get(operator, operator.value)
+
+
+# JavaScript's precedence for the binary operators, higher binding tighter, along with the
+# levels of the other kinds of expression that the emitter has to parenthesise around.
+COMMA_PRECEDENCE = 1
+ASSIGNMENT_PRECEDENCE = 2
+PREFIX_PRECEDENCE = 15
+MEMBER_PRECEDENCE = 17
+PRIMARY_PRECEDENCE = 18
+JS_PRECEDENCE = {
+    ",": COMMA_PRECEDENCE,
+    **{js_operator(item): ASSIGNMENT_PRECEDENCE for item in Operator if item.is_assignment},
+    "??": 3,
+    "||": 4,
+    "&&": 5,
+    "|": 6,
+    "^": 7,
+    "&": 8,
+    "===": 9,
+    "!==": 9,
+    "<": 10,
+    ">": 10,
+    "<=": 10,
+    ">=": 10,
+    "in": 10,
+    "<<": 11,
+    ">>": 11,
+    ">>>": 11,
+    "+": 12,
+    "-": 12,
+    "*": 13,
+    "/": 13,
+    "%": 13,
+    "**": 14,
+}
+RIGHT_ASSOCIATIVE = frozenset(["**"]) | frozenset(js_operator(item) for item in Operator if item.is_assignment)
+
+# Keywords that are spelt differently as JavaScript values.
+JS_CONSTANTS = {Keyword.INFINITY: "Infinity"}
+
+# Built in functions, used when a name hasn't been declared in the ViewScript.
+BUILTIN_NAMES = {"log": "console.log", "err": "console.error"}
@@ -0,0 +1,532 @@
+from lex_data import TokenType, NumberKind, Operator, Keyword, CodeDelimiter, StringDelimiter, escape_char
+from emit_data import (
+    js_operator,
+    UNSUPPORTED_OPERATORS,
+    COMMA_PRECEDENCE,
+    ASSIGNMENT_PRECEDENCE,
+    PREFIX_PRECEDENCE,
+    MEMBER_PRECEDENCE,
+    PRIMARY_PRECEDENCE,
+    JS_PRECEDENCE,
+    RIGHT_ASSOCIATIVE,
+    JS_CONSTANTS,
+    BUILTIN_NAMES,
+)
+from lexer import Lexer, Engine
+from nodes import *
+from parser import Parser
+from syntax_error import SyntaxError
+from tokens import Token, LineIndex
+from typing import Iterable, List, TextIO
+import json
+import re
+
+
+BASE64_DIGITS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+# Matches the rest of a template argument after its last token, up to and including the
+# closing brace: only whitespace and comments can come between them.
+ARGUMENT_END_REGEX = re.compile(r"(?:\s+|//[^\n]*|/\*.*?\*/)*\}", re.DOTALL)
+# Matches the characters of template string text that have to change in a JavaScript
+# template literal: escape sequences are kept, and a bare "$" or "`" is escaped.
+TEMPLATE_TEXT_REGEX = re.compile(rf"{re.escape(escape_char)}.|[$`]", re.DOTALL)
+
+
+def vlq(value: int) -> str:
+    """Encodes value as a Base64 VLQ, the way source map mappings store numbers."""
+    value = (-value << 1) | 1 if value < 0 else value << 1
+    digits = []
+    while True:
+        digit = value & 31
+        value >>= 5
+        if value:
+            digits.append(BASE64_DIGITS[digit | 32])
+        else:
+            digits.append(BASE64_DIGITS[digit])
+            return "".join(digits)
+
+
+def utf16_length(text: str) -> int:
+    # Source map columns count UTF-16 code units, like JavaScript strings do.
+    return len(text) if text.isascii() else len(text.encode("utf-16-le")) // 2
+
+
+class SourceMap:
+    """
+    Writes a Source Map v3 to output as mappings are added, rather than holding them until the
+    end, which needs mappings to come in the order of the generated code. Lines and columns
+    are zero based. Call close once the code has been emitted to write the names and finish.
+    """
+
+    def __init__(self, output: TextIO, file: str, source: str, chunk_size: int = 64 * 1024):
+        self.output = output
+        self.chunk_size = chunk_size
+        # The index of every name mapped, which is the only part kept until close.
+        self.names = {}
+        self._chunks = []
+        self._size = 0
+        # Each field of a segment is relative to the one before, and the generated column to
+        # the one before on the same line.
+        self._line = 0
+        self._column = 0
+        self._source_line = 0
+        self._source_column = 0
+        self._name = 0
+        self._line_started = False
+        output.write(f'{{"version":3,"file":{json.dumps(file)},"sources":[{json.dumps(source)}],"mappings":"')
+
+    def add(self, line: int, column: int, source_line: int, source_column: int, name: str = None):
+        """Maps line and column of the generated code to source_line and source_column of the source."""
+        if line != self._line:
+            segment = ";" * (line - self._line)
+            self._line = line
+            self._column = 0
+        elif self._line_started:
+            segment = ","
+        else:
+            segment = ""
+        self._line_started = True
+        # The source index is always 0, as there is only one source.
+        segment += (
+            vlq(column - self._column)
+            + "A"
+            + vlq(source_line - self._source_line)
+            + vlq(source_column - self._source_column)
+        )
+        self._column = column
+        self._source_line = source_line
+        self._source_column = source_column
+        if name is not None:
+            name_index = self.names.setdefault(name, len(self.names))
+            segment += vlq(name_index - self._name)
+            self._name = name_index
+        self._chunks.append(segment)
+        self._size += len(segment)
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        self.output.write("".join(self._chunks))
+        self._chunks.clear()
+        self._size = 0
+
+    def close(self):
+        self.flush()
+        self.output.write(f'","names":{json.dumps(list(self.names), separators=(",", ":"))}}}')
+
+
+class Emitter:
+    """
+    Writes the JavaScript for parsed ViewScript to output, a chunk of about chunk_size
+    characters at a time, so that what it holds is the chunk being built plus the names in
+    scope, however much code is emitted. source is the ViewScript the nodes were parsed from,
+    which template strings, regexes and source map columns are read from.
+
+    With a SourceMap, every token written is mapped back to the source as it is written. Without
+    one, the methods that track the generated line and column aren't used at all, so source maps
+    cost nothing when they are off.
+    """
+
+    def __init__(
+        self,
+        output: TextIO,
+        source: str,
+        *,
+        source_map: SourceMap = None,
+        chunk_size: int = 64 * 1024,
+        indent: str = "    ",
+    ):
+        self.output = output
+        self.source = source
+        self.source_map = source_map
+        self.chunk_size = chunk_size
+        self.indent_unit = indent
+        self.indent = ""
+        self._chunks = []
+        self._size = 0
+        # The names declared in each enclosing scope, innermost last.
+        self.scopes = [set()]
+        if source_map is not None:
+            self.line_index = LineIndex(source)
+            # Columns in ASCII source can be found without counting UTF-16 code units.
+            self.ascii_source = source.isascii()
+            # The zero based line and UTF-16 column the next text is written at.
+            self.line = 0
+            self.column = 0
+            self.write = self.write_tracked
+            self.write_token = self.write_mapped
+
+    def write(self, text: str):
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def write_token(self, token: Token, text: str, name: str = None):
+        """Writes text as the code for token, mapping it back to token when there is a source map."""
+        self.write(text)
+
+    def write_tracked(self, text: str):
+        newline = text.rfind("\n")
+        if newline == -1:
+            self.column += utf16_length(text)
+        else:
+            self.line += text.count("\n")
+            self.column = utf16_length(text[newline + 1 :])
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def write_mapped(self, token: Token, text: str, name: str = None):
+        line_start = self.line_index.line_start(token.line)
+        if self.ascii_source:
+            source_column = token.start - line_start
+        else:
+            source_column = utf16_length(self.source[line_start : token.start])
+        self.source_map.add(self.line, self.column, token.line - 1, source_column, name)
+        self.write_tracked(text)
+
+    def flush(self):
+        self.output.write("".join(self._chunks))
+        self._chunks.clear()
+        self._size = 0
+
+    def emit_module(self, module: Module):
+        self.emit_statements(module.statements + ([module.value] if module.value is not None else []))
+
+    def emit_statements(self, statements: Iterable):
+        """Emits statements as top level code, one at a time, so they can come straight from Parser.iter_module."""
+        for statement in statements:
+            self.statement(statement)
+        self.flush()
+
+    def declared(self, name: str) -> bool:
+        return any(name in scope for scope in self.scopes)
+
+    def statement(self, node: Node):
+        self.write(self.indent)
+        if isinstance(node, Block) and not is_object(node):
+            self.block_body(node, returns=False)
+            self.write("\n")
+            return
+        # Assigning to a name that isn't declared yet declares it in the innermost scope.
+        if (
+            isinstance(node, Assignment)
+            and node.operator.name == Operator.ASSIGN
+            and isinstance(node.target, Name)
+            and not self.declared(node.target.token.name)
+        ):
+            self.scopes[-1].add(node.target.token.name)
+            self.write("let ")
+        # A statement can't start with a brace or function in JavaScript, which objects and
+        # blocks as values would, so they go in parentheses.
+        first_token = node.first_token
+        if first_token.type == TokenType.CODE_DELIMITER and first_token.name == CodeDelimiter.O_BRACE:
+            self.write("(")
+            self.expression(node)
+            self.write(");\n")
+        else:
+            self.expression(node)
+            self.write(";\n")
+
+    def block_body(self, block: Block, returns: bool):
+        """Writes block as a JavaScript block, with its value returned if returns."""
+        self.write_token(block.open, "{\n")
+        self.scopes.append(set())
+        outer_indent = self.indent
+        self.indent += self.indent_unit
+        for statement in block.statements:
+            self.statement(statement)
+        if block.value is not None:
+            if returns:
+                self.write(self.indent + "return ")
+                self.expression(block.value, ASSIGNMENT_PRECEDENCE)
+                self.write(";\n")
+            else:
+                self.statement(block.value)
+        self.indent = outer_indent
+        self.scopes.pop()
+        self.write(self.indent)
+        self.write_token(block.close, "}")
+
+    def expression(self, node: Node, min_precedence: int = 0):
+        """Writes node, in parentheses if it binds more loosely than min_precedence."""
+        if precedence(node) < min_precedence:
+            self.write("(")
+            EXPRESSIONS[type(node)](self, node)
+            self.write(")")
+        else:
+            EXPRESSIONS[type(node)](self, node)
+
+    def name(self, node: Name):
+        name = node.token.name
+        self.write_token(node.token, name if self.declared(name) else BUILTIN_NAMES.get(name, name), name)
+
+    def literal(self, node: Literal):
+        token = node.token
+        if token.type == TokenType.REGEX_STRING:
+            # The pattern goes between slashes, so "/" is escaped and "\`" unescaped.
+            text = self.source[token.start : token.end + 1]
+            close = text.rfind(StringDelimiter.REGEX_STRING.value)
+            pattern = (
+                text[1:close]
+                .replace("/", "\\/")
+                .replace(escape_char + StringDelimiter.REGEX_STRING.value, StringDelimiter.REGEX_STRING.value)
+            )
+            self.write_token(token, f"/{pattern}/{text[close + 1 :]}")
+        elif token.type == TokenType.KEYWORD:
+            if token.name == Keyword.UNDERSCORE:
+                raise SyntaxError.at(f"Unsupported In JavaScript Output: {token.name}", token)
+            self.write_token(token, JS_CONSTANTS.get(token.name, token.name.value))
+        else:
+            self.write_token(token, token.name)
+
+    def template_string(self, node: TemplateString):
+        token = node.token
+        source = self.source
+        self.write_token(token, "`")
+        position = token.start + 1
+        for offset, argument in node.arguments.items():
+            self.write(template_text(source[position : token.start + offset]) + "${")
+            self.expression(argument)
+            self.write("}")
+            position = ARGUMENT_END_REGEX.match(source, argument.end + 1).end()
+        self.write(template_text(source[position : token.end]) + "`")
+
+    def prefix(self, node: Prefix):
+        if node.operator.name == Operator.SPREAD:
+            # sequence writes the spreads that JavaScript allows.
+            raise SyntaxError.at("Spread Only Allowed In Arrays And Call Arguments", node.operator)
+        operator = js_operator(node.operator.name)
+        self.write_token(node.operator, operator)
+        operand = node.operand
+        # Keeps "- -a" from being written as the decrement "--a".
+        if isinstance(operand, Prefix) and operator in ("+", "-") and js_operator(operand.operator.name) in ("+", "-"):
+            self.write(" ")
+        self.expression(operand, PREFIX_PRECEDENCE)
+
+    def postfix(self, node: Postfix):
+        raise SyntaxError.at(f"Unsupported In JavaScript Output: {node.operator.name}", node.operator)
+
+    def binary(self, node: Binary):
+        operator = node.operator.name
+        if operator in (Operator.DOT, Operator.OPTION_DOT):
+            right = node.right
+            if not isinstance(right, Name):
+                raise SyntaxError.at(f"Expected A Property Name After {operator}", node.operator)
+            left = node.left
+            if isinstance(left, Literal) and left.token.kind == NumberKind.INTEGER:
+                # JavaScript would read the . in 1.a as a decimal point.
+                self.write("(")
+                self.literal(left)
+                self.write(")")
+            else:
+                self.expression(left, MEMBER_PRECEDENCE)
+            self.write_token(node.operator, operator.value)
+            # A property is written as it is, even if it has a builtin's name.
+            name = right.token.name
+            self.write_token(right.token, name, name)
+            return
+        if operator in UNSUPPORTED_OPERATORS or operator == Operator.COLON:
+            raise SyntaxError.at(f"Unsupported In JavaScript Output: {operator}", node.operator)
+        js = js_operator(operator)
+        level = JS_PRECEDENCE[js]
+        if js in RIGHT_ASSOCIATIVE:
+            # The left operand of ** can't be a prefix expression without parentheses either.
+            left_precedence, right_precedence = (PREFIX_PRECEDENCE + 1 if js == "**" else level + 1), level
+        elif js == "??":
+            # ?? can't be mixed with || or && without parentheses.
+            left_precedence = right_precedence = JS_PRECEDENCE["&&"] + 1
+        else:
+            left_precedence, right_precedence = level, level + 1
+        self.expression(node.left, left_precedence)
+        self.write_token(node.operator, ", " if js == "," else f" {js} ")
+        self.expression(node.right, right_precedence)
+
+    def assignment(self, node: Assignment):
+        if not is_assignment_target(node.target):
+            raise SyntaxError.at(f"Expected An Assignment Target Before {node.operator.name}", node.operator)
+        self.expression(node.target, MEMBER_PRECEDENCE)
+        self.write_token(node.operator, f" {js_operator(node.operator.name)} ")
+        self.expression(node.value, ASSIGNMENT_PRECEDENCE)
+
+    def call(self, node: Call):
+        self.expression(node.callee, MEMBER_PRECEDENCE)
+        self.write("(")
+        self.sequence(node.arguments)
+        self.write_token(node.close, ")")
+
+    def index(self, node: Index):
+        self.expression(node.target, MEMBER_PRECEDENCE)
+        self.write("[")
+        self.expression(node.index)
+        self.write_token(node.close, "]")
+
+    def group(self, node: Group):
+        self.write_token(node.open, "(")
+        self.expression(node.expression)
+        self.write_token(node.close, ")")
+
+    def array(self, node: Array):
+        self.write_token(node.open, "[")
+        self.sequence(node.elements)
+        self.write_token(node.close, "]")
+
+    def sequence(self, elements: list):
+        for index, element in enumerate(elements):
+            if index:
+                self.write(", ")
+            if isinstance(element, Prefix) and element.operator.name == Operator.SPREAD:
+                self.write_token(element.operator, js_operator(Operator.SPREAD))
+                element = element.operand
+            self.expression(element, ASSIGNMENT_PRECEDENCE)
+
+    def block(self, node: Block):
+        if is_object(node):
+            self.write_token(node.open, "{")
+            for index, entry in enumerate(object_entries(node.value)):
+                if index:
+                    self.write(", ")
+                self.expression(entry.left, PRIMARY_PRECEDENCE)
+                self.write_token(entry.operator, ": ")
+                self.expression(entry.right, ASSIGNMENT_PRECEDENCE)
+            self.write_token(node.close, "}")
+        else:
+            # A block used as a value runs as a function, which returns the block's value.
+            self.write("function () ")
+            self.block_body(node, returns=True)
+            self.write("()")
+
+
+EXPRESSIONS = {
+    Name: Emitter.name,
+    Literal: Emitter.literal,
+    TemplateString: Emitter.template_string,
+    Prefix: Emitter.prefix,
+    Postfix: Emitter.postfix,
+    Binary: Emitter.binary,
+    Assignment: Emitter.assignment,
+    Call: Emitter.call,
+    Index: Emitter.index,
+    Group: Emitter.group,
+    Array: Emitter.array,
+    Block: Emitter.block,
+}
+
+
+def template_text(text: str) -> str:
+    return TEMPLATE_TEXT_REGEX.sub(lambda match: match.group() if len(match.group()) == 2 else "\\" + match.group(), text)
+
+
+def object_entries(node: Node) -> List[Binary]:
+    """The key: value pairs of an object literal's body, or an empty list if it isn't one."""
+    entries = []
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, Binary):
+            return []
+        if node.operator.name == Operator.COMMA:
+            pending.extend([node.right, node.left])
+        elif node.operator.name == Operator.COLON:
+            entries.append(node)
+        else:
+            return []
+    return entries
+
+
+def is_object(block: Block) -> bool:
+    """Whether block is an object literal, a block of nothing but key: value pairs."""
+    return not block.statements and block.value is not None and bool(object_entries(block.value))
+
+
+def is_assignment_target(node: Node) -> bool:
+    """Whether JavaScript can assign to node: a name, or a property or index outside an optional chain."""
+    if isinstance(node, Group):
+        return is_assignment_target(node.expression)
+    if isinstance(node, Name):
+        return True
+    if not (isinstance(node, Index) or (isinstance(node, Binary) and node.operator.name == Operator.DOT)):
+        return False
+    # Neither a?.b = c nor a?.b[0] = c is allowed.
+    while True:
+        if isinstance(node, Binary) and node.operator.name in (Operator.DOT, Operator.OPTION_DOT):
+            if node.operator.name == Operator.OPTION_DOT:
+                return False
+            node = node.left
+        elif isinstance(node, Index):
+            node = node.target
+        elif isinstance(node, Call):
+            node = node.callee
+        else:
+            return True
+
+
+def precedence(node: Node) -> int:
+    if isinstance(node, Binary):
+        operator = node.operator.name
+        if operator in (Operator.DOT, Operator.OPTION_DOT):
+            return MEMBER_PRECEDENCE
+        return JS_PRECEDENCE.get(js_operator(operator), COMMA_PRECEDENCE)
+    if isinstance(node, Assignment):
+        return ASSIGNMENT_PRECEDENCE
+    if isinstance(node, Prefix):
+        return PREFIX_PRECEDENCE
+    if isinstance(node, (Call, Index)) or (isinstance(node, Block) and not is_object(node)):
+        return MEMBER_PRECEDENCE
+    return PRIMARY_PRECEDENCE
+
+
+def emit(source: str, output: TextIO, source_map: TextIO = None, *, file: str = "", source_name: str = "", engine: Engine = Engine.CHAR):
+    """
+    Lexes, parses and emits source to output a statement at a time, along with its source map
+    to source_map if one is given. file and source_name are the names the map gives them.
+    """
+    statements = Parser(Lexer(code_string=source, engine=engine).lex_stream()).iter_module()
+    if source_map is None:
+        Emitter(output, source).emit_statements(statements)
+        return
+    map_writer = SourceMap(source_map, file, source_name)
+    Emitter(output, source, source_map=map_writer).emit_statements(statements)
+    map_writer.close()
+
+
+def command_line(argv: List[str] = None):
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Compile a ViewScript file to JavaScript.")
+    parser.add_argument("path")
+    parser.add_argument("-o", "--output", metavar="FILE", help="write the JavaScript to FILE rather than printing it")
+    parser.add_argument("--source-map", action="store_true", help="also write a source map to the output file with .map added")
+    args = parser.parse_args(argv)
+    if args.source_map and not args.output:
+        parser.error("--source-map needs --output")
+    with open(args.path) as file:
+        source = file.read()
+    try:
+        if not args.output:
+            import sys
+
+            emit(source, sys.stdout)
+            return
+        with open(args.output, "w") as output:
+            if not args.source_map:
+                emit(source, output)
+                return
+            with open(args.output + ".map", "w") as source_map:
+                emit(
+                    source,
+                    output,
+                    source_map,
+                    file=os.path.basename(args.output),
+                    source_name=os.path.relpath(args.path, os.path.dirname(os.path.abspath(args.output))),
+                )
+            output.write(f"\n//# sourceMappingURL={os.path.basename(args.output)}.map\n")
+    except SyntaxError as e:
+        print(e)
+
+
+if __name__ == "__main__":
+    command_line()
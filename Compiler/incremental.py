@@ -0,0 +1,238 @@
+from lex_data import TokenType
+from lexer import Lexer, Engine
+from syntax_error import SyntaxError
+from tokens import Token, SpanToken, TokenBuffer, SymbolTable, LineIndex
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from itertools import islice
+
+
+@dataclass
+class TextEdit:
+    """Replaces deleted_length characters at offset in a source with inserted_text."""
+
+    offset: int
+    deleted_length: int
+    inserted_text: str
+
+    def apply(self, source: str) -> str:
+        return source[: self.offset] + self.inserted_text + source[self.offset + self.deleted_length :]
+
+    @property
+    def shift(self) -> int:
+        """How far the edit moves the characters after it."""
+        return len(self.inserted_text) - self.deleted_length
+
+    def line_shift(self, source: str) -> int:
+        """How many lines the edit adds to source (negative if it removes lines)."""
+        return self.inserted_text.count("\n") - source.count("\n", self.offset, self.offset + self.deleted_length)
+
+
+def shift_token(
+    token: Token | SpanToken, shift: int, line_shift: int, source: str, line_index: LineIndex = None
+) -> Token | SpanToken:
+    """Returns a copy of token moved shift characters and line_shift lines on, into source and its line_index."""
+    if isinstance(token, SpanToken):
+        template = token.template
+        if template is not None:
+            argument_spans, template_arguments = template
+            template = (
+                [(open_brace + shift, close_brace + shift) for open_brace, close_brace in argument_spans],
+                shift_template_arguments(template_arguments, shift, line_shift, source, line_index),
+            )
+        return SpanToken(
+            token.type,
+            source,
+            token.line + line_shift,
+            token.start + shift,
+            token.end + shift,
+            template,
+            token.kind,
+            token.symbol,
+            line_index,
+        )
+    name = token.name
+    if token.type == TokenType.TEMPLATE_STRING:
+        name = (name[0], shift_template_arguments(name[1], shift, line_shift, source, line_index))
+    return Token(
+        token.type,
+        name,
+        token.line + line_shift,
+        token.start + shift,
+        token.end + shift,
+        token.kind,
+        token.symbol,
+        line_index,
+    )
+
+
+def shift_error(error: SyntaxError, edit: TextEdit, source: str, line_shift: int, line_index: LineIndex) -> SyntaxError:
+    """Returns a copy of error, from after edit in source, moved into the edited source that line_index is for."""
+    line = error.line + line_shift
+    column = error.column
+    edit_end = edit.offset + len(edit.inserted_text)
+    # Only an error on the line that the edit ends on moves along its line.
+    if column is not None and line_index.line(edit_end) == line:
+        old_edit_end = edit.offset + edit.deleted_length
+        old_line_start = source.rfind("\n", 0, old_edit_end) + 1
+        column += (edit_end - line_index.line_start(line)) - (old_edit_end - old_line_start)
+    return SyntaxError(error.message, line, column=column)
+
+
+def shift_template_arguments(
+    template_arguments: dict, shift: int, line_shift: int, source: str, line_index: LineIndex = None
+) -> dict:
+    # The argument keys are offsets within the string, so only the argument tokens move.
+    return {
+        argument_start: [shift_token(token, shift, line_shift, source, line_index) for token in tokens]
+        for argument_start, tokens in template_arguments.items()
+    }
+
+
+def count_errors(tokens) -> int:
+    """Counts the ERROR tokens in tokens, including those in template string arguments."""
+    count = 0
+    for token in tokens:
+        if token.type == TokenType.ERROR:
+            count += 1
+        elif token.type == TokenType.TEMPLATE_STRING:
+            template_arguments = token.template[1] if isinstance(token, SpanToken) else token.name[1]
+            count += sum(count_errors(argument_tokens) for argument_tokens in template_arguments.values())
+    return count
+
+
+def relex(
+    source: str,
+    tokens: list | TokenBuffer,
+    edit: TextEdit,
+    *,
+    engine: Engine = Engine.CHAR,
+    spans: bool = False,
+    symbols: SymbolTable = None,
+    recover: bool = False,
+    errors: list = None,
+) -> tuple[str, list | TokenBuffer]:
+    """
+    Updates tokens, lexed from source, for edit. Only the part of the source between the last
+    token the edit can't affect and the first new token that lines up with an old one again is
+    lexed; the old tokens after that are reused with their offsets and lines shifted. Returns the
+    edited source and its tokens, as a list (like Lexer.lex) or a TokenBuffer (like
+    Lexer.lex_buffer) to match what was passed in.
+
+    Template strings and comments are single tokens here, so an edit inside one re-lexes all of it.
+    New identifiers are interned in symbols, which should be the SymbolTable the tokens were
+    lexed with so that their symbol ids agree. Without it, one is rebuilt from the tokens.
+
+    With recover, the tokens should have been lexed with recover too, and errors are lexed as
+    ERROR tokens like Lexer.lex does then. errors can be that Lexer's errors list, which is
+    updated in place to hold the edited source's errors.
+    """
+    new_source = edit.apply(source)
+    shift = edit.shift
+    line_shift = edit.line_shift(source)
+
+    if isinstance(tokens, TokenBuffer):
+        error = tokens.error
+        starts, ends = tokens.starts, tokens.ends
+    else:
+        error = tokens[-1] if tokens and isinstance(tokens[-1], SyntaxError) else None
+        if error is not None:
+            tokens = tokens[:-1]
+        starts = [token.start for token in tokens]
+        ends = [token.end for token in tokens]
+
+    # Lexing a token looks at most one character past its end, so every token ending at least
+    # two characters before the edit is lexed the same way in the new source.
+    kept = bisect_left(ends, edit.offset - 1)
+    if recover:
+        # Where a recovered error ends can depend on any of the text after it, such as whether a
+        # string is ever closed, so nothing from the first one on is kept.
+        for index, token in enumerate(islice(tokens, kept)):
+            if count_errors([token]):
+                kept = index
+                break
+    position = ends[kept - 1] + 1 if kept else 0
+
+    if symbols is None:
+        symbols = SymbolTable.from_tokens(tokens)
+    lexer = Lexer(code_string=new_source, engine=engine, spans=spans, recover=recover, symbols=symbols)
+    lexer.chars.seek(position)
+    new_tokens = []
+    # Old tokens from this one on start after the deleted text, and can be lined up with new ones.
+    reused = bisect_left(starts, edit.offset + edit.deleted_length)
+    edit_end = edit.offset + len(edit.inserted_text)
+    try:
+        for token in lexer.lex_stream():
+            while reused < len(starts) and starts[reused] + shift < token.start:
+                reused += 1
+            if token.start >= edit_end and reused < len(starts) and starts[reused] + shift == token.start:
+                break
+            new_tokens.append(token)
+        else:
+            # Reached the end of the source without lining up, so nothing old is left to reuse.
+            reused = len(starts)
+            error = None
+    except SyntaxError as e:
+        reused = len(starts)
+        error = e
+    else:
+        if error is not None and reused < len(starts):
+            error = shift_error(error, edit, source, line_shift, lexer.chars.lines)
+
+    if errors is not None:
+        # Errors are in the same order as their ERROR tokens, so the old ones for the tokens that
+        # were lexed again are replaced by the lexer's. The lexer may have recorded more for the
+        # token it stopped on, which is an old one.
+        first_replaced = count_errors(islice(tokens, kept))
+        first_reused = first_replaced + count_errors(islice(tokens, kept, reused))
+        errors[first_replaced:] = lexer.errors[: count_errors(new_tokens)] + [
+            shift_error(e, edit, source, line_shift, lexer.chars.lines) for e in errors[first_reused:]
+        ]
+
+    if isinstance(tokens, TokenBuffer):
+        return new_source, relex_buffer(
+            tokens, kept, new_tokens, reused, shift, line_shift, new_source, error, lexer.chars.lines
+        )
+    result = tokens[:kept] + new_tokens
+    result.extend(shift_token(token, shift, line_shift, new_source, lexer.chars.lines) for token in tokens[reused:])
+    if error is not None:
+        result.append(error)
+    return new_source, result
+
+
+def relex_buffer(
+    buffer: TokenBuffer,
+    kept: int,
+    new_tokens: list,
+    reused: int,
+    shift: int,
+    line_shift: int,
+    source: str,
+    error: SyntaxError,
+    line_index: LineIndex = None,
+) -> TokenBuffer:
+    """Builds the TokenBuffer for relex, copying whole column slices for the kept and reused tokens."""
+    result = TokenBuffer()
+    result.names = list(buffer.names)
+    result._name_table = dict(buffer._name_table)
+    for column in ["types", "lines", "starts", "ends", "name_ids", "kinds", "symbols"]:
+        getattr(result, column).extend(getattr(buffer, column)[:kept])
+    result.extend(new_tokens)
+    first_reused = len(result)
+    result.types.extend(buffer.types[reused:])
+    result.lines.extend(array("i", [line + line_shift for line in buffer.lines[reused:]]))
+    result.starts.extend(array("q", [start + shift for start in buffer.starts[reused:]]))
+    result.ends.extend(array("q", [end + shift for end in buffer.ends[reused:]]))
+    result.name_ids.extend(buffer.name_ids[reused:])
+    result.kinds.extend(buffer.kinds[reused:])
+    result.symbols.extend(buffer.symbols[reused:])
+    # Template string names hold their argument tokens, which have moved along with them.
+    for index in range(first_reused, len(result)):
+        if result.types[index] == TokenType.TEMPLATE_STRING:
+            text, template_arguments = result.names[result.name_ids[index]]
+            result.name_ids[index] = result.intern_name(
+                (text, shift_template_arguments(template_arguments, shift, line_shift, source, line_index))
+            )
+    result.error = error
+    return result
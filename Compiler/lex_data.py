@@ -1,5 +1,7 @@
 from enum import StrEnum, IntEnum, auto
+import hashlib
 import string
+import sys
 import re
 
 
@@ -20,6 +22,16 @@ class TokenType(IntEnum):
     ERROR = -1
 
 
+# The kinds of number literal. HEX, OCTAL and BINARY literals are BigInts too if they end in "n".
+class NumberKind(IntEnum):
+    INTEGER = 0
+    FLOAT = 1
+    BIGINT = 2
+    HEX = 3
+    OCTAL = 4
+    BINARY = 5
+
+
 class OperatorType(StrEnum):
     PREFIX = auto()
     POSTFIX = auto()
@@ -93,7 +105,7 @@ class Operator(StrEnum):
     BIN_AND_ASSIGN = "&&=", OperatorType.ASSIGNMENT
 
     def __new__(cls, value, *args, **kwargs):
-        obj = str.__new__(cls)
+        obj = str.__new__(cls, value)
         if args:
             obj._operator_types_ = args
         else:
@@ -221,7 +233,7 @@ class Comment(StrEnum):
     MULTI_LINE_COMMENT = "/*", "*/", TokenType.MULTI_LINE_COMMENT
 
     def __new__(cls, start: str, end: str, token_type: TokenType):
-        obj = str.__new__(cls)
+        obj = str.__new__(cls, start)
         obj._value_ = start
         obj.start = start
         obj.end = end
@@ -258,15 +270,40 @@ class Formats:
         lambda string: Formats.ESCAPE_SEQUENCE_REGEX.search(string) is not None
     )
 
+    # The number formats above in one regex, with a group for each NumberKind. INTEGER and
+    # FLOAT together are FLOAT_INT_REGEX, except that only ASCII digits are accepted, since
+    # those are the only digits the lexers start a number on.
+    NUMBER_REGEX = re.compile(
+        r"(?P<HEX>0[xX][0-9a-fA-F]+n?)"
+        r"|(?P<OCTAL>0[oO][0-7]+n?)"
+        r"|(?P<BINARY>0[bB][01]+n?)"
+        r"|(?P<BIGINT>(?:0|[1-9][0-9]*)n)"
+        r"|(?P<INTEGER>0|[1-9][0-9]*)"
+        r"|(?P<FLOAT>(?!0[^.eE])(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)"
+    )
+
+    @classmethod
+    def number_kind(cls, string: str):
+        """Returns the NumberKind of string, or None if it isn't a number literal."""
+        match = cls.NUMBER_REGEX.fullmatch(string)
+        return NumberKind[match.lastgroup] if match is not None else None
+
     @classmethod
     def is_number(cls, string: str):
-        return (
-            cls.is_float_int(string)
-            or cls.is_bigint(string)
-            or cls.is_hex(string)
-            or cls.is_octal(string)
-            or cls.is_binary(string)
-        )
+        return cls.NUMBER_REGEX.fullmatch(string) is not None
+
+
+# Maps every fixed lexeme straight to its token type and enum member, so the lexers can
+# classify a word or symbol with a single dict probe instead of searching the enums.
+LEXEMES = {
+    sys.intern(item.value): (token_type, item)
+    for token_type, enum in [
+        (TokenType.CODE_DELIMITER, CodeDelimiter),
+        (TokenType.KEYWORD, Keyword),
+        (TokenType.OPERATOR, Operator),
+    ]
+    for item in enum
+}
 
 
 letters = set(string.ascii_letters + "_" + "#")
@@ -280,3 +317,94 @@ symbols = set(
     - set(item.value for item in StringDelimiter)
 )
 escape_char = "\\"
+# Where a Lexer with recover=True starts lexing again after an error.
+recovery_boundaries = whitespace | set(
+    item.value
+    for item in [CodeDelimiter.END_STATEMENT, CodeDelimiter.C_PAREN, CodeDelimiter.C_BRACKET, CodeDelimiter.C_BRACE]
+)
+
+
+class CharClass(IntEnum):
+    """What a character starts, for the CHAR engine to dispatch on with a single dict probe."""
+
+    WHITESPACE = auto()
+    WORD = auto()
+    DIGIT = auto()
+    SYMBOL = auto()
+    # A symbol that a comment also starts with, so the characters after it decide which it is.
+    COMMENT_START = auto()
+    STRING = auto()
+    TEMPLATE_STRING = auto()
+
+
+def build_char_classes() -> dict:
+    """
+    Maps each character that can start a token, or be skipped between tokens, to its CharClass.
+    Any other character, which includes every non-ASCII one, is only valid in strings and comments.
+    """
+    classes = {}
+    for chars, char_class in [
+        (whitespace, CharClass.WHITESPACE),
+        (letters, CharClass.WORD),
+        (digits, CharClass.DIGIT),
+        (symbols, CharClass.SYMBOL),
+        ([StringDelimiter.PLAIN_STRING.value, StringDelimiter.REGEX_STRING.value], CharClass.STRING),
+        ([StringDelimiter.TEMPLATE_STRING.value], CharClass.TEMPLATE_STRING),
+    ]:
+        for char in chars:
+            if char in classes:
+                raise ValueError(f"{char!r} is in both {classes[char].name} and {char_class.name}")
+            classes[char] = char_class
+    for comment in Comment:
+        if classes.get(comment.start[0]) not in (CharClass.SYMBOL, CharClass.COMMENT_START):
+            raise ValueError(f"{comment.name} doesn't start with a symbol character")
+        classes[comment.start[0]] = CharClass.COMMENT_START
+    return classes
+
+
+CHAR_CLASSES = build_char_classes()
+
+
+LEXEME_END = None
+
+
+def build_lexeme_trie(lexemes: dict) -> dict:
+    trie = {}
+    for lexeme, value in lexemes.items():
+        node = trie
+        for char in lexeme:
+            node = node.setdefault(char, {})
+        node[LEXEME_END] = value
+    return trie
+
+
+# A prefix trie over every lexeme spelt only with symbol characters. Each node maps the next
+# character to its child node, and nodes that complete a lexeme hold its LEXEMES entry under
+# LEXEME_END, so the lexers can find the longest operator at a position in a single walk.
+SYMBOL_TRIE = build_lexeme_trie(
+    {lexeme: value for lexeme, value in LEXEMES.items() if set(lexeme) <= symbols}
+)
+
+
+def tables_fingerprint() -> str:
+    """A hash of every table above, which changes whenever the lexers could start lexing differently."""
+    tables = [
+        [(item.name, item.value) for item in TokenType],
+        [(item.name, item.value) for item in NumberKind],
+        [(item.name, item.value, list(item._operator_types_)) for item in Operator],
+        [(item.name, item.value) for item in Keyword],
+        [(item.name, item.value) for item in CodeDelimiter],
+        [(item.name, item.value) for item in StringDelimiter],
+        [(item.name, item.start, item.end, item.token_type) for item in Comment],
+        [value.pattern for value in vars(Formats).values() if isinstance(value, re.Pattern)],
+        REGEX_FLAGS,
+        TEMPLATE_ARGUMENT_START.value,
+        TEMPLATE_ARGUMENT_END.value,
+        sorted(letters),
+        sorted(digits),
+        sorted(whitespace),
+        sorted(recovery_boundaries),
+        sorted(symbols),
+        escape_char,
+    ]
+    return hashlib.sha256(repr(tables).encode()).hexdigest()
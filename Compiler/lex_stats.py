@@ -0,0 +1,95 @@
+from lex_data import TokenType
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Generator
+import time
+
+
+@dataclass(slots=True)
+class Tally:
+    count: int = 0
+    # Source characters, which is the same as bytes for ASCII source.
+    characters: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class LexStats:
+    """
+    How many tokens of each TokenType were lexed, how many source characters they covered and
+    how long they took, along with the same for each dispatch branch of lex_stream. Pass one to
+    Lexer(stats=...) to collect them; passing the same one to several Lexers totals them up.
+
+    Collecting works by wrapping the Lexer's branch methods and token stream, so a Lexer
+    without stats runs exactly as it would otherwise. Token types only count the tokens that
+    are yielded, so template arguments are part of their template string. Branches count every
+    call: a symbol that turns out to be a number like .5 counts as both, and the template branch
+    counts the text of template strings, arguments included. The REGEX engine matches comments
+    and code delimiters inside its main loop, so they have no branch there.
+    """
+
+    token_types: dict = field(default_factory=dict)
+    branches: dict = field(default_factory=dict)
+
+    def instrument(self, lexer, branches: dict):
+        """Shadows the methods of lexer named in branches with ones that tally their calls under the branch names."""
+        for method_name, branch in branches.items():
+            setattr(lexer, method_name, self._timed(getattr(lexer, method_name), branch))
+
+    def _timed(self, method, branch: str):
+        tally = self.branches.setdefault(branch, Tally())
+        perf_counter = time.perf_counter
+
+        @wraps(method)
+        def timed(*args):
+            begin = perf_counter()
+            token = method(*args)
+            tally.seconds += perf_counter() - begin
+            tally.count += 1
+            if token is not None:
+                tally.characters += token.end - token.start + 1
+            return token
+
+        return timed
+
+    def timed_stream(self, tokens: Generator) -> Generator:
+        """Yields from tokens, tallying each token under its type along with the time it took to lex."""
+        perf_counter = time.perf_counter
+        while True:
+            begin = perf_counter()
+            token = next(tokens, None)
+            seconds = perf_counter() - begin
+            if token is None:
+                return
+            tally = self.token_types.get(token.type)
+            if tally is None:
+                tally = self.token_types[token.type] = Tally()
+            tally.count += 1
+            tally.characters += token.end - token.start + 1
+            tally.seconds += seconds
+            yield token
+
+    @property
+    def total(self) -> Tally:
+        return Tally(
+            sum(tally.count for tally in self.token_types.values()),
+            sum(tally.characters for tally in self.token_types.values()),
+            sum(tally.seconds for tally in self.token_types.values()),
+        )
+
+    def report(self) -> str:
+        """Formats the stats as tables, with the most time consuming rows first."""
+        total_seconds = self.total.seconds or 1
+        lines = []
+        for title, table in [("token type", self.token_types), ("branch", self.branches)]:
+            lines.append(f"{title:<20} {'count':>10} {'characters':>12} {'seconds':>10} {'time':>6}")
+            for key, tally in sorted(table.items(), key=lambda item: -item[1].seconds):
+                name = key.name if isinstance(key, TokenType) else key
+                lines.append(
+                    f"{name:<20} {tally.count:>10,} {tally.characters:>12,} "
+                    f"{tally.seconds:>10.4f} {tally.seconds / total_seconds:>6.1%}"
+                )
+            lines.append("")
+        total = self.total
+        lines.append(f"{total.count:,} tokens, {total.characters:,} characters in {total.seconds:.4f} seconds")
+        return "\n".join(lines)
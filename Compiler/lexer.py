@@ -1,305 +1,513 @@
 from lex_data import (
     TokenType,
-    Operator,
-    Keyword,
-    CodeDelimiter,
     StringDelimiter,
     Comment,
     Formats,
+    LEXEMES,
+    LEXEME_END,
+    SYMBOL_TRIE,
     TEMPLATE_ARGUMENT_END,
     TEMPLATE_ARGUMENT_START,
     REGEX_FLAGS,
+    CHAR_CLASSES,
+    CharClass,
     letters,
-    digits,
-    reg_chars,
-    whitespace,
-    symbols,
     escape_char,
+    recovery_boundaries,
 )
 from syntax_error import SyntaxError
-from dataclasses import dataclass
-from typing import Generator, List
+from tokens import Token, SpanToken, TokenBuffer, OpenTemplate, SymbolTable, LineIndex, lexeme_name
+from lex_stats import LexStats
+from regex_lexer import RegexLexer, NUMBER_SCAN_REGEX, WORD_SCAN_REGEX, WHITESPACE_SCAN_REGEX, TEMPLATE_TEXT_REGEX
+from enum import StrEnum, auto
+from typing import AsyncGenerator, Generator, List
+import asyncio
+import codecs
+import re
 
 
-quote_types = set(item.value for item in StringDelimiter)
 comment_starters = set(item.start for item in Comment)
-code_delimiters = set(item.value for item in CodeDelimiter)
+# For Lexer(emit=COMMENT_TYPES), which only yields comments, say to extract documentation.
+COMMENT_TYPES = frozenset(item.token_type for item in Comment)
 
 
-class EOFException(Exception):
-    pass
+# Returned by CharStream in place of a character past either end of the input. Being an empty
+# string, it is in none of the character sets the lexer tests against and equal to no delimiter,
+# so loops stop on it without having to check for the end of the input separately.
+EOF = ""
+
+# How many tokens Lexer.alex_stream lexes between giving control back to the event loop. At
+# around 150,000 tokens a second on the CHAR engine, this holds the loop up for a few milliseconds.
+ASYNC_BATCH_SIZE = 512
 
 
 class CharStream:
+    # current_index is a plain slot rather than a property, since the lexer reads it for every
+    # token. It should only be changed by the CharStream's own methods: advance_next, seek,
+    # skip_to and scan. Newlines aren't counted as characters are read: the line a token starts
+    # on is looked up in lines, and kept along with where that line ends, so the other tokens on
+    # the line only cost a comparison.
+    __slots__ = ("string", "current_index", "lines", "_line", "_line_end")
+
+    # Whether string holds the whole source.
+    complete = True
+
     def __init__(self, string: str):
         self.string = string
-        self._current_index = -1
-        self._line_number = 1
+        self.current_index = -1
+        self.lines = LineIndex(string)
+        self._line = 1
+        self._line_end = -1
 
     def advance_next(self):
-        self._current_index += 1
-        if self._current_index < len(self.string):
-            if self.string[self._current_index] == "\n":
-                self._line_number += 1
-            return self.string[self._current_index]
+        """Moves on to the next character and returns it, or returns EOF without moving at the end."""
+        if self.current_index + 1 < len(self.string):
+            self.current_index += 1
+            return self.string[self.current_index]
         else:
-            raise EOFException("Unexpected EOF (End of File)")
+            return EOF
 
     def peak(self, offset: int):
-        try:
-            return self.string[self._current_index + offset]
-        except IndexError:
-            raise EOFException("Unexpected EOF (End of File)")
+        """Returns the character offset places from the current one, or EOF if that is outside the input."""
+        index = self.current_index + offset
+        return self.string[index : index + 1] if index >= 0 else EOF
 
-    @property
-    def current_index(self):
-        return self._current_index
+    def seek(self, position: int):
+        """Moves the stream so that the next character read is the one at position."""
+        self.current_index = position - 1
+        # The line kept by start_token may be after position now.
+        self._line_end = -1
+
+    def lookahead(self, length: int) -> str:
+        """Returns up to length characters from the current one on, cut short at the end of the input."""
+        return self.string[self.current_index : self.current_index + length]
 
     @property
-    def line_number(self):
-        return self._line_number
+    def line_number(self) -> int:
+        """The line the current character is on."""
+        return self.lines.line(self.current_index)
 
     def start_token(self):
-        return self._current_index, self._line_number, self.peak(0)
+        index = self.current_index
+        if index >= self._line_end:
+            self._line = self.lines.line(index)
+            self._line_end = self.lines.line_end(self._line)
+        return index, self._line, self.peak(0)
+
+    def skip_to(self, text: str, position: int):
+        """
+        Moves the stream on to the last character of the first text found from position on,
+        or to the last character of the input if text isn't found.
+        """
+        index = self.string.find(text, position)
+        end = len(self.string) - 1 if index == -1 else index + len(text) - 1
+        self.current_index = end
+
+    def scan(self, pattern: re.Pattern) -> str:
+        """
+        Matches pattern from the current character on, moves the stream on to the last character
+        of the match and returns the matched text. pattern must match at least one character.
+        """
+        text = pattern.match(self.string, self.current_index).group()
+        self.current_index += len(text) - 1
+        return text
+
+    def __getitem__(self, key: slice) -> str:
+        """Slices the source by absolute offsets."""
+        return self.string[key]
+
+    def release(self, position: int):
+        """Tells the stream that nothing before position will be read again."""
+        pass
+
+
+class StreamCharStream(CharStream):
+    """
+    A CharStream that reads its input from a file object in chunks, instead of holding all of it
+    in one string. The file may be opened in text mode, or be a binary file or mmap, in which case
+    it is decoded with encoding as it is read. Only the characters from the start of the token
+    being lexed on are kept, so memory use depends on the longest token rather than the input size.
+    """
+
+    __slots__ = ("file", "chunk_size", "offset", "at_end", "decoder")
+
+    # string only holds a window of the source, starting at offset.
+    complete = False
+
+    def __init__(self, file, chunk_size: int = 64 * 1024, encoding: str = "utf-8"):
+        super().__init__("")
+        self.file = file
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.at_end = False
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+
+    def fill(self, index: int):
+        """Reads on until the character at absolute index is in the window, or the input runs out."""
+        while index - self.offset >= len(self.string) and not self.at_end:
+            # Reading at least as much as is already held keeps a long token's window growing
+            # geometrically, so it isn't copied once per chunk.
+            data = self.file.read(max(self.chunk_size, len(self.string)))
+            self.at_end = not data
+            if isinstance(data, (bytes, bytearray)):
+                data = self.decoder.decode(data, final=self.at_end)
+            self.string += data
+            self.lines.add(data)
 
+    def advance_next(self):
+        index = self.current_index + 1
+        if index - self.offset >= len(self.string):
+            self.fill(index)
+            if index - self.offset >= len(self.string):
+                return EOF
+        self.current_index = index
+        return self.string[index - self.offset]
 
-@dataclass
-class Token:
-    type: TokenType
-    name: Operator | Keyword | CodeDelimiter | str
-    line: int
-    start: int
-    end: int
+    def peak(self, offset: int):
+        index = self.current_index + offset - self.offset
+        if index >= len(self.string):
+            self.fill(index + self.offset)
+        return self.string[index : index + 1] if index >= 0 else EOF
+
+    def lookahead(self, length: int) -> str:
+        index = self.current_index - self.offset
+        if index + length > len(self.string):
+            self.fill(self.current_index + length - 1)
+        return self.string[index : index + length]
+
+    def skip_to(self, text: str, position: int):
+        searched = position
+        while True:
+            index = self.string.find(text, searched - self.offset)
+            if index != -1 or self.at_end:
+                break
+            # text may be split across the end of the window, so its first characters are searched again.
+            searched = max(position, self.offset + len(self.string) - len(text) + 1)
+            self.fill(self.offset + len(self.string))
+        end = len(self.string) - 1 if index == -1 else index + len(text) - 1
+        self.current_index = end + self.offset
+
+    def scan(self, pattern: re.Pattern) -> str:
+        while True:
+            match = pattern.match(self.string, self.current_index - self.offset)
+            if match.end() < len(self.string) or self.at_end:
+                break
+            # The match runs to the end of the window, so it may go on into the next chunk.
+            self.fill(self.offset + len(self.string))
+        text = match.group()
+        self.current_index += len(text) - 1
+        return text
+
+    def __getitem__(self, key: slice) -> str:
+        start = key.start - self.offset if key.start is not None else None
+        stop = key.stop - self.offset if key.stop is not None else None
+        return self.string[start:stop]
+
+    def release(self, position: int):
+        # Only drop the released text once it is worth a copy of what is left.
+        released = position - self.offset
+        if released > self.chunk_size and released * 2 > len(self.string):
+            self.string = self.string[released:]
+            self.offset = position
+            self.lines.discard(position)
+
+
+# The lexing engines a Lexer can run. CHAR walks the CharStream one character at a time,
+# REGEX scans the whole source with the master regex in regex_lexer.py.
+class Engine(StrEnum):
+    CHAR = auto()
+    REGEX = auto()
+
+
+# The methods lex_stream dispatches to, by the name of the branch they are tallied under in LexStats.
+BRANCHES = {
+    "number": "number",
+    "string": "string",
+    "template_text": "template",
+    "comment": "comment",
+    "word": "word",
+    "symbol": "symbol",
+}
 
 
 class Lexer:
 
-    def __init__(self, *, code_string: str=None, char_stream: CharStream=None):
+    def __init__(
+        self,
+        *,
+        code_string: str=None,
+        char_stream: CharStream=None,
+        engine: Engine=Engine.CHAR,
+        spans: bool=False,
+        emit: set=None,
+        stats: LexStats=None,
+        recover: bool=False,
+        symbols: SymbolTable=None,
+    ):
         if code_string is not None:
             self.chars = CharStream(code_string)
         elif char_stream is not None:
             self.chars = char_stream
         else:
             raise ValueError("code_string or char_stream argument must be passed with an argument of the correct type.")
+        self.engine = Engine(engine)
+        self.spans = spans
+        if not self.chars.complete and (self.engine != Engine.CHAR or spans):
+            raise ValueError("The REGEX engine and spans need the whole source, which a StreamCharStream doesn't hold.")
+        # The TokenTypes to yield, or None for all of them. Comments that aren't emitted are
+        # skipped over without building a token, and are left out of template arguments too.
+        self.emit = None if emit is None else frozenset(TokenType(token_type) for token_type in emit)
+        # With recover, each SyntaxError is added to errors and lexed as an ERROR token covering
+        # the text up to the next recovery boundary, instead of ending the stream.
+        self.recover = recover
+        self.errors = []
+        # Every identifier is interned here and its token given the name's id as its symbol.
+        # Pass the same SymbolTable to several Lexers to number their identifiers together.
+        self.symbols = SymbolTable() if symbols is None else symbols
+        self.stats = stats
+        if stats is not None:
+            stats.instrument(self, BRANCHES)
+            lex_stream = self.lex_stream
+            self.lex_stream = lambda: stats.timed_stream(lex_stream())
+
+
+    def make_token(self, token_type: TokenType, line: int, start: int, end: int, name=None, template: tuple=None, kind=None, symbol=None) -> Token | SpanToken:
+        if self.spans:
+            return SpanToken(token_type, self.chars.string, line, start, end, template, kind, symbol, self.chars.lines)
+        if name is None:
+            name = lexeme_name(self.chars, token_type, start, end, template)
+        return Token(token_type, name, line, start, end, kind, symbol, self.chars.lines)
 
 
     def number(self) -> Token:
-        start, line, token = self.chars.start_token()
-        has_dot = (token == ".")
-        while True:
-            try:
-                char = self.chars.peak(1)
-                if char in reg_chars:
-                    token += self.chars.advance_next()
-                elif char in [Operator.PLUS.value, Operator.MINUS.value] and self.chars.peak(
-                    -1
-                ) in ["e", "E"]:
-                    token += self.chars.advance_next()
-                elif char == "." and not has_dot:
-                    token += self.chars.advance_next()
-                    has_dot = True
-                else:
-                    break
-            except EOFException:
-                break
-        if Formats.is_number(token):
-            return Token(TokenType.NUMBER, token, line, start, self.chars.current_index - 1)
-        else:
+        start, line, _ = self.chars.start_token()
+        token = self.chars.scan(NUMBER_SCAN_REGEX)
+        kind = Formats.number_kind(token)
+        if kind is None:
             raise SyntaxError(f"Invalid Number Literal {token}", line)
+        return self.make_token(TokenType.NUMBER, line, start, self.chars.current_index, token, kind=kind)
 
 
     def word(self) -> Token:
-        start, line, token = self.chars.start_token()
-        while True:
-            try:
-                char = self.chars.peak(1)
-                if char in reg_chars:
-                    token += self.chars.advance_next()
-                else:
-                    break
-            except EOFException:
-                break
-        end = self.chars.current_index 
-        if token in set(item.value for item in Operator):
-            return Token(TokenType.OPERATOR, Operator(token), line, start, end)
-        elif token in set(item.value for item in Keyword):
-            return Token(TokenType.KEYWORD, Keyword(token), line, start, end)
+        start, line, _ = self.chars.start_token()
+        token = self.chars.scan(WORD_SCAN_REGEX)
+        end = self.chars.current_index
+        lexeme = LEXEMES.get(token)
+        if lexeme is not None:
+            return self.make_token(lexeme[0], line, start, end, lexeme[1])
         else:
-            return Token(TokenType.IDENTIFIER, token, line, start, end) 
+            # Tokens share the table's copy of the name, so a name used often is only stored once.
+            symbol = self.symbols.intern(token)
+            return self.make_token(TokenType.IDENTIFIER, line, start, end, self.symbols.names[symbol], symbol=symbol)
 
 
     def symbol(self) -> Token:
         start, line, token = self.chars.start_token()
         if token == "." and Formats.is_number((token + self.chars.peak(1))):
             return self.number()
-        if token in code_delimiters:
-            return Token(TokenType.CODE_DELIMITER, CodeDelimiter(token), line, start, self.chars.current_index - 1)
-        while True:
-            try:
-                char = self.chars.peak(1)
-                if char in symbols:
-                    token += self.chars.advance_next()
-                else:
-                    break
-            except EOFException:
-                break
-        end = self.chars.current_index
-        if token in set(item.value for item in Operator):
-            return Token(TokenType.OPERATOR, Operator(token), line, start, end)
-        elif token in set(item.value for item in Keyword):
-            return Token(TokenType.KEYWORD, Keyword(token), line, start, end)
-        else:
-            raise SyntaxError(f"Invalid Operator/Symbol {token}", line)
-
-
-    def comment(self, comment_type: Comment) -> Token:
-        start, line, token = self.chars.start_token()
+        # Walk the symbol trie as far as the input allows, remembering the longest lexeme seen.
+        node = SYMBOL_TRIE
+        lexeme, length, offset = None, 0, 0
         while True:
-            try:
-                token += self.chars.advance_next()
-                if token[-1] == comment_type.end:
-                    break
-            except EOFException:
+            node = node.get(self.chars.peak(offset))
+            if node is None:
                 break
-        return Token(comment_type.token_type, token, line, start, self.chars.current_index - 1)
+            offset += 1
+            if LEXEME_END in node:
+                lexeme, length = node[LEXEME_END], offset
+        if lexeme is None:
+            raise SyntaxError(f"Invalid Operator/Symbol {self.chars[start : start + max(offset, 1)]}", line)
+        for _ in range(length - 1):
+            self.chars.advance_next()
+        return self.make_token(lexeme[0], line, start, self.chars.current_index, lexeme[1])
+
+
+    def comment(self, comment_type: Comment) -> Token | None:
+        """Lexes a comment, or skips it and returns None if its type isn't emitted."""
+        start, line, _ = self.chars.start_token()
+        self.chars.skip_to(comment_type.end, start + len(comment_type.start))
+        if self.emit is not None and comment_type.token_type not in self.emit:
+            return None
+        return self.make_token(comment_type.token_type, line, start, self.chars.current_index)
 
 
     def string(self) -> Token:
+        # Template strings are opened by lex_stream, since their arguments are lexed by it.
         _, _, token = self.chars.start_token()
         if token == StringDelimiter.PLAIN_STRING.value:
             return self.plain_string()
-        elif token == StringDelimiter.TEMPLATE_STRING.value:
-            return self.template_string()
         elif token == StringDelimiter.REGEX_STRING.value:
             return self.regex()
 
 
     def regex(self) -> Token:
         start, line, _ = self.chars.start_token()
-        token = self.chars.peak(0)
         while True:
-            try:
-                char = self.chars.peak(1)
-                if char == StringDelimiter.REGEX_STRING.value:
-                    self.chars.advance_next()
-                    break
-                elif (
-                    char == escape_char
-                    and self.chars.peak(2) == StringDelimiter.REGEX_STRING.value
-                ):
-                    token += StringDelimiter.REGEX_STRING.value
-                elif char == "/":
-                    token += "\/"
-                else:
-                    token += self.chars.advance_next()
-            except EOFException:
-                raise SyntaxError(f"Unterminated Regex Literal {token}", line)
+            char = self.chars.peak(1)
+            if char == StringDelimiter.REGEX_STRING.value:
+                self.chars.advance_next()
+                break
+            elif (
+                char == escape_char
+                and self.chars.peak(2) == StringDelimiter.REGEX_STRING.value
+            ):
+                self.chars.advance_next()
+                self.chars.advance_next()
+            elif char == EOF:
+                raise SyntaxError(f"Unterminated Regex Literal {self.chars[start : self.chars.current_index + 1]}", line)
+            else:
+                self.chars.advance_next()
         current_regex_flags = []
         while True:
-            try:
-                char = self.chars.peak(1)
-                if char in REGEX_FLAGS and char not in current_regex_flags:
-                    token += self.chars.advance_next()
-                    current_regex_flags.append(token[-1])
-                elif char in letters:
-                    raise SyntaxError(f"Invalid Regex Flags: {current_regex_flags}")
-                else:
-                    break     
-            except EOFException:
+            char = self.chars.peak(1)
+            if char in REGEX_FLAGS and char not in current_regex_flags:
+                current_regex_flags.append(self.chars.advance_next())
+            elif char in letters:
+                raise SyntaxError(f"Invalid Regex Flags: {current_regex_flags}", line)
+            else:
                 break
-        return Token(TokenType.REGEX_STRING, token, line, start, self.chars.current_index - 1)
+        return self.make_token(TokenType.REGEX_STRING, line, start, self.chars.current_index)
 
 
     def plain_string(self) -> Token:
         start, line, _ = self.chars.start_token()
-        token = self.chars.peak(0)
         while True:
-            try:
-                char = self.chars.peak(1)
-                if char == StringDelimiter.PLAIN_STRING.value:
-                    token += self.chars.advance_next()
-                    break
-                elif char == escape_char:
-                    token += self.chars.advance_next() + self.chars.advance_next()
-                else:
-                    token += self.chars.advance_next()
-            except EOFException:
-                raise SyntaxError(f"Unterminated String Literal {token}", line)
-        return Token(TokenType.PLAIN_STRING, token, line, start, self.chars.current_index - 1)
+            char = self.chars.peak(1)
+            if char == StringDelimiter.PLAIN_STRING.value:
+                self.chars.advance_next()
+                break
+            elif char == escape_char:
+                self.chars.advance_next()
+                self.chars.advance_next()
+            elif char == EOF:
+                raise SyntaxError(f"Unterminated String Literal {self.chars[start : self.chars.current_index + 1]}", line)
+            else:
+                self.chars.advance_next()
+        return self.make_token(TokenType.PLAIN_STRING, line, start, self.chars.current_index)
 
 
-    def template_string(self) -> Token:
-        start, line, _ = self.chars.start_token()
-        token = self.chars.peak(0);
-        template_arguments = {}
+    def template_text(self, template: OpenTemplate) -> Token | None:
+        """
+        Scans the text of template in string mode. Returns the template string's token if the
+        closing delimiter is reached, or None if an argument is opened first.
+        """
         while True:
-            try:
-                char = self.chars.peak(1)
-                if char == StringDelimiter.TEMPLATE_STRING.value:
-                    token += self.chars.advance_next()
-                    break
-                elif char == escape_char:
-                    token += self.chars.advance_next() + self.chars.advance_next()
-                elif char == "$":
-                    token += "\\$"
-                elif char == TEMPLATE_ARGUMENT_START.value:
-                    # TODO This should be the position WITHIN the string that the argument starts.
-                    # It gets thrown off when dealing with multiple arguments.
-                    argument_start = self.chars.current_index - start  
-                    self.chars.advance_next()
-                    template_argument_tokens = []
-                    open_braces = 1
-                    token_stream = self.lex_stream()
-                    while open_braces != 0:
-                        next_token = next(token_stream)
-                        if next_token.name == CodeDelimiter.O_BRACE:
-                            open_braces += 1
-                        elif next_token.name == CodeDelimiter.C_BRACE:
-                            open_braces -= 1
-                        if open_braces:
-                            template_argument_tokens.append(next_token)
-                    template_arguments[argument_start] = template_argument_tokens
-                else:
-                    token += self.chars.advance_next()
+            char = self.chars.advance_next()
+            if char == StringDelimiter.TEMPLATE_STRING.value:
+                return self.make_token(
+                    TokenType.TEMPLATE_STRING, template.line, template.start, self.chars.current_index, template=template.template
+                )
+            elif char == escape_char:
+                self.chars.advance_next()
+            elif char == TEMPLATE_ARGUMENT_START.value:
+                template.open_argument(self.chars.current_index)
+                return None
+            elif char == EOF:
+                raise SyntaxError("Unterminated Template String Literal.", template.line)
+            else:
+                self.chars.scan(TEMPLATE_TEXT_REGEX)
+
 
-            except EOFException:
-                raise SyntaxError("Unterminated Template String Literal.", line)
-        return Token(TokenType.TEMPLATE_STRING, (token, template_arguments), line, start, self.chars.current_index - 1)
+    def error_token(self, error: SyntaxError, start: int, line: int) -> Token:
+        """Records error, and skips from start, on line, to just before the next recovery boundary."""
+        self.errors.append(error)
+        self.chars.seek(start + 1)
+        while True:
+            char = self.chars.peak(1)
+            if char == EOF or char in recovery_boundaries:
+                break
+            self.chars.advance_next()
+        return Token(TokenType.ERROR, error.message, line, start, self.chars.current_index, line_index=self.chars.lines)
 
     def lex_stream(self) -> Generator:
+        if self.engine == Engine.REGEX:
+            regex_lexer = RegexLexer(
+                self.chars.string,
+                self.chars.current_index + 1,
+                spans=self.spans,
+                lines=self.chars.lines,
+                emit=self.emit,
+                stats=self.stats,
+                recover=self.recover,
+                symbols=self.symbols,
+            )
+            regex_lexer.errors = self.errors
+            yield from regex_lexer.lex_stream()
+            return
+        emit = self.emit
+        # The template strings being lexed, innermost last. While the innermost one is in code
+        # mode, tokens are lexed as usual but go into its argument rather than being yielded.
+        templates = []
         while True:
+            # The template string that is at fault if a SyntaxError is raised, rather than the token at start.
+            failed_template = None
             try:
-                char = self.chars.advance_next()
-            except EOFException:
-                return
-            try:
-                char_plus = None
-                char_plus = char + self.chars.peak(1)
-                char_plus_plus = char_plus + self.chars.peak(2)
-            except EOFException:
-                if char_plus is not None:
-                    char_plus_plus = char_plus
+                if templates and not templates[-1].open_braces:
+                    failed_template = templates[-1]
+                    token = self.template_text(failed_template)
+                    if token is None:
+                        continue
+                    templates.pop()
                 else:
-                    char_plus_plus = char_plus = char
-
-            if char in digits:
-                yield self.number()
-            elif char in quote_types:
-                yield self.string()
-            elif char in comment_starters:
-                yield self.comment(Comment(char))
-            elif char_plus in comment_starters:
-                yield self.comment(Comment(char + self.chars.peak(1)))
-            elif char_plus_plus in comment_starters:
-                yield self.comment(Comment(char + self.chars.peak(1) + self.chars.peak(2)))
-            elif char in reg_chars:
-                yield self.word()
-            elif char in symbols:
-                yield self.symbol()
-            elif char in whitespace:
-                continue
-            else:
-                raise SyntaxError(f"Invalid Character {char}", self.chars.line_number)
+                    char = self.chars.advance_next()
+                    if char == EOF:
+                        if templates:
+                            failed_template = templates[-1]
+                            raise SyntaxError("Unterminated Template String Literal.", failed_template.line)
+                        return
+                    start = self.chars.current_index
+                    if not templates:
+                        # Nothing before an open template string can be released, as its text is still needed.
+                        self.chars.release(start)
+                    # Branches are in order of how common their characters are in ordinary code.
+                    char_class = CHAR_CLASSES.get(char)
+                    if char_class == CharClass.WHITESPACE:
+                        self.chars.scan(WHITESPACE_SCAN_REGEX)
+                        continue
+                    elif char_class == CharClass.WORD:
+                        token = self.word()
+                    elif char_class == CharClass.SYMBOL:
+                        token = self.symbol()
+                    elif char_class == CharClass.DIGIT:
+                        token = self.number()
+                    elif char_class == CharClass.COMMENT_START:
+                        char_plus_plus = self.chars.lookahead(3)
+                        char_plus = char_plus_plus[:2]
+                        if char in comment_starters:
+                            token = self.comment(Comment(char))
+                        elif char_plus in comment_starters:
+                            token = self.comment(Comment(char_plus))
+                        elif char_plus_plus in comment_starters:
+                            token = self.comment(Comment(char_plus_plus))
+                        else:
+                            token = self.symbol()
+                    elif char_class == CharClass.STRING:
+                        token = self.string()
+                    elif char_class == CharClass.TEMPLATE_STRING:
+                        templates.append(OpenTemplate(start, self.chars.line_number, error_count=len(self.errors)))
+                        continue
+                    else:
+                        raise SyntaxError(f"Invalid Character {char}", self.chars.line_number)
+                    if token is None:
+                        continue
+            except SyntaxError as error:
+                # The whole template string is in doubt, so the error starts at its opening delimiter.
+                error_start = start if failed_template is None else failed_template.start
+                if error.column is None:
+                    error.column = self.chars.lines.column(error_start)
+                if not self.recover:
+                    raise
+                if failed_template is not None:
+                    # Errors inside the template string are dropped, as its text is lexed again.
+                    del self.errors[failed_template.error_count :]
+                    templates.pop()
+                    token = self.error_token(error, error_start, failed_template.line)
+                else:
+                    token = self.error_token(error, error_start, error.line)
+            if templates:
+                templates[-1].add(token)
+            elif emit is None or token.type in emit:
+                yield token
 
     def lex(self) -> List[Token]:
         try:
@@ -312,11 +520,66 @@ class Lexer:
             return tokens
 
 
-
-def command_line():
-    import sys
-    code = open(sys.argv[1]).read()
-    print("\n", *Lexer(code_string=code).lex(), sep="\n")
+    def lex_buffer(self) -> TokenBuffer:
+        buffer = TokenBuffer()
+        try:
+            buffer.extend(self.lex_stream())
+        except SyntaxError as e:
+            buffer.error = e
+        return buffer
+
+
+    async def alex_stream(self, batch_size: int = ASYNC_BATCH_SIZE) -> AsyncGenerator:
+        """
+        The same tokens as lex_stream, for use in an event loop: after every batch_size tokens
+        it gives control back to the loop, so lexing a large file doesn't stall other tasks.
+        Cancelling the task stops lexing at the next batch.
+        """
+        count = 0
+        for token in self.lex_stream():
+            yield token
+            count += 1
+            if count == batch_size:
+                count = 0
+                await asyncio.sleep(0)
+
+
+    async def alex(self, batch_size: int = ASYNC_BATCH_SIZE) -> List[Token]:
+        """Like lex, but lexes in batches through alex_stream."""
+        tokens = []
+        try:
+            async for token in self.alex_stream(batch_size):
+                tokens.append(token)
+        except SyntaxError as e:
+            tokens.append(e)
+        return tokens
+
+
+def command_line(argv: List[str] = None):
+    import argparse
+    import token_format
+
+    parser = argparse.ArgumentParser(description="Print the tokens of a ViewScript file.")
+    parser.add_argument("path")
+    parser.add_argument("--stats", action="store_true", help="also print where the lexing time went")
+    parser.add_argument("-o", "--output", metavar="FILE", help="write the tokens to FILE in the binary token format instead")
+    args = parser.parse_args(argv)
+    stats = LexStats() if args.stats else None
+    with open(args.path) as file:
+        lexer = Lexer(char_stream=StreamCharStream(file), stats=stats)
+        if args.output:
+            with open(args.output, "wb") as output:
+                token_format.write(output, lexer.lex_buffer())
+        else:
+            print("\n")
+            try:
+                for token in lexer.lex_stream():
+                    print(token)
+            except SyntaxError as e:
+                print(e)
+    if stats is not None:
+        print()
+        print(stats.report())
 
 
 if __name__ == "__main__":
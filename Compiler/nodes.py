@@ -0,0 +1,227 @@
+from tokens import Token
+from dataclasses import dataclass
+
+
+# The syntax tree built by parser.Parser. Nodes are slotted dataclasses that keep the tokens
+# they were parsed from rather than copies of their text and positions, so a tree costs little
+# more than its token list. Every node can give the source span and first line it covers.
+
+
+class Node:
+    __slots__ = ()
+
+    @property
+    def first_token(self) -> Token:
+        raise NotImplementedError
+
+    @property
+    def last_token(self) -> Token:
+        raise NotImplementedError
+
+    @property
+    def start(self) -> int:
+        return self.first_token.start
+
+    @property
+    def end(self) -> int:
+        return self.last_token.end
+
+    @property
+    def line(self) -> int:
+        return self.first_token.line
+
+
+@dataclass(slots=True)
+class Literal(Node):
+    """A number, plain string, regex string, or constant keyword like true or this."""
+
+    token: Token
+
+    @property
+    def first_token(self) -> Token:
+        return self.token
+
+    @property
+    def last_token(self) -> Token:
+        return self.token
+
+
+@dataclass(slots=True)
+class Name(Node):
+    token: Token
+
+    @property
+    def symbol(self) -> int:
+        return self.token.symbol
+
+    @property
+    def first_token(self) -> Token:
+        return self.token
+
+    @property
+    def last_token(self) -> Token:
+        return self.token
+
+
+@dataclass(slots=True)
+class TemplateString(Node):
+    token: Token
+    # The parsed argument for each offset in the token's template arguments.
+    arguments: dict
+
+    @property
+    def first_token(self) -> Token:
+        return self.token
+
+    @property
+    def last_token(self) -> Token:
+        return self.token
+
+
+@dataclass(slots=True)
+class Prefix(Node):
+    operator: Token
+    operand: Node
+
+    @property
+    def first_token(self) -> Token:
+        return self.operator
+
+    @property
+    def last_token(self) -> Token:
+        return self.operand.last_token
+
+
+@dataclass(slots=True)
+class Postfix(Node):
+    operand: Node
+    operator: Token
+
+    @property
+    def first_token(self) -> Token:
+        return self.operand.first_token
+
+    @property
+    def last_token(self) -> Token:
+        return self.operator
+
+
+@dataclass(slots=True)
+class Binary(Node):
+    left: Node
+    operator: Token
+    right: Node
+
+    @property
+    def first_token(self) -> Token:
+        return self.left.first_token
+
+    @property
+    def last_token(self) -> Token:
+        return self.right.last_token
+
+
+@dataclass(slots=True)
+class Assignment(Node):
+    target: Node
+    operator: Token
+    value: Node
+
+    @property
+    def first_token(self) -> Token:
+        return self.target.first_token
+
+    @property
+    def last_token(self) -> Token:
+        return self.value.last_token
+
+
+@dataclass(slots=True)
+class Call(Node):
+    callee: Node
+    arguments: list
+    close: Token
+
+    @property
+    def first_token(self) -> Token:
+        return self.callee.first_token
+
+    @property
+    def last_token(self) -> Token:
+        return self.close
+
+
+@dataclass(slots=True)
+class Index(Node):
+    target: Node
+    index: Node
+    close: Token
+
+    @property
+    def first_token(self) -> Token:
+        return self.target.first_token
+
+    @property
+    def last_token(self) -> Token:
+        return self.close
+
+
+@dataclass(slots=True)
+class Group(Node):
+    """An expression in parentheses."""
+
+    open: Token
+    expression: Node
+    close: Token
+
+    @property
+    def first_token(self) -> Token:
+        return self.open
+
+    @property
+    def last_token(self) -> Token:
+        return self.close
+
+
+@dataclass(slots=True)
+class Array(Node):
+    open: Token
+    elements: list
+    close: Token
+
+    @property
+    def first_token(self) -> Token:
+        return self.open
+
+    @property
+    def last_token(self) -> Token:
+        return self.close
+
+
+@dataclass(slots=True)
+class Block(Node):
+    """
+    Statements in braces. value is the final expression if it has no semicolon after it,
+    which is what the block evaluates to.
+    """
+
+    open: Token
+    statements: list
+    value: Node | None
+    close: Token
+
+    @property
+    def first_token(self) -> Token:
+        return self.open
+
+    @property
+    def last_token(self) -> Token:
+        return self.close
+
+
+@dataclass(slots=True)
+class Module:
+    """The statements of a whole file, with value as for Block."""
+
+    statements: list
+    value: Node | None
@@ -1 +1,111 @@
+from lex_data import TokenType, OperatorType, Operator, Keyword, CodeDelimiter
+from enum import StrEnum, auto
 
+
+class Associativity(StrEnum):
+    LEFT = auto()
+    RIGHT = auto()
+
+
+# The operator precedence levels, loosest first, as (role, associativity, operators). An operator
+# can be on one level for each role Operator gives it, such as MINUS, which is BINARY and PREFIX.
+# Prefix operators bind their operand as tightly as their level, so "not a == b" is
+# "not (a == b)" and "-a * b" is "(-a) * b", while "-a ** b" is "-(a ** b)".
+PRECEDENCE = [
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.COMMA]),
+    (OperatorType.BINARY, Associativity.RIGHT, [Operator.COLON]),
+    (OperatorType.ASSIGNMENT, Associativity.RIGHT, [item for item in Operator if item.is_assignment]),
+    (OperatorType.PREFIX, Associativity.RIGHT, [Operator.SPREAD]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.PATTERN_OR]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.COALESCE]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.OR]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.AND]),
+    (OperatorType.PREFIX, Associativity.RIGHT, [Operator.NOT]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.BIN_OR]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.BIN_XOR]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.BIN_AND]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.EQ, Operator.NOT_EQ]),
+    (
+        OperatorType.BINARY,
+        Associativity.LEFT,
+        [Operator.GT, Operator.LT, Operator.GT_EQ, Operator.LT_EQ, Operator.IN, Operator.FROM],
+    ),
+    # Just looser than binary RANGE, so "a + b.." groups like "a + b..c".
+    (OperatorType.POSTFIX, Associativity.LEFT, [Operator.RANGE]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.RANGE, Operator.INC_RANGE]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.BIN_LEFT, Operator.BIN_RIGHT, Operator.BIN_ZERO_RIGHT]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.PLUS, Operator.MINUS]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.MULT, Operator.DIVIDE, Operator.MOD]),
+    (OperatorType.PREFIX, Associativity.RIGHT, [Operator.PLUS, Operator.MINUS, Operator.BIN_NOT]),
+    (OperatorType.BINARY, Associativity.RIGHT, [Operator.EXPONENT]),
+    (OperatorType.BINARY, Associativity.LEFT, [Operator.DOT, Operator.OPTION_DOT]),
+]
+
+
+def build_binding_powers(precedence: list) -> tuple[dict, dict, dict]:
+    """
+    Turns precedence levels into the binding power tables the parser is driven by: infix
+    operators (BINARY and ASSIGNMENT) map to (left power, right power), prefix operators to the
+    power their operand is parsed with, and postfix operators to their left power. Checks each
+    operator against the roles Operator gives it, and that every role is on some level.
+    """
+    infix, prefix, postfix = {}, {}, {}
+    tables = {
+        OperatorType.BINARY: infix,
+        OperatorType.ASSIGNMENT: infix,
+        OperatorType.PREFIX: prefix,
+        OperatorType.POSTFIX: postfix,
+    }
+    for level, (role, associativity, operators) in enumerate(precedence, 1):
+        # Left associative operators bind tighter on their right, so the next one on the same
+        # level ends their right operand, and right associative ones the other way around.
+        power = level * 2
+        left_power, right_power = (power, power + 1) if associativity == Associativity.LEFT else (power + 1, power)
+        if role == OperatorType.PREFIX:
+            powers = right_power
+        elif role == OperatorType.POSTFIX:
+            powers = left_power
+        else:
+            powers = left_power, right_power
+        for operator in operators:
+            if role not in operator._operator_types_:
+                raise ValueError(f"{operator.name} isn't a {role} operator.")
+            if operator in tables[role]:
+                raise ValueError(f"{operator.name} has two {role} precedence levels.")
+            tables[role][operator] = powers
+    for operator in Operator:
+        for role in operator._operator_types_:
+            if operator not in tables[role]:
+                raise ValueError(f"{operator.name} has no {role} precedence level.")
+    return infix, prefix, postfix
+
+
+INFIX_POWERS, PREFIX_POWERS, POSTFIX_POWERS = build_binding_powers(PRECEDENCE)
+
+# Calls and indexing bind like DOT, so "a.b(c)" calls a.b and "a(b).c" gets c of the result.
+CALL_POWER = INFIX_POWERS[Operator.DOT][0]
+# Array elements and call arguments are parsed with just enough power to stop at a COMMA.
+ELEMENT_POWER = INFIX_POWERS[Operator.COMMA][0] + 1
+
+# Token types that are whole expressions by themselves.
+LITERAL_TYPES = frozenset([TokenType.NUMBER, TokenType.PLAIN_STRING, TokenType.REGEX_STRING])
+CONSTANT_KEYWORDS = frozenset(
+    [
+        Keyword.TRUE,
+        Keyword.FALSE,
+        Keyword.NULL,
+        Keyword.UNDEFINED,
+        Keyword.INFINITY,
+        Keyword.THIS,
+        Keyword.SUPER,
+        Keyword.UNDERSCORE,
+    ]
+)
+SKIPPED_TYPES = frozenset([TokenType.SINGLE_LINE_COMMENT, TokenType.MULTI_LINE_COMMENT])
+
+# Each opening delimiter, with the delimiter that closes it.
+DELIMITER_PAIRS = {
+    CodeDelimiter.O_PAREN: CodeDelimiter.C_PAREN,
+    CodeDelimiter.O_BRACKET: CodeDelimiter.C_BRACKET,
+    CodeDelimiter.O_BRACE: CodeDelimiter.C_BRACE,
+}
@@ -1,2 +1,244 @@
-from lexer import Lexer
-from syntax_error import SyntaxError
\ No newline at end of file
+from lexer import Lexer, Engine
+from syntax_error import SyntaxError
+from lex_data import TokenType, Operator, CodeDelimiter
+from parse_data import (
+    INFIX_POWERS,
+    PREFIX_POWERS,
+    POSTFIX_POWERS,
+    CALL_POWER,
+    ELEMENT_POWER,
+    LITERAL_TYPES,
+    CONSTANT_KEYWORDS,
+    SKIPPED_TYPES,
+    DELIMITER_PAIRS,
+)
+from nodes import *
+from tokens import Token, TokenStream
+from typing import Generator, Iterable
+
+
+def describe(token: Token) -> str:
+    if token.type == TokenType.TEMPLATE_STRING:
+        return "Template String"
+    return str(token.name)
+
+
+class Parser:
+    """
+    Parses ViewScript expressions with a Pratt parser driven by the binding power tables in
+    parse_data. Each token is looked at a fixed number of times, so parsing takes time in
+    proportion to the number of tokens. Statements are expressions separated by semicolons;
+    keyword statements like if and fn aren't parsed yet.
+
+    tokens can be anything Lexer.lex or lex_stream give, and comments in them are skipped. A
+    lexing error, as a SyntaxError or an ERROR token, is raised when the parser reaches it. The
+    tokens are read through a TokenStream, so a stream is parsed without holding all of it.
+    """
+
+    def __init__(self, tokens: Iterable):
+        self.tokens = TokenStream(self.checked(tokens))
+        # The last token read, which gives the line for errors at the end of the input.
+        self.previous = None
+
+    @staticmethod
+    def checked(tokens: Iterable) -> Iterable:
+        for token in tokens:
+            if isinstance(token, SyntaxError):
+                raise token
+            if token.type == TokenType.ERROR:
+                raise SyntaxError.at(token.name, token)
+            if token.type not in SKIPPED_TYPES:
+                yield token
+
+    def peek(self, offset: int = 0) -> Token | None:
+        return self.tokens.peek(offset)
+
+    def next(self) -> Token:
+        token = self.tokens.advance()
+        if token is None:
+            raise SyntaxError("Unexpected End Of Input", self.previous.line if self.previous is not None else 1)
+        self.previous = token
+        return token
+
+    def at(self, token_type: TokenType, name) -> bool:
+        token = self.peek()
+        return token is not None and token.type == token_type and token.name == name
+
+    def expect(self, delimiter: CodeDelimiter) -> Token:
+        token = self.next()
+        if token.type != TokenType.CODE_DELIMITER or token.name != delimiter:
+            raise SyntaxError.at(f"Expected {delimiter}, Found {describe(token)}", token)
+        return token
+
+    def starts_expression(self, token: Token | None) -> bool:
+        if token is None:
+            return False
+        token_type = token.type
+        return (
+            token_type in LITERAL_TYPES
+            or token_type == TokenType.IDENTIFIER
+            or token_type == TokenType.TEMPLATE_STRING
+            or (token_type == TokenType.KEYWORD and token.name in CONSTANT_KEYWORDS)
+            or (token_type == TokenType.OPERATOR and token.name in PREFIX_POWERS)
+            or (token_type == TokenType.CODE_DELIMITER and token.name in DELIMITER_PAIRS)
+        )
+
+    def expression(self, min_power: int = 0) -> Node:
+        """Parses the longest expression whose operators all bind at least min_power."""
+        left = self.prefix(self.next())
+        tokens = self.tokens
+        while True:
+            token = tokens.peek()
+            if token is None:
+                break
+            token_type = token.type
+            if token_type == TokenType.OPERATOR:
+                operator = token.name
+                powers = INFIX_POWERS.get(operator)
+                # An operator that is also postfix, like the RANGE in "a..", is only infix if
+                # an operand follows it.
+                if (
+                    powers is not None
+                    and powers[0] >= min_power
+                    and (operator not in POSTFIX_POWERS or self.starts_expression(self.peek(1)))
+                ):
+                    self.next()
+                    right = self.expression(powers[1])
+                    left = Assignment(left, token, right) if operator.is_assignment else Binary(left, token, right)
+                    continue
+                power = POSTFIX_POWERS.get(operator)
+                if power is not None and power >= min_power:
+                    self.next()
+                    left = Postfix(left, token)
+                    continue
+            elif token_type == TokenType.CODE_DELIMITER and CALL_POWER >= min_power:
+                if token.name == CodeDelimiter.O_PAREN:
+                    self.next()
+                    arguments = self.sequence(CodeDelimiter.C_PAREN)
+                    left = Call(left, arguments, self.expect(CodeDelimiter.C_PAREN))
+                    continue
+                if token.name == CodeDelimiter.O_BRACKET:
+                    self.next()
+                    index = self.expression()
+                    left = Index(left, index, self.expect(CodeDelimiter.C_BRACKET))
+                    continue
+            break
+        return left
+
+    def prefix(self, token: Token) -> Node:
+        """Parses the expression that starts with token, up to where operators could continue it."""
+        token_type = token.type
+        if token_type == TokenType.IDENTIFIER:
+            return Name(token)
+        if token_type in LITERAL_TYPES or (token_type == TokenType.KEYWORD and token.name in CONSTANT_KEYWORDS):
+            return Literal(token)
+        if token_type == TokenType.TEMPLATE_STRING:
+            arguments = {}
+            for offset, argument_tokens in token.name[1].items():
+                if not argument_tokens:
+                    raise SyntaxError.at("Empty Template Argument", token)
+                arguments[offset] = Parser(argument_tokens).parse_expression()
+            return TemplateString(token, arguments)
+        if token_type == TokenType.OPERATOR:
+            power = PREFIX_POWERS.get(token.name)
+            if power is not None:
+                return Prefix(token, self.expression(power))
+        elif token_type == TokenType.CODE_DELIMITER:
+            delimiter = token.name
+            if delimiter == CodeDelimiter.O_PAREN:
+                expression = self.expression()
+                return Group(token, expression, self.expect(CodeDelimiter.C_PAREN))
+            if delimiter == CodeDelimiter.O_BRACKET:
+                elements = self.sequence(CodeDelimiter.C_BRACKET)
+                return Array(token, elements, self.expect(CodeDelimiter.C_BRACKET))
+            if delimiter == CodeDelimiter.O_BRACE:
+                statements, value = self.statements(CodeDelimiter.C_BRACE)
+                return Block(token, statements, value, self.expect(CodeDelimiter.C_BRACE))
+        raise SyntaxError.at(f"Unexpected Token {describe(token)}", token)
+
+    def sequence(self, close: CodeDelimiter) -> list:
+        """Parses comma separated expressions, allowing a trailing comma, up to close."""
+        elements = []
+        while not self.at(TokenType.CODE_DELIMITER, close):
+            elements.append(self.expression(ELEMENT_POWER))
+            if not self.at(TokenType.OPERATOR, Operator.COMMA):
+                break
+            self.next()
+        return elements
+
+    def statement_stream(self, close: CodeDelimiter | None) -> Generator:
+        """
+        Parses statements up to close, or the end of the tokens if close is None, yielding
+        each as (expression, terminated). An expression is terminated by a semicolon, or by
+        ending with a block when more statements follow. Only the final expression can be
+        unterminated, which makes it the value of its block.
+        """
+        while True:
+            if self.at_close(close):
+                return
+            token = self.peek()
+            if token.type == TokenType.CODE_DELIMITER and token.name == CodeDelimiter.END_STATEMENT:
+                self.next()
+                continue
+            expression = self.expression()
+            if self.at(TokenType.CODE_DELIMITER, CodeDelimiter.END_STATEMENT):
+                self.next()
+                yield expression, True
+            elif self.previous.type == TokenType.CODE_DELIMITER and self.previous.name == CodeDelimiter.C_BRACE and not self.at_close(close):
+                # Like in Rust, a statement that ends with a block needs no semicolon before the next one.
+                yield expression, True
+            else:
+                yield expression, False
+                return
+
+    def at_close(self, close: CodeDelimiter | None) -> bool:
+        """Whether the statements up to close have all been parsed."""
+        token = self.peek()
+        return token is None or (close is not None and token.type == TokenType.CODE_DELIMITER and token.name == close)
+
+    def statements(self, close: CodeDelimiter | None) -> tuple[list, Node | None]:
+        """Parses statements up to close, returning them along with the final unterminated expression if there is one."""
+        statements = []
+        value = None
+        for expression, terminated in self.statement_stream(close):
+            if terminated:
+                statements.append(expression)
+            else:
+                value = expression
+        return statements, value
+
+    def parse_module(self) -> Module:
+        return Module(*self.parse_whole(self.statements, None))
+
+    def parse_expression(self) -> Node:
+        return self.parse_whole(self.expression)
+
+    def iter_module(self) -> Generator:
+        """
+        Parses a module one statement at a time, yielding each one, the final unterminated
+        expression included, as soon as it is parsed rather than building the whole Module.
+        """
+        try:
+            for expression, _ in self.statement_stream(None):
+                yield expression
+        except RecursionError:
+            raise SyntaxError.at("Expression Nested Too Deeply", self.previous)
+        self.expect_end()
+
+    def parse_whole(self, parse, *args):
+        """Calls parse with args, checking that it used up every token."""
+        try:
+            result = parse(*args)
+        except RecursionError:
+            raise SyntaxError.at("Expression Nested Too Deeply", self.previous)
+        self.expect_end()
+        return result
+
+    def expect_end(self):
+        token = self.peek()
+        if token is not None:
+            raise SyntaxError.at(f"Unexpected Token {describe(token)}", token)
+
+
+def parse(code_string: str, engine: Engine = Engine.CHAR) -> Module:
+    return Parser(Lexer(code_string=code_string, engine=engine).lex_stream()).parse_module()
@@ -0,0 +1,325 @@
+from lex_data import (
+    TokenType,
+    Operator,
+    CodeDelimiter,
+    StringDelimiter,
+    Comment,
+    Formats,
+    LEXEMES,
+    LEXEME_END,
+    SYMBOL_TRIE,
+    TEMPLATE_ARGUMENT_START,
+    REGEX_FLAGS,
+    letters,
+    digits,
+    reg_chars,
+    whitespace,
+    symbols,
+    escape_char,
+    recovery_boundaries,
+)
+from syntax_error import SyntaxError
+from tokens import Token, SpanToken, OpenTemplate, SymbolTable, LineIndex, lexeme_name
+from lex_stats import LexStats
+from typing import Generator
+import re
+
+
+def _char_class(chars) -> str:
+    return "[" + "".join(re.escape(char) for char in sorted(chars)) + "]"
+
+
+_REG_CHAR = _char_class(reg_chars)
+_SIGN = _char_class([Operator.PLUS.value, Operator.MINUS.value])
+_NUMBER_BODY = rf"(?:{_REG_CHAR}|(?<=[eE]){_SIGN})*"
+
+# The extent of a number literal, from its first digit or its dot. Shared with Lexer.number,
+# this is the same run of characters that Lexer.lex_stream used to collect one at a time.
+NUMBER_SCAN_REGEX = re.compile(rf"(?:\.|{_char_class(digits)}{_NUMBER_BODY}\.?){_NUMBER_BODY}")
+# Whole identifiers or keywords, and gaps between tokens, for Lexer to consume in one match
+# rather than a character at a time.
+WORD_SCAN_REGEX = re.compile(rf"{_REG_CHAR}+")
+WHITESPACE_SCAN_REGEX = re.compile(rf"{_char_class(whitespace)}+")
+
+# One alternative per dispatch branch of Lexer.lex_stream, tried in the same order so that
+# both engines split the source identically. Strings, regexes and templates only match their
+# opening delimiter here and are finished off by the dedicated scanners below.
+MASTER_REGEX = re.compile(
+    "|".join(
+        [
+            rf"(?P<whitespace>{_char_class(whitespace)}+)",
+            rf"(?P<number>{_char_class(digits)}{_NUMBER_BODY}(?:\.{_NUMBER_BODY})?)",
+            rf"(?P<dot_number>\.{_char_class(digits)}{_NUMBER_BODY})",
+            rf"(?P<single_line_comment>{re.escape(Comment.SINGLE_LINE_COMMENT.start)}"
+            rf"[^{re.escape(Comment.SINGLE_LINE_COMMENT.end)}]*"
+            rf"{re.escape(Comment.SINGLE_LINE_COMMENT.end)}?)",
+            rf"(?P<multi_line_comment>{re.escape(Comment.MULTI_LINE_COMMENT.start)}.*?"
+            rf"(?:{re.escape(Comment.MULTI_LINE_COMMENT.end)}|\Z))",
+            rf"(?P<quote>{_char_class(item.value for item in StringDelimiter)})",
+            rf"(?P<word>{_REG_CHAR}+)",
+            rf"(?P<code_delimiter>{_char_class(item.value for item in CodeDelimiter)})",
+            rf"(?P<symbol>{_char_class(symbols)})",
+        ]
+    ),
+    re.DOTALL,
+)
+
+PLAIN_STRING_REGEX = re.compile(
+    rf"{StringDelimiter.PLAIN_STRING.value}(?:[^{StringDelimiter.PLAIN_STRING.value}"
+    rf"{re.escape(escape_char)}]|{re.escape(escape_char)}.)*{StringDelimiter.PLAIN_STRING.value}",
+    re.DOTALL,
+)
+REGEX_STRING_REGEX = re.compile(
+    rf"{StringDelimiter.REGEX_STRING.value}(?:{re.escape(escape_char)}{StringDelimiter.REGEX_STRING.value}"
+    rf"|{re.escape(escape_char)}(?!{StringDelimiter.REGEX_STRING.value})"
+    rf"|[^{StringDelimiter.REGEX_STRING.value}{re.escape(escape_char)}])*{StringDelimiter.REGEX_STRING.value}",
+    re.DOTALL,
+)
+RECOVERY_BOUNDARY_REGEX = re.compile(_char_class(recovery_boundaries))
+# Runs of template string text that need no special handling.
+TEMPLATE_TEXT_REGEX = re.compile(
+    rf"[^{StringDelimiter.TEMPLATE_STRING.value}{re.escape(escape_char)}{re.escape(TEMPLATE_ARGUMENT_START.value)}]+"
+)
+
+
+# See lexer.BRANCHES.
+BRANCHES = {
+    "number": "number",
+    "string_literal": "string",
+    "template_text": "template",
+    "word": "word",
+    "symbol": "symbol",
+}
+
+
+class RegexLexer:
+    """
+    A lexing engine that scans the source with a single combined regex built from the
+    lex_data tables, rather than walking it one character at a time. It produces the same
+    Token stream as the CHAR engine of Lexer, and is normally selected through
+    Lexer(..., engine=Engine.REGEX).
+    """
+
+    def __init__(
+        self,
+        string: str,
+        position: int = 0,
+        spans: bool = False,
+        lines: LineIndex = None,
+        emit: frozenset = None,
+        stats: LexStats = None,
+        recover: bool = False,
+        symbols: SymbolTable = None,
+    ):
+        # lines is the LineIndex of string, which is built if it isn't passed, and emit, recover
+        # and symbols are as for Lexer.
+        # stats only collects branches here, as token types are tallied by the Lexer's stream.
+        self.string = string
+        self.position = position
+        self.spans = spans
+        self.emit = emit
+        self.recover = recover
+        self.errors = []
+        self.symbols = SymbolTable() if symbols is None else symbols
+        if stats is not None:
+            stats.instrument(self, BRANCHES)
+        self.lines = LineIndex(string) if lines is None else lines
+        # The line found last, and the offsets it starts and ends at.
+        self._line = 1
+        self._line_start = self._line_end = 0
+
+    def make_token(
+        self,
+        token_type: TokenType,
+        line: int,
+        start: int,
+        end: int,
+        name=None,
+        template: tuple = None,
+        kind=None,
+        symbol=None,
+    ):
+        if self.spans:
+            return SpanToken(token_type, self.string, line, start, end, template, kind, symbol, self.lines)
+        if name is None:
+            name = lexeme_name(self.string, token_type, start, end, template)
+        return Token(token_type, name, line, start, end, kind, symbol, self.lines)
+
+    def line_at(self, position: int) -> int:
+        # Tokens are requested in source order, so the line is usually the one found last.
+        if not self._line_start <= position < self._line_end:
+            self._line = self.lines.line(position)
+            self._line_start = self.lines.line_start(self._line)
+            self._line_end = self.lines.line_end(self._line)
+        return self._line
+
+    def number(self, token: str, start: int) -> Token:
+        line = self.line_at(start)
+        kind = Formats.number_kind(token)
+        if kind is None:
+            raise SyntaxError(f"Invalid Number Literal {token}", line)
+        return self.make_token(TokenType.NUMBER, line, start, start + len(token) - 1, token, kind=kind)
+
+    def word(self, token: str, start: int) -> Token:
+        line = self.line_at(start)
+        end = start + len(token) - 1
+        lexeme = LEXEMES.get(token)
+        if lexeme is not None:
+            return self.make_token(lexeme[0], line, start, end, lexeme[1])
+        else:
+            symbol = self.symbols.intern(token)
+            return self.make_token(TokenType.IDENTIFIER, line, start, end, self.symbols.names[symbol], symbol=symbol)
+
+    def symbol(self, start: int) -> Token:
+        # Maximal munch over SYMBOL_TRIE, see Lexer.symbol.
+        string = self.string
+        node = SYMBOL_TRIE
+        lexeme, length, position = None, 0, start
+        while position < len(string):
+            node = node.get(string[position])
+            if node is None:
+                break
+            position += 1
+            if LEXEME_END in node:
+                lexeme, length = node[LEXEME_END], position - start
+        if lexeme is None:
+            raise SyntaxError(f"Invalid Operator/Symbol {string[start : max(position, start + 1)]}", self.line_at(start))
+        self.position = start + length
+        return self.make_token(lexeme[0], self.line_at(start), start, self.position - 1, lexeme[1])
+
+    def string_literal(self, start: int) -> Token:
+        # Template strings are opened by lex_stream, as in Lexer.string.
+        quote = self.string[start]
+        if quote == StringDelimiter.PLAIN_STRING.value:
+            return self.plain_string(start)
+        elif quote == StringDelimiter.REGEX_STRING.value:
+            return self.regex(start)
+
+    def plain_string(self, start: int) -> Token:
+        line = self.line_at(start)
+        match = PLAIN_STRING_REGEX.match(self.string, start)
+        if match is None:
+            raise SyntaxError(f"Unterminated String Literal {self.string[start:]}", line)
+        self.position = match.end()
+        return self.make_token(TokenType.PLAIN_STRING, line, start, self.position - 1)
+
+    def regex(self, start: int) -> Token:
+        line = self.line_at(start)
+        match = REGEX_STRING_REGEX.match(self.string, start)
+        if match is None:
+            raise SyntaxError(f"Unterminated Regex Literal {self.string[start:]}", line)
+        position = match.end()
+        current_regex_flags = []
+        while position < len(self.string):
+            char = self.string[position]
+            if char in REGEX_FLAGS and char not in current_regex_flags:
+                current_regex_flags.append(char)
+                position += 1
+            elif char in letters:
+                raise SyntaxError(f"Invalid Regex Flags: {current_regex_flags}", line)
+            else:
+                break
+        self.position = position
+        return self.make_token(TokenType.REGEX_STRING, line, start, position - 1)
+
+    def template_text(self, template: OpenTemplate) -> Token | None:
+        """See Lexer.template_text."""
+        string = self.string
+        position = self.position
+        while True:
+            match = TEMPLATE_TEXT_REGEX.match(string, position)
+            if match is not None:
+                position = match.end()
+            if position >= len(string):
+                raise SyntaxError("Unterminated Template String Literal.", template.line)
+            char = string[position]
+            if char == StringDelimiter.TEMPLATE_STRING.value:
+                self.position = position + 1
+                return self.make_token(
+                    TokenType.TEMPLATE_STRING, template.line, template.start, position, template=template.template
+                )
+            elif char == escape_char:
+                if position + 1 >= len(string):
+                    raise SyntaxError("Unterminated Template String Literal.", template.line)
+                position += 2
+            else:
+                template.open_argument(position)
+                self.position = position + 1
+                return None
+
+    def error_token(self, error: SyntaxError, start: int) -> Token:
+        """See Lexer.error_token."""
+        self.errors.append(error)
+        boundary = RECOVERY_BOUNDARY_REGEX.search(self.string, start + 1)
+        self.position = boundary.start() if boundary is not None else len(self.string)
+        return Token(TokenType.ERROR, error.message, self.line_at(start), start, self.position - 1, line_index=self.lines)
+
+    def lex_stream(self) -> Generator:
+        string = self.string
+        emit = self.emit
+        # The template strings being lexed, innermost last, see Lexer.lex_stream.
+        templates = []
+        while True:
+            # See Lexer.lex_stream.
+            failed_template = None
+            try:
+                if templates and not templates[-1].open_braces:
+                    failed_template = templates[-1]
+                    token = self.template_text(failed_template)
+                    if token is None:
+                        continue
+                    templates.pop()
+                else:
+                    start = self.position
+                    if start >= len(string):
+                        if templates:
+                            failed_template = templates[-1]
+                            raise SyntaxError("Unterminated Template String Literal.", failed_template.line)
+                        return
+                    match = MASTER_REGEX.match(string, start)
+                    if match is None:
+                        raise SyntaxError(f"Invalid Character {string[start]}", self.line_at(start))
+                    kind = match.lastgroup
+                    self.position = match.end()
+                    if kind == "whitespace":
+                        continue
+                    elif kind == "number" or kind == "dot_number":
+                        token = self.number(match.group(), start)
+                    elif kind == "single_line_comment" or kind == "multi_line_comment":
+                        token_type = (
+                            TokenType.SINGLE_LINE_COMMENT if kind == "single_line_comment" else TokenType.MULTI_LINE_COMMENT
+                        )
+                        if emit is not None and token_type not in emit:
+                            continue
+                        token = self.make_token(token_type, self.line_at(start), start, self.position - 1)
+                    elif kind == "quote":
+                        if string[start] == StringDelimiter.TEMPLATE_STRING.value:
+                            templates.append(OpenTemplate(start, self.line_at(start), error_count=len(self.errors)))
+                            continue
+                        token = self.string_literal(start)
+                    elif kind == "word":
+                        token = self.word(match.group(), start)
+                    elif kind == "code_delimiter":
+                        token = self.make_token(
+                            TokenType.CODE_DELIMITER, self.line_at(start), start, start, LEXEMES[match.group()][1]
+                        )
+                    else:
+                        token = self.symbol(start)
+            except SyntaxError as error:
+                error_start = start if failed_template is None else failed_template.start
+                if error.column is None:
+                    error.column = self.lines.column(error_start)
+                if not self.recover:
+                    raise
+                if failed_template is not None:
+                    # Errors inside the template string are dropped, as its text is lexed again.
+                    del self.errors[failed_template.error_count :]
+                    templates.pop()
+                token = self.error_token(error, error_start)
+            if templates:
+                templates[-1].add(token)
+            elif emit is None or token.type in emit:
+                yield token
+
+    def lex(self) -> list[Token]:
+        return list(self.lex_stream())
@@ -1,5 +1,22 @@
 class SyntaxError(Exception):
-    def __init__(self, message: str, line: int, *args):
+    def __init__(self, message: str, line: int, *args, column: int = None):
         self.message = message
         self.line = line
+        # Counts from 0 like Token.column, or is None if it isn't known.
+        self.column = column
         super(SyntaxError, self).__init__(message + "\nLine: " + str(line), *args)
+
+    @classmethod
+    def at(cls, message: str, token) -> "SyntaxError":
+        """An error at the line and column that token starts on."""
+        return cls(message, token.line, column=token.column)
+
+    def __str__(self):
+        if self.column is None:
+            return super().__str__()
+        # Shown counting from 1, like the line.
+        return f"{super().__str__()}, Column: {self.column + 1}"
+
+    def __reduce__(self):
+        # Lets errors cross process boundaries; the default pickling would only pass the full text.
+        return type(self), (self.message, self.line, *self.args[1:]), {"column": self.column}
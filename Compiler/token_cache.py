@@ -0,0 +1,149 @@
+from lex_data import tables_fingerprint
+from lexer import Lexer, Engine
+from token_format import TokenReader
+from tokens import TokenBuffer
+import hashlib
+import os
+import tempfile
+import time
+import token_format
+import zlib
+
+
+# Bump whenever the lexers change what they produce for the same tables, or the file layout changes.
+CACHE_FORMAT_VERSION = 5
+CACHE_EXTENSION = ".tokens"
+TEMPORARY_EXTENSION = ".tmp"
+# Entries are small next to the time it takes to lex them, so compressing them quickly beats compressing them hard.
+COMPRESSION_LEVEL = 1
+# A temporary file this old was left behind by a build that died mid-put rather than one still writing it.
+STALE_TEMPORARY_SECONDS = 60 * 60
+# Hashing the tables takes a while, so it's done once rather than for every TokenCache.
+CACHE_FINGERPRINT = f"{CACHE_FORMAT_VERSION}:{tables_fingerprint()}"
+
+
+class TokenCache:
+    """
+    An on-disk cache of lexed TokenBuffers, keyed by a hash of the source text, the engine and
+    the lex_data tables. Entries are stored in the zlib compressed token_format layout, which
+    unlike a pickle can't run code when a damaged or planted entry is read. They're written to a
+    temporary file and renamed into place, so any number of build processes can share one
+    directory: readers only ever see complete entries. Once the directory grows past max_bytes,
+    the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fingerprint = CACHE_FINGERPRINT
+        # A running estimate of the directory size, so it only has to be scanned when it might be full.
+        self._estimated_bytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, code_string: str, engine: Engine = Engine.CHAR) -> str:
+        digest = hashlib.sha256(f"{self.fingerprint}:{Engine(engine).value}:".encode())
+        digest.update(code_string.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def get(self, code_string: str, engine: Engine = Engine.CHAR) -> TokenBuffer | None:
+        path = self.path(self.key(code_string, engine))
+        try:
+            with open(path, "rb") as file:
+                tokens = TokenReader(zlib.decompress(file.read())).to_buffer()
+        except Exception:
+            # A missing or damaged entry is a miss, and is replaced on the next put.
+            return None
+        try:
+            # Mark the entry as recently used.
+            os.utime(path)
+        except OSError:
+            pass
+        return tokens
+
+    def put(self, code_string: str, tokens: TokenBuffer, engine: Engine = Engine.CHAR):
+        path = self.path(self.key(code_string, engine))
+        data = zlib.compress(token_format.dumps(tokens), COMPRESSION_LEVEL)
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=TEMPORARY_EXTENSION)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(data)
+            os.replace(temporary_path, path)
+        except BaseException:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            raise
+        if self._estimated_bytes is None:
+            self._estimated_bytes = self.size()
+        else:
+            self._estimated_bytes += len(data)
+        if self._estimated_bytes > self.max_bytes:
+            self.evict()
+
+    def lex(self, code_string: str, engine: Engine = Engine.CHAR) -> TokenBuffer:
+        """Returns the tokens for code_string from the cache, lexing and storing them on a miss."""
+        tokens = self.get(code_string, engine)
+        if tokens is None:
+            tokens = Lexer(code_string=code_string, engine=engine).lex_buffer()
+            self.put(code_string, tokens, engine)
+        return tokens
+
+    def entries(self, extension: str = CACHE_EXTENSION) -> list:
+        """Returns (last used time, size, path) for every entry, or every temporary file."""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(extension):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by another process since the scan started.
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def remove_temporaries(self, max_age: float = 0):
+        """Deletes temporary files not written to for max_age seconds, left by puts that never finished."""
+        cutoff = time.time() - max_age
+        for modified, _, path in self.entries(TEMPORARY_EXTENSION):
+            if modified > cutoff:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache fits in max_bytes, and any stale
+        temporary files. Recent ones are left alone, as another process may still be writing them.
+        """
+        self.remove_temporaries(STALE_TEMPORARY_SECONDS)
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._estimated_bytes = total
+
+    def clear(self):
+        self.remove_temporaries()
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._estimated_bytes = 0
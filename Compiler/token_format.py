@@ -0,0 +1,343 @@
+from lex_data import TokenType, NumberKind, LEXEMES
+from syntax_error import SyntaxError
+from tokens import Token, SpanToken, TokenBuffer
+from typing import BinaryIO, Iterable
+import mmap
+import struct
+
+
+# A versioned binary format for lexed tokens, which other tools can read straight out of a
+# memory-mapped file instead of lexing the source again or unpickling it. All numbers are
+# little endian. A file is laid out as:
+#
+#   header       HEADER, giving the counts of everything below
+#   records      a RECORD for every token, the top level tokens first, then template arguments
+#   arguments    an ARGUMENT for every template argument, pointing at a run of records
+#   strings      string_count + 1 STRING_OFFSETs into the string data, then the UTF-8 string data
+#
+# A record's name is an index into the string table. Operators, keywords and code delimiters
+# store their lexeme, which is looked up in LEXEMES again when read. A template string's name is
+# its text, and its argument_count arguments start at first_argument in the argument table.
+
+MAGIC = b"VWSTOKEN"
+FORMAT_VERSION = 3
+# magic, version, record size, top level token count, record count, argument count,
+# string count, error line, error column (NO_COLUMN if unknown) and error message (NO_STRING
+# if lexing didn't fail)
+HEADER = struct.Struct("<8sHHIIIIiiI")
+# type, number kind (NO_KIND if none), argument count, line, start, end, name, first argument,
+# symbol (NO_SYMBOL if none)
+RECORD = struct.Struct("<bbHiqqIIi")
+# offset of the opening brace from the start of the template string, first record, record count
+ARGUMENT = struct.Struct("<qII")
+STRING_OFFSET = struct.Struct("<Q")
+NO_STRING = 0xFFFFFFFF
+NO_COLUMN = -1
+NO_KIND = TokenBuffer.NO_KIND
+NO_SYMBOL = TokenBuffer.NO_SYMBOL
+
+# The token types whose names are enum members, stored as their lexemes.
+ENUM_TYPES = frozenset([TokenType.OPERATOR, TokenType.KEYWORD, TokenType.CODE_DELIMITER])
+
+
+def dumps(tokens: Iterable) -> bytes:
+    """
+    Encodes tokens in the binary format. tokens can be a TokenBuffer, or any iterable of
+    Tokens and SpanTokens, like the list from Lexer.lex, which may end with a SyntaxError.
+    """
+    error = tokens.error if isinstance(tokens, TokenBuffer) else None
+    strings = {}
+    records = []
+    arguments = []
+
+    # The tokens to give records to, in record order. Each template string queues up its
+    # arguments' tokens after everything before it, so that every argument's records are
+    # contiguous and templates nested to any depth are written without recursion.
+    pending = []
+    for token in tokens:
+        if isinstance(token, SyntaxError):
+            error = token
+        else:
+            pending.append(token)
+    token_count = len(pending)
+    index = 0
+    while index < len(pending):
+        token = pending[index]
+        index += 1
+        name = token.name
+        argument_count = first_argument = 0
+        if token.type == TokenType.TEMPLATE_STRING:
+            name, template_arguments = name
+            if len(template_arguments) > 0xFFFF:
+                raise ValueError("A template string has too many arguments to write.")
+            argument_count, first_argument = len(template_arguments), len(arguments)
+            for offset, argument_tokens in template_arguments.items():
+                arguments.append((offset, len(pending), len(argument_tokens)))
+                pending.extend(argument_tokens)
+        elif token.type in ENUM_TYPES:
+            name = name.value
+        kind = token.kind
+        symbol = token.symbol
+        records.append(
+            (
+                token.type,
+                NO_KIND if kind is None else kind,
+                argument_count,
+                token.line,
+                token.start,
+                token.end,
+                strings.setdefault(name, len(strings)),
+                first_argument,
+                NO_SYMBOL if symbol is None else symbol,
+            )
+        )
+    error_message = NO_STRING if error is None else strings.setdefault(error.message, len(strings))
+
+    encoded = [string.encode("utf-8", "surrogatepass") for string in strings]
+    parts = [
+        HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            RECORD.size,
+            token_count,
+            len(records),
+            len(arguments),
+            len(encoded),
+            0 if error is None else error.line,
+            NO_COLUMN if error is None or error.column is None else error.column,
+            error_message,
+        )
+    ]
+    parts.extend(RECORD.pack(*record) for record in records)
+    parts.extend(ARGUMENT.pack(*argument) for argument in arguments)
+    offset = 0
+    for string in encoded:
+        parts.append(STRING_OFFSET.pack(offset))
+        offset += len(string)
+    parts.append(STRING_OFFSET.pack(offset))
+    parts.extend(encoded)
+    return b"".join(parts)
+
+
+def write(file: BinaryIO, tokens: Iterable):
+    file.write(dumps(tokens))
+
+
+class TokenReader:
+    """
+    Reads tokens in the binary format out of any bytes-like object, such as an mmap, without
+    copying it. Indexing and iterating give TokenViews of the top level tokens, which decode
+    their fields from the buffer when they are read. Use TokenReader.open to map a file.
+    """
+
+    def __init__(self, data):
+        self._data = memoryview(data)
+        self._mmap = None
+        if len(self._data) < HEADER.size:
+            raise ValueError("Not a token file: it is too short.")
+        (
+            magic,
+            version,
+            record_size,
+            self.token_count,
+            self.record_count,
+            self.argument_count,
+            self.string_count,
+            self.error_line,
+            self.error_column,
+            self.error_message,
+        ) = HEADER.unpack_from(self._data)
+        if magic != MAGIC:
+            raise ValueError("Not a token file.")
+        if version != FORMAT_VERSION or record_size != RECORD.size:
+            raise ValueError(f"Unsupported token file version {version}, this reads version {FORMAT_VERSION}.")
+        self._records_offset = HEADER.size
+        self._arguments_offset = self._records_offset + self.record_count * RECORD.size
+        self._string_offsets_offset = self._arguments_offset + self.argument_count * ARGUMENT.size
+        self._strings_offset = self._string_offsets_offset + (self.string_count + 1) * STRING_OFFSET.size
+        if len(self._data) < self._strings_offset:
+            raise ValueError("Not a token file: it is truncated.")
+        # Strings are decoded once each, when first needed.
+        self._strings = {}
+
+    @classmethod
+    def open(cls, path: str) -> "TokenReader":
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            reader = cls(mapped)
+        except BaseException:
+            mapped.close()
+            raise
+        reader._mmap = mapped
+        return reader
+
+    def close(self):
+        self._data.release()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def string(self, string_id: int) -> str:
+        string = self._strings.get(string_id)
+        if string is None:
+            start, end = struct.unpack_from(
+                "<QQ", self._data, self._string_offsets_offset + string_id * STRING_OFFSET.size
+            )
+            string = self._strings[string_id] = str(
+                self._data[self._strings_offset + start : self._strings_offset + end], "utf-8", "surrogatepass"
+            )
+        return string
+
+    def record(self, record_index: int) -> tuple:
+        return RECORD.unpack_from(self._data, self._records_offset + record_index * RECORD.size)
+
+    def template_arguments(self, first_argument: int, argument_count: int) -> dict:
+        template_arguments = {}
+        for argument_index in range(first_argument, first_argument + argument_count):
+            offset, first_record, record_count = ARGUMENT.unpack_from(
+                self._data, self._arguments_offset + argument_index * ARGUMENT.size
+            )
+            template_arguments[offset] = [TokenView(self, index) for index in range(first_record, first_record + record_count)]
+        return template_arguments
+
+    @property
+    def error(self) -> SyntaxError | None:
+        """The SyntaxError that stopped lexing, if there was one."""
+        if self.error_message == NO_STRING:
+            return None
+        column = None if self.error_column == NO_COLUMN else self.error_column
+        return SyntaxError(self.string(self.error_message), self.error_line, column=column)
+
+    def __len__(self):
+        return self.token_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += self.token_count
+        if not 0 <= index < self.token_count:
+            raise IndexError("token index out of range")
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(self.token_count):
+            yield TokenView(self, index)
+
+    def to_buffer(self) -> TokenBuffer:
+        """Decodes the top level tokens into a TokenBuffer, unpacking the records a column at a time."""
+        buffer = TokenBuffer()
+        buffer.error = self.error
+        if not self.token_count:
+            return buffer
+        records = self._data[self._records_offset : self._records_offset + self.token_count * RECORD.size]
+        types, kinds, _, lines, starts, ends, names, _, symbols = zip(*RECORD.iter_unpack(records))
+        buffer.types.extend(types)
+        buffer.lines.extend(lines)
+        buffer.starts.extend(starts)
+        buffer.ends.extend(ends)
+        buffer.kinds.extend(kinds)
+        buffer.symbols.extend(symbols)
+        # Each string is decoded and interned once, apart from template string names, which
+        # hold their argument tokens.
+        name_ids = {}
+        for index, (token_type, string_id) in enumerate(zip(types, names)):
+            if token_type == TokenType.TEMPLATE_STRING:
+                name_id = buffer.intern_name(TokenView(self, index).to_token().name)
+            else:
+                key = (token_type in ENUM_TYPES, string_id)
+                name_id = name_ids.get(key)
+                if name_id is None:
+                    name = self.string(string_id)
+                    name_id = name_ids[key] = buffer.intern_name(LEXEMES[name][1] if key[0] else name)
+            buffer.name_ids.append(name_id)
+        return buffer
+
+
+class TokenView:
+    """
+    A token in a TokenReader, with the same fields as a Token. Compares equal to the Token
+    with the same fields.
+    """
+
+    __slots__ = ("reader", "index")
+
+    def __init__(self, reader: TokenReader, index: int):
+        self.reader = reader
+        # The token's record, which for template arguments is past the top level tokens.
+        self.index = index
+
+    @property
+    def type(self) -> TokenType:
+        return TokenType(self.reader.record(self.index)[0])
+
+    @property
+    def kind(self) -> NumberKind | None:
+        kind = self.reader.record(self.index)[1]
+        return None if kind == NO_KIND else NumberKind(kind)
+
+    @property
+    def symbol(self) -> int | None:
+        symbol = self.reader.record(self.index)[8]
+        return None if symbol == NO_SYMBOL else symbol
+
+    @property
+    def line(self) -> int:
+        return self.reader.record(self.index)[3]
+
+    @property
+    def start(self) -> int:
+        return self.reader.record(self.index)[4]
+
+    @property
+    def end(self) -> int:
+        return self.reader.record(self.index)[5]
+
+    @property
+    def name(self):
+        token_type, _, argument_count, _, _, _, name, first_argument, _ = self.reader.record(self.index)
+        name = self.reader.string(name)
+        if token_type == TokenType.TEMPLATE_STRING:
+            return name, self.reader.template_arguments(first_argument, argument_count)
+        if token_type in ENUM_TYPES:
+            return LEXEMES[name][1]
+        return name
+
+    def to_token(self) -> Token:
+        """Decodes the whole token, template arguments included, into a Token."""
+        token_type, kind, _, line, start, end, _, _, symbol = self.reader.record(self.index)
+        name = self.name
+        if token_type == TokenType.TEMPLATE_STRING:
+            name = (name[0], {offset: [token.to_token() for token in tokens] for offset, tokens in name[1].items()})
+        return Token(
+            TokenType(token_type),
+            name,
+            line,
+            start,
+            end,
+            None if kind == NO_KIND else NumberKind(kind),
+            None if symbol == NO_SYMBOL else symbol,
+        )
+
+    def __eq__(self, other):
+        if isinstance(other, (Token, SpanToken, TokenView)):
+            return (self.type, self.name, self.line, self.start, self.end) == (
+                other.type,
+                other.name,
+                other.line,
+                other.start,
+                other.end,
+            )
+        return NotImplemented
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(type={self.type!r}, name={self.name!r}, "
+            f"line={self.line!r}, start={self.start!r}, end={self.end!r})"
+        )
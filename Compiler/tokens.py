@@ -0,0 +1,501 @@
+from lex_data import (
+    TokenType,
+    Operator,
+    Keyword,
+    CodeDelimiter,
+    StringDelimiter,
+    NumberKind,
+    LEXEMES,
+    escape_char,
+)
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+import re
+
+
+@dataclass(slots=True)
+class Token:
+    type: TokenType
+    name: Operator | Keyword | CodeDelimiter | str
+    line: int
+    start: int
+    end: int
+    # The kind of literal a NUMBER token is, found while lexing it. It follows from the name, so
+    # it is left out of comparisons, and of the repr to keep it short.
+    kind: NumberKind = field(default=None, compare=False, repr=False)
+    # The id of an IDENTIFIER token's name in the SymbolTable of the run that lexed it.
+    symbol: int = field(default=None, compare=False, repr=False)
+    # The LineIndex of the source the token was lexed from, shared by all of its tokens.
+    line_index: "LineIndex" = field(default=None, compare=False, repr=False)
+
+    @property
+    def column(self) -> int | None:
+        """
+        How far the token starts from the start of its line, counting from 0. It is looked up when
+        asked for, and is None if the token wasn't lexed with a LineIndex or its line was dropped.
+        """
+        return None if self.line_index is None else self.line_index.column(self.start, self.line)
+
+    def __getstate__(self):
+        # The LineIndex is left behind, so that caches and worker processes aren't sent the
+        # line table of the whole source with every template argument.
+        return self.type, self.name, self.line, self.start, self.end, self.kind, self.symbol
+
+    def __setstate__(self, state):
+        self.type, self.name, self.line, self.start, self.end, self.kind, self.symbol = state
+        self.line_index = None
+
+
+NEWLINE_REGEX = re.compile("\n")
+
+
+class LineIndex:
+    """
+    The offset that each line of a source starts at, found in one sweep over the text so that
+    lexing doesn't have to count newlines. Lines and columns are looked up from it with a
+    bisect only when they are needed. A streamed source is added to a chunk at a time, and the
+    lines it won't read again can be dropped.
+    """
+
+    def __init__(self, source: str = ""):
+        self.starts = array("q", [0])
+        # The number of the line starting at starts[0], and the offset the text added so far ends at.
+        self.first_line = 1
+        self.end = 0
+        self.add(source)
+
+    def add(self, text: str):
+        """Records the lines in text, which carries the source on from end."""
+        end = self.end
+        self.starts.extend(end + match.end() for match in NEWLINE_REGEX.finditer(text))
+        self.end += len(text)
+
+    def line(self, position: int) -> int:
+        """The number of the line that position is on. Positions before the first line are counted on it."""
+        return max(bisect_right(self.starts, position), 1) - 1 + self.first_line
+
+    def line_start(self, line: int) -> int:
+        return self.starts[line - self.first_line]
+
+    def line_end(self, line: int) -> int:
+        """The offset just past the newline that ends line, or end if it hasn't ended yet."""
+        index = line - self.first_line + 1
+        return self.starts[index] if index < len(self.starts) else self.end
+
+    def column(self, position: int, line: int = None) -> int | None:
+        """How far position is from the start of its line, or None if that line has been dropped."""
+        index = (self.line(position) if line is None else line) - self.first_line
+        return position - self.starts[index] if index >= 0 else None
+
+    def discard(self, position: int):
+        """Drops the lines before the one that position is on."""
+        index = bisect_right(self.starts, position) - 1
+        if index > 0:
+            del self.starts[:index]
+            self.first_line += index
+
+    def __len__(self):
+        return self.first_line - 1 + len(self.starts)
+
+
+class SymbolTable:
+    """
+    Gives each distinct identifier name lexed in a run a small integer id, in the order they
+    are first seen, and keeps a single copy of each name for every token with it to share.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name: str) -> int:
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol
+
+    @classmethod
+    def from_tokens(cls, tokens) -> "SymbolTable":
+        """Rebuilds the table that tokens were lexed with, from their names and symbol ids."""
+        table = cls()
+        pending = list(tokens)
+        while pending:
+            token = pending.pop()
+            if token.type == TokenType.TEMPLATE_STRING:
+                for argument_tokens in token.name[1].values():
+                    pending.extend(argument_tokens)
+            elif token.symbol is not None:
+                while len(table.names) <= token.symbol:
+                    table.names.append(None)
+                table.names[token.symbol] = token.name
+                table.ids[token.name] = token.symbol
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, symbol: int) -> str:
+        return self.names[symbol]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+
+# Matches the characters of template string text that are rewritten in the token name:
+# escape sequences are kept as they are, and a bare "$" is escaped for JavaScript.
+TEMPLATE_ESCAPE_REGEX = re.compile(rf"{re.escape(escape_char)}.|\$", re.DOTALL)
+
+
+def template_text(source: str, start: int, end: int, argument_spans: list) -> str:
+    """
+    Builds the text part of a template string's name from source[start : end + 1], leaving out
+    each argument. argument_spans holds the (opening brace, closing brace) indexes of each one.
+    """
+    parts = []
+    position = start
+    for open_brace, close_brace in argument_spans:
+        parts.append(source[position:open_brace])
+        position = close_brace + 1
+    parts.append(source[position : end + 1])
+    return TEMPLATE_ESCAPE_REGEX.sub(
+        lambda match: match.group() if match.group() != "$" else "\\$", "".join(parts)
+    )
+
+
+def lexeme_name(source: str, token_type: TokenType, start: int, end: int, template: tuple = None):
+    """
+    Gives the name of the token of token_type that spans source[start : end + 1]. Template
+    strings also need their (argument_spans, template_arguments) passed as template, and are
+    named (text, template_arguments), where template_arguments maps the offset of each
+    argument's opening brace from the start of the string to the argument's tokens.
+    """
+    if token_type == TokenType.TEMPLATE_STRING:
+        argument_spans, template_arguments = template
+        return template_text(source, start, end, argument_spans), template_arguments
+    text = source[start : end + 1]
+    if token_type in (TokenType.OPERATOR, TokenType.KEYWORD, TokenType.CODE_DELIMITER):
+        return LEXEMES[text][1]
+    elif token_type == TokenType.REGEX_STRING:
+        # The closing delimiter is dropped, "/" is escaped and "\`" unescaped for JavaScript.
+        close = text.rfind(StringDelimiter.REGEX_STRING.value)
+        return (
+            StringDelimiter.REGEX_STRING.value
+            + text[1:close]
+            .replace("/", "\\/")
+            .replace(escape_char + StringDelimiter.REGEX_STRING.value, StringDelimiter.REGEX_STRING.value)
+            + text[close + 1 :]
+        )
+    return text
+
+
+@dataclass(slots=True)
+class OpenTemplate:
+    """
+    A template string that the lexers are part way through. It is in string mode, scanning
+    text, until an argument opens, then in code mode, lexing the argument's tokens, until the
+    argument's closing brace. Nested template strings are kept on a stack of these, so any
+    depth of nesting is lexed in a single pass.
+    """
+
+    start: int
+    line: int
+    argument_spans: list = field(default_factory=list)
+    template_arguments: dict = field(default_factory=dict)
+    # The tokens of the argument being lexed, and how deep in braces it is (0 in string mode).
+    tokens: list = None
+    open_braces: int = 0
+    # How many errors a recovering lexer had recorded when the template string opened.
+    error_count: int = 0
+
+    def open_argument(self, open_brace: int):
+        """Switches to code mode for the argument whose opening brace is at open_brace."""
+        self.tokens = self.template_arguments[open_brace - self.start] = []
+        self.argument_spans.append((open_brace, None))
+        self.open_braces = 1
+
+    def add(self, token: Token):
+        """Adds a token lexed in code mode to the argument, switching back to string mode if it closes it."""
+        if token.type == TokenType.CODE_DELIMITER:
+            if token.name == CodeDelimiter.O_BRACE:
+                self.open_braces += 1
+            elif token.name == CodeDelimiter.C_BRACE:
+                self.open_braces -= 1
+                if not self.open_braces:
+                    self.argument_spans[-1] = (self.argument_spans[-1][0], token.start)
+                    return
+        self.tokens.append(token)
+
+    @property
+    def template(self) -> tuple:
+        return self.argument_spans, self.template_arguments
+
+
+class SpanToken:
+    """
+    A Token that only records where its lexeme lies in the source. The name is sliced out of
+    the source each time it is read, so long strings and comments are never copied while
+    lexing. Compares equal to the Token with the same fields.
+    """
+
+    __slots__ = ("type", "source", "line", "start", "end", "template", "kind", "symbol", "line_index")
+
+    def __init__(
+        self,
+        type: TokenType,
+        source: str,
+        line: int,
+        start: int,
+        end: int,
+        template: tuple = None,
+        kind: NumberKind = None,
+        symbol: int = None,
+        line_index: LineIndex = None,
+    ):
+        self.type = type
+        self.source = source
+        self.line = line
+        self.start = start
+        self.end = end
+        self.template = template
+        self.kind = kind
+        self.symbol = symbol
+        self.line_index = line_index
+
+    @property
+    def name(self):
+        return lexeme_name(self.source, self.type, self.start, self.end, self.template)
+
+    @property
+    def text(self) -> str:
+        return self.source[self.start : self.end + 1]
+
+    column = Token.column
+
+    def __eq__(self, other):
+        if isinstance(other, (Token, SpanToken)):
+            return (self.type, self.name, self.line, self.start, self.end) == (
+                other.type,
+                other.name,
+                other.line,
+                other.start,
+                other.end,
+            )
+        return NotImplemented
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(type={self.type!r}, name={self.name!r}, "
+            f"line={self.line!r}, start={self.start!r}, end={self.end!r})"
+        )
+
+
+class TokenBuffer:
+    """
+    Holds a whole token stream as parallel array columns of types, lines, offsets, number
+    kinds and symbol ids, with each name stored once in an interned side table. Indexing and
+    iterating give back Tokens.
+    """
+
+    # Stand for a kind or symbol of None in the kinds and symbols columns.
+    NO_KIND = -1
+    NO_SYMBOL = -1
+
+    def __init__(self, tokens=()):
+        self.types = array("b")
+        self.lines = array("i")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.name_ids = array("i")
+        self.kinds = array("b")
+        self.symbols = array("i")
+        self.names = []
+        self._name_table = {}
+        # The SyntaxError that stopped lexing, if there was one.
+        self.error = None
+        self.extend(tokens)
+
+    def __getstate__(self):
+        # The name table is only needed while appending, and is rebuilt from the names.
+        state = dict(self.__dict__)
+        del state["_name_table"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._name_table = {}
+        for name_id, name in enumerate(self.names):
+            try:
+                self._name_table.setdefault((name.__class__, name), name_id)
+            except TypeError:
+                pass
+
+    def intern_name(self, name) -> int:
+        # Keyed on the class too, so that an enum member and the equal plain string aren't shared.
+        key = (name.__class__, name)
+        try:
+            name_id = self._name_table.get(key)
+        except TypeError:
+            # Template string names hold a dict of argument tokens, and can't be shared.
+            name_id = None
+        else:
+            if name_id is not None:
+                return name_id
+            self._name_table[key] = len(self.names)
+        self.names.append(name)
+        return len(self.names) - 1
+
+    def append(self, token: Token | SpanToken):
+        self.types.append(token.type)
+        self.lines.append(token.line)
+        self.starts.append(token.start)
+        self.ends.append(token.end)
+        self.name_ids.append(self.intern_name(token.name))
+        self.kinds.append(self.NO_KIND if token.kind is None else token.kind)
+        self.symbols.append(self.NO_SYMBOL if token.symbol is None else token.symbol)
+
+    def extend(self, tokens):
+        for token in tokens:
+            self.append(token)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        kind = self.kinds[index]
+        symbol = self.symbols[index]
+        return Token(
+            TokenType(self.types[index]),
+            self.names[self.name_ids[index]],
+            self.lines[index],
+            self.starts[index],
+            self.ends[index],
+            None if kind == self.NO_KIND else NumberKind(kind),
+            None if symbol == self.NO_SYMBOL else symbol,
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the array columns in bytes, not counting the names."""
+        return sum(
+            column.itemsize * len(column)
+            for column in [self.types, self.lines, self.starts, self.ends, self.name_ids, self.kinds, self.symbols]
+        )
+
+
+class TokenStream:
+    """
+    Reads tokens from an iterable, such as Lexer.lex_stream, one at a time while allowing a
+    look ahead with peek and going back with mark and reset. Only the tokens from the earliest
+    mark (or the current one) to the furthest peeked at are held, in a ring buffer that grows to
+    fit that window, so memory depends on how far the reader looks rather than on the input.
+    """
+
+    def __init__(self, tokens, capacity: int = 16):
+        if capacity < 1:
+            raise ValueError(f"TokenStream capacity must be positive, not {capacity}")
+        self._tokens = iter(tokens)
+        # Rounded up to a power of two, so that an index can be wrapped with _mask.
+        capacity = 1 << (capacity - 1).bit_length()
+        self._ring = [None] * capacity
+        self._mask = capacity - 1
+        # Absolute indexes of the oldest buffered token, and the one after the newest.
+        self._first = 0
+        self._end = 0
+        self._exhausted = False
+        self._marks = []
+        # The absolute index of the token advance gives next.
+        self.position = 0
+
+    def _fill(self, index: int) -> bool:
+        """Reads tokens up to index into the buffer, returning whether the input has that many."""
+        while self._end <= index:
+            if self._exhausted:
+                return False
+            token = next(self._tokens, None)
+            if token is None:
+                self._exhausted = True
+                return False
+            if self._end - self._first == len(self._ring):
+                self._grow()
+            self._ring[self._end & self._mask] = token
+            self._end += 1
+        return True
+
+    def _grow(self):
+        ring = [None] * (len(self._ring) * 2)
+        mask = len(ring) - 1
+        for index in range(self._first, self._end):
+            ring[index & mask] = self._ring[index & self._mask]
+        self._ring = ring
+        self._mask = mask
+
+    def _discard(self):
+        # Tokens before the position and the earliest mark can't be read again, so their slots
+        # are cleared to free them. Marks are nested, so the first is the earliest.
+        keep = self._marks[0] if self._marks else self.position
+        while self._first < keep:
+            self._ring[self._first & self._mask] = None
+            self._first += 1
+
+    def peek(self, offset: int = 0):
+        """The token offset places after the next one, or None past the end of the input."""
+        index = self.position + offset
+        if index < self._end or self._fill(index):
+            return self._ring[index & self._mask]
+        return None
+
+    def advance(self):
+        """Returns the next token and moves past it, or returns None at the end of the input."""
+        position = self.position
+        if position >= self._end and not self._fill(position):
+            return None
+        slot = position & self._mask
+        token = self._ring[slot]
+        self.position = position + 1
+        if self._marks:
+            self._discard()
+        else:
+            # Without marks nothing before the position is kept, so only this token is freed.
+            self._ring[slot] = None
+            self._first = self.position
+        return token
+
+    def mark(self) -> int:
+        """Remembers the position, keeping every token from it on until the mark is reset or released."""
+        self._marks.append(self.position)
+        return self.position
+
+    def _pop_mark(self, mark: int):
+        if not self._marks or self._marks[-1] != mark:
+            raise ValueError("Marks must be reset or released innermost first.")
+        self._marks.pop()
+
+    def release(self, mark: int):
+        """Forgets mark, the innermost one that hasn't been reset or released."""
+        self._pop_mark(mark)
+        self._discard()
+
+    def reset(self, mark: int):
+        """Goes back to mark, so that the tokens after it are read again, and forgets it."""
+        self._pop_mark(mark)
+        self.position = mark
+        self._discard()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = self.advance()
+        if token is None:
+            raise StopIteration
+        return token